@@ -0,0 +1,16 @@
+from django.apps import AppConfig
+from django.core import checks
+from django.db.backends.signals import connection_created
+
+
+class ApiConfig(AppConfig):
+    name = 'api'
+
+    def ready(self):
+        from .checks import check_pin_cache, check_throttle_cache
+        from .metrics import collectors, install_query_counter
+        from .throttle import throttle_metrics
+        connection_created.connect(install_query_counter)
+        collectors.append(throttle_metrics)
+        checks.register(check_pin_cache, checks.Tags.caches)
+        checks.register(check_throttle_cache, checks.Tags.caches)
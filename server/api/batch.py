@@ -0,0 +1,143 @@
+import io
+import json
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.core.handlers.exception import response_for_exception
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import transaction
+from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+
+from . import throttle
+from .metrics import MetricsMiddleware
+
+# Sub-requests run in-process on the calling thread: same URL resolver, same
+# views, same database connection, but without the middleware stack, which
+# already ran once for the /batch/ request itself. Two of its jobs are done
+# per sub-request all the same: the rate limits (api.throttle), so a batch
+# is no way around them, and the per-route metrics (api.metrics).
+
+METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+BATCH_PATH = '/batch/'
+
+
+class BatchError(ValueError):
+    pass
+
+
+def parse(payload):
+    """Validate a batch body into a list of (method, path, query, body) tuples."""
+    if not isinstance(payload, dict) or not isinstance(payload.get('requests'), list):
+        raise BatchError('expected {"requests": [{"method", "path", "body"}, ...]}')
+    items = payload['requests']
+    if not items:
+        raise BatchError('no requests given')
+    if len(items) > settings.BATCH_MAX_REQUESTS:
+        raise BatchError(f'at most {settings.BATCH_MAX_REQUESTS} requests per batch')
+    parsed = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get('path'), str):
+            raise BatchError(f'request {index}: a path is required')
+        method = str(item.get('method', 'GET')).upper()
+        if method not in METHODS:
+            raise BatchError(f'request {index}: method must be one of {", ".join(METHODS)}')
+        url = urlsplit(item['path'])
+        if not url.path.startswith('/') or url.netloc:
+            raise BatchError(f'request {index}: path must be absolute, e.g. /inventory/item/1/')
+        if url.path.rstrip('/') == BATCH_PATH.rstrip('/'):
+            raise BatchError(f'request {index}: batches cannot be nested')
+        parsed.append((method, url.path, url.query, item.get('body')))
+    return parsed
+
+
+def build_request(parent, method, path, query, body):
+    if body is None:
+        data, content_type = b'', ''
+    elif isinstance(body, str):
+        data, content_type = body.encode(), 'text/plain; charset=utf-8'
+    else:
+        data, content_type = json.dumps(body).encode(), 'application/json'
+    environ = {
+        key: value for key, value in parent.META.items()
+        if not key.startswith(('wsgi.', 'CONTENT_')) and isinstance(value, str)
+    }
+    environ.update({
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'SCRIPT_NAME': '',
+        'QUERY_STRING': query,
+        'CONTENT_TYPE': content_type,
+        'CONTENT_LENGTH': str(len(data)),
+        'wsgi.input': io.BytesIO(data),
+        'wsgi.url_scheme': parent.scheme,
+        'HTTP_ACCEPT': 'application/json',
+    })
+    request = WSGIRequest(environ)
+    # Identity carries over; CSRF was already checked on the batch request
+    for attr in ('user', 'session'):
+        if hasattr(parent, attr):
+            setattr(request, attr, getattr(parent, attr))
+    request._dont_enforce_csrf_checks = True
+    return request
+
+
+def dispatch(request, limits):
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return JsonResponse({'error': f'No route for {request.path_info}'}, status=404)
+    # As the request handler does; the throttle and the metrics go by the route
+    request.resolver_match = match
+    rejected = throttle.check(request, match.kwargs, limits)
+    if rejected is not None:
+        return rejected
+    try:
+        view = match.func
+        if iscoroutinefunction(view):
+            view = async_to_sync(view)
+        response = view(request, *match.args, **match.kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response = response.render()
+    except Exception as exc:
+        # Http404, PermissionDenied, ... become the same responses the
+        # handler would have produced for a standalone request
+        response = response_for_exception(request, exc)
+    return response
+
+
+def describe(response):
+    if response.streaming:
+        content = b''.join(response.streaming_content)
+    else:
+        content = response.content
+    content_type = response.get('Content-Type', '')
+    if content_type.startswith('application/json') and content:
+        body = json.loads(content)
+    else:
+        body = content.decode(response.charset, errors='replace') if content else None
+    return {'status': response.status_code, 'content_type': content_type or None, 'body': body}
+
+
+def run(parent, payload):
+    """
+    Execute a batch and return its result dict. With "atomic": true the
+    sub-requests share one transaction: the first response with a 4xx/5xx
+    status stops the batch and rolls back everything before it.
+    """
+    items = parse(payload)
+    atomic = bool(payload.get('atomic'))
+    limits = throttle.parse_rates(settings.THROTTLE_RATES)
+    handle = MetricsMiddleware(lambda request: dispatch(request, limits))
+    if not atomic:
+        return {'responses': [describe(handle(build_request(parent, *item))) for item in items]}
+
+    responses = []
+    with transaction.atomic():
+        for item in items:
+            responses.append(describe(handle(build_request(parent, *item))))
+            if responses[-1]['status'] >= 400:
+                transaction.set_rollback(True)
+                return {'responses': responses, 'atomic': True, 'rolled_back': True}
+    return {'responses': responses, 'atomic': True, 'rolled_back': False}
@@ -0,0 +1,129 @@
+import http.client
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(latencies, errors, elapsed):
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+    }
+
+
+def run_load(paths, concurrency, duration, connect):
+    """
+    Drive `paths` round-robin from `concurrency` worker threads for `duration`
+    seconds. `connect()` is called once per worker and returns a pair of
+    callables: fetch(path) -> status code, and close(). Returns {path: summary}.
+    """
+    deadline = time.perf_counter() + duration
+    lock = threading.Lock()
+    latencies = {path: [] for path in paths}
+    errors = {path: 0 for path in paths}
+
+    def worker(offset):
+        fetch, close = connect()
+        mine = {path: [] for path in paths}
+        failed = {path: 0 for path in paths}
+        n = offset
+        try:
+            while time.perf_counter() < deadline:
+                path = paths[n % len(paths)]
+                n += 1
+                started = time.perf_counter()
+                try:
+                    status = fetch(path)
+                except (OSError, http.client.HTTPException):
+                    failed[path] += 1
+                    continue
+                if status >= 500:
+                    failed[path] += 1
+                    continue
+                mine[path].append(time.perf_counter() - started)
+        finally:
+            close()
+        with lock:
+            for path in paths:
+                latencies[path].extend(mine[path])
+                errors[path] += failed[path]
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {path: summarize(latencies[path], errors[path], elapsed) for path in paths}
+
+
+def http_load(base_url, paths, concurrency, duration):
+    """Load a running server over keep-alive HTTP connections."""
+    parts = urlsplit(base_url)
+
+    def connect():
+        conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+
+        def fetch(path):
+            try:
+                conn.request('GET', path)
+                response = conn.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                raise
+            if response.getheader('Connection', '').lower() == 'close':
+                conn.close()
+            return response.status
+
+        return fetch, conn.close
+
+    return run_load(paths, concurrency, duration, connect)
+
+
+def client_load(paths, concurrency, duration):
+    """
+    Load the full middleware and view stack in-process through Django's test
+    client. Each worker thread gets its own database connection, closed when
+    the worker finishes.
+    """
+    from django.db import connections
+    from django.test import Client
+
+    def connect():
+        client = Client(raise_request_exception=False)
+
+        def fetch(path):
+            response = client.get(path)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            return response.status_code
+
+        return fetch, connections.close_all
+
+    return run_load(paths, concurrency, duration, connect)
+
+
+def wait_for_port(host, port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            http.client.HTTPConnection(host, port, timeout=1).connect()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
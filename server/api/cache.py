@@ -0,0 +1,233 @@
+"""
+Tag-based cache for the rendered responses of read views.
+
+    @use_replica
+    @cache_response('catalog', 'item:{id}')
+    @sparse_fields(ItemSerializer)
+    ...
+    def get_item_by_id(request, id):
+
+A cached GET is keyed on its path and query string and tagged with the
+given tags, formatted with the view's URL kwargs. Writes invalidate tags,
+not keys: each tag has a version stored next to the entries, an entry
+records the versions it was built under, and invalidate() replaces the
+version, so every entry carrying the tag stops matching at once, whatever
+the query string. Models hook in with invalidate_on_write(), which maps a
+saved or deleted instance to its tags after the transaction commits.
+
+Entries live in the 'responses' cache alias, a locmem LRU by default (any
+Django backend works) with RESPONSE_CACHE_MAX_ENTRIES.
+
+Stampede protection: when an entry is missing, invalidated or past its TTL,
+one worker takes a short lock and rebuilds it, reading from the primary
+even in a @use_replica view: a lagging replica would store pre-write rows
+under the tag versions of after the write. Meanwhile the others serve
+the expired entry for up to RESPONSE_CACHE_STALE seconds if it is still
+valid, or else wait up to RESPONSE_CACHE_WAIT seconds for the rebuild
+before running the view themselves. An invalidated entry is never served.
+
+Only 200 JSON responses are stored; the browsable API (Accept: text/html
+or ?format=) always runs the view. Bulk writes (update(), bulk_create())
+send no signals, so code doing them calls invalidate() or invalidate_all()
+itself.
+
+RESPONSE_CACHE_TIMEOUT       seconds an entry is fresh (60)
+RESPONSE_CACHE_STALE         seconds an expired entry may be served during a rebuild (30)
+RESPONSE_CACHE_WAIT          seconds to wait for another worker's rebuild (2)
+RESPONSE_CACHE_LOCK_TIMEOUT  seconds before an abandoned rebuild lock expires (10)
+"""
+import asyncio
+import functools
+import hashlib
+import time
+import uuid
+from contextlib import nullcontext
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.http import HttpResponse
+
+from .routers import primary_reads
+
+ALIAS = 'responses'
+POLL_SECONDS = 0.02
+
+HIT, STALE, MISS, BUILD, WAIT = 'HIT', 'STALE', 'MISS', 'BUILD', 'WAIT'
+
+
+def _cache():
+    return caches[ALIAS]
+
+
+def _tag_key(tag):
+    return f'tag:{tag}'
+
+
+def cache_key(request):
+    query = '&'.join(f'{name}={value}' for name, values in sorted(request.GET.lists()) for value in values)
+    digest = hashlib.md5(f'{request.path}?{query}'.encode()).hexdigest()
+    return f'response:{digest}'
+
+
+def cacheable(request):
+    return (
+        request.method == 'GET'
+        and 'format' not in request.GET
+        and 'text/html' not in request.META.get('HTTP_ACCEPT', '')
+    )
+
+
+def _versions(cache, tags, found):
+    """Current version of each tag, creating the missing ones."""
+    versions = []
+    for tag in tags:
+        key = _tag_key(tag)
+        version = found.get(key)
+        if version is None:
+            version = uuid.uuid4().hex
+            if not cache.add(key, version, None):
+                version = cache.get(key)
+        versions.append(version)
+    return versions
+
+
+def lookup(key, tags):
+    """(state, entry, versions): HIT/STALE with an entry to serve, or BUILD/WAIT."""
+    cache = _cache()
+    found = cache.get_many([key, *map(_tag_key, tags)])
+    versions = _versions(cache, tags, found)
+    entry = found.get(key)
+    valid = entry is not None and entry['versions'] == versions
+    if valid and entry['expires'] > time.time():
+        return HIT, entry, versions
+    if cache.add(f'lock:{key}', 1, settings.RESPONSE_CACHE_LOCK_TIMEOUT):
+        return BUILD, None, versions
+    if valid:
+        return STALE, entry, versions
+    return WAIT, None, versions
+
+
+def poll(key, versions):
+    entry = _cache().get(key)
+    return entry if entry is not None and entry['versions'] == versions else None
+
+
+def store(key, versions, response):
+    """Save `response` under the versions read *before* it was built, then release the lock."""
+    cache = _cache()
+    try:
+        if (
+            response.status_code == 200
+            and not response.streaming
+            and response.get('Content-Type', '').startswith('application/json')
+        ):
+            cache.set(key, {
+                'versions': versions,
+                'expires': time.time() + settings.RESPONSE_CACHE_TIMEOUT,
+                'content': response.content,
+                'headers': [(name, value) for name, value in response.items() if name != 'Content-Length'],
+            }, settings.RESPONSE_CACHE_TIMEOUT + settings.RESPONSE_CACHE_STALE)
+    finally:
+        cache.delete(f'lock:{key}')
+
+
+def release(key):
+    _cache().delete(f'lock:{key}')
+
+
+def from_entry(entry, state):
+    response = HttpResponse(entry['content'])
+    for name, value in entry['headers']:
+        response[name] = value
+    response['X-Cache'] = state
+    return response
+
+
+def _render(response):
+    if hasattr(response, 'render') and callable(response.render):
+        response = response.render()
+    return response
+
+
+def cache_response(*tags):
+    """Cache the JSON GET responses of a view under `tags` ('item:{id}' takes `id` from the URL)."""
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                if not cacheable(request):
+                    return await view(request, *args, **kwargs)
+                key, names = cache_key(request), [tag.format(**kwargs) for tag in tags]
+                state, entry, versions = await sync_to_async(lookup)(key, names)
+                if state == WAIT:
+                    deadline = time.monotonic() + settings.RESPONSE_CACHE_WAIT
+                    while entry is None and time.monotonic() < deadline:
+                        await asyncio.sleep(POLL_SECONDS)
+                        entry = await sync_to_async(poll)(key, versions)
+                    state = HIT if entry is not None else MISS
+                if entry is not None:
+                    return from_entry(entry, state)
+                try:
+                    with primary_reads() if state == BUILD else nullcontext():
+                        response = _render(await view(request, *args, **kwargs))
+                except BaseException:
+                    if state == BUILD:
+                        await sync_to_async(release)(key)
+                    raise
+                if state == BUILD:
+                    await sync_to_async(store)(key, versions, response)
+                response['X-Cache'] = MISS
+                return response
+        else:
+            @functools.wraps(view)
+            def wrapper(request, *args, **kwargs):
+                if not cacheable(request):
+                    return view(request, *args, **kwargs)
+                key, names = cache_key(request), [tag.format(**kwargs) for tag in tags]
+                state, entry, versions = lookup(key, names)
+                if state == WAIT:
+                    deadline = time.monotonic() + settings.RESPONSE_CACHE_WAIT
+                    while entry is None and time.monotonic() < deadline:
+                        time.sleep(POLL_SECONDS)
+                        entry = poll(key, versions)
+                    state = HIT if entry is not None else MISS
+                if entry is not None:
+                    return from_entry(entry, state)
+                try:
+                    with primary_reads() if state == BUILD else nullcontext():
+                        response = _render(view(request, *args, **kwargs))
+                except BaseException:
+                    if state == BUILD:
+                        release(key)
+                    raise
+                if state == BUILD:
+                    store(key, versions, response)
+                response['X-Cache'] = MISS
+                return response
+        return wrapper
+    return decorator
+
+
+def invalidate(*tags):
+    """Drop every cached response carrying one of `tags`, once the current transaction commits."""
+    # A missing version counts as a new one, so deleting the tag key is enough.
+    # Deferred to commit so a concurrent reader cannot rebuild from the pre-write rows
+    # under the new version.
+    keys = [_tag_key(tag) for tag in tags if tag]
+    transaction.on_commit(lambda: _cache().delete_many(keys))
+
+
+def invalidate_all():
+    transaction.on_commit(_cache().clear)
+
+
+def invalidate_on_write(model, tags_for):
+    """Invalidate `tags_for(instance)` whenever an instance of `model` is saved or deleted."""
+    def handler(sender, instance, **kwargs):
+        invalidate(*tags_for(instance))
+
+    post_save.connect(handler, sender=model, weak=False)
+    post_delete.connect(handler, sender=model, weak=False)
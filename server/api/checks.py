@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.core.cache.backends.redis import RedisCache
+from django.core.checks import Error, Warning
+
+from . import routers, throttle
+
+
+def check_pin_cache(app_configs, **kwargs):
+    """Replica pins have to be seen by every process, or writers read stale replicas."""
+    if not routers.replicas() or not isinstance(caches[routers.PIN_CACHE], (LocMemCache, DummyCache)):
+        return []
+    return [Error(
+        'DB_REPLICAS is set but the cache holding the replica pins is per process.',
+        hint='A write pins its client to the primary only in the worker that served it. '
+             'Set CACHE_BACKEND to redis, memcached, db or (one host) file.',
+        id='api.E001',
+    )]
+
+
+def check_throttle_cache(app_configs, **kwargs):
+    """Rate limits need a cache every process shares, with atomic add() and incr()."""
+    if not throttle.parse_rates(settings.THROTTLE_RATES):
+        return []
+    if isinstance(caches[throttle.ALIAS], (RedisCache, BaseMemcachedCache)):
+        return []
+    return [Warning(
+        'THROTTLE_RATES is set but the throttle cache is not redis or memcached.',
+        hint='Each worker process keeps its own buckets, or updates them non-atomically, '
+             'so clients get more than the configured rates. Set THROTTLE_CACHE_BACKEND=redis or memcached.',
+        id='api.W001',
+    )]
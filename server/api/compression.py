@@ -0,0 +1,160 @@
+"""
+Negotiated response compression (brotli, then gzip) for buffered and
+streamed responses.
+
+COMPRESSION_MIN_SIZE        buffered bodies smaller than this many bytes go out
+                            as is; below it the format overhead and CPU cost
+                            more than they save (860)
+COMPRESSION_GZIP_LEVEL      zlib level 1-9 (6)
+COMPRESSION_BROTLI_QUALITY  brotli quality 0-11 (5)
+
+Levels were picked with `manage.py bench_compression` on a 1.4 MB item list:
+gzip 6 is within 5% of gzip 9's size at under half its CPU, and brotli 5 is
+7% smaller than gzip 9 in 60% of its time. Brotli 10-11 take seconds and
+are only worth it for static assets.
+
+Brotli needs the optional `brotli` package; without it only gzip is offered.
+"""
+import re
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+_ACCEPT = re.compile(r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*')
+# Already compressed; another pass only burns CPU
+_INCOMPRESSIBLE = re.compile(r'^(image/(?!svg)|video/|audio/|application/(gzip|zip|x-brotli|octet-stream))')
+
+
+def accepted_encodings(header):
+    """{coding: q} from an Accept-Encoding header."""
+    accepted = {}
+    for part in header.split(','):
+        match = _ACCEPT.fullmatch(part)
+        if not match:
+            continue
+        try:
+            accepted[match[1].lower()] = float(match[2]) if match[2] else 1.0
+        except ValueError:
+            continue
+    return accepted
+
+
+def choose_encoding(header):
+    accepted = accepted_encodings(header or '')
+    wildcard = accepted.get('*', 0)
+    for coding in ('br', 'gzip') if brotli else ('gzip',):
+        if accepted.get(coding, wildcard) > 0:
+            return coding
+    return None
+
+
+class GzipCompressor:
+    def __init__(self):
+        # wbits 16+ writes the gzip header and trailer
+        self._zlib = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self._zlib.compress(data)
+
+    def flush(self):
+        # Sync flush so a streamed chunk reaches the client without waiting for the next
+        return self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._zlib.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor:
+    def __init__(self):
+        self._brotli = brotli.Compressor(mode=brotli.MODE_TEXT, quality=settings.COMPRESSION_BROTLI_QUALITY)
+
+    def compress(self, data):
+        return self._brotli.process(data)
+
+    def flush(self):
+        return self._brotli.flush()
+
+    def finish(self):
+        return self._brotli.finish()
+
+
+COMPRESSORS = {'gzip': GzipCompressor, 'br': BrotliCompressor}
+
+
+def compress(coding, data):
+    compressor = COMPRESSORS[coding]()
+    return compressor.compress(data) + compressor.finish()
+
+
+def compress_stream(coding, chunks):
+    compressor = COMPRESSORS[coding]()
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def acompress_stream(coding, chunks):
+    compressor = COMPRESSORS[coding]()
+    async for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding') or _INCOMPRESSIBLE.match(response.get('Content-Type', '')):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        # Set even when this client gets identity, so caches keep the variants apart
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING'))
+        if coding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_stream(coding, response.streaming_content)
+            else:
+                response.streaming_content = compress_stream(coding, response.streaming_content)
+            del response['Content-Length']
+        else:
+            compressed = compress(coding, response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # The body bytes changed, so a strong ETag no longer matches them
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = coding
+        return response
@@ -0,0 +1,118 @@
+"""
+Environment-driven DATABASES configuration.
+
+DB_ENGINE=sqlite (default)
+    DB_NAME            database file, defaults to BASE_DIR/db.sqlite3
+    DB_BUSY_TIMEOUT    seconds a writer waits on a lock before "database is locked" (20)
+    DB_MMAP_SIZE       bytes of the file memory-mapped for reads (256 MiB)
+    DB_CACHE_SIZE      page cache per connection in KiB (64 MiB)
+    DB_CONN_MAX_AGE    seconds to keep a connection open between requests (60),
+                       so the PRAGMAs and page cache are not redone per request
+    DB_TEST_NAME       test database file; by default one per checkout in the
+                       temp dir (tu7fa-test-<hash of BASE_DIR>.sqlite3), so
+                       runs from different checkouts do not destroy each
+                       other's. A file rather than Django's shared in-memory
+                       default, whose table locks fail concurrent writers
+                       instead of queueing them, so threaded tests see real
+                       locking. Set it per shard for parallel CI runs of one
+                       checkout.
+
+DB_ENGINE=postgresql
+    DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT
+    DB_CONN_MAX_AGE    seconds to keep a connection open between requests (60)
+    DB_POOL_MAX_SIZE   when set, use psycopg's connection pool instead of
+                       persistent connections (requires psycopg[pool])
+    DB_POOL_MIN_SIZE   pool connections kept open (2)
+
+DB_REPLICAS
+    comma separated read replicas, exposed as aliases replica_0, replica_1, ...
+    For SQLite these are database files kept up to date with
+    `manage.py sync_sqlite_replicas`; for PostgreSQL they are hosts that share
+    the primary's other settings. See api/routers.py for what reads from them.
+"""
+import hashlib
+import os
+import tempfile
+
+
+def sqlite_pragmas(env=os.environ):
+    return {
+        # Readers no longer block the writer and vice versa
+        'journal_mode': 'WAL',
+        # In WAL mode NORMAL only fsyncs at checkpoints; still crash-safe
+        'synchronous': 'NORMAL',
+        'mmap_size': int(env.get('DB_MMAP_SIZE', 256 * 1024 * 1024)),
+        'cache_size': -int(env.get('DB_CACHE_SIZE', 64 * 1024)),
+        'temp_store': 'MEMORY',
+    }
+
+
+def default_test_name(base_dir):
+    checkout = hashlib.md5(str(base_dir).encode()).hexdigest()[:8]
+    return os.path.join(tempfile.gettempdir(), f'tu7fa-test-{checkout}.sqlite3')
+
+
+def sqlite_config(base_dir, env=os.environ):
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': env.get('DB_NAME', base_dir / 'db.sqlite3'),
+        'CONN_MAX_AGE': int(env.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': float(env.get('DB_BUSY_TIMEOUT', 20)),
+            # Take the write lock at BEGIN so two transactions never deadlock
+            # upgrading from a read lock; the busy timeout then queues writers.
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': ';'.join(
+                f'PRAGMA {name}={value}' for name, value in sqlite_pragmas(env).items()
+            ),
+        },
+        'TEST': {'NAME': env.get('DB_TEST_NAME') or default_test_name(base_dir)},
+    }
+
+
+def postgresql_config(env=os.environ):
+    config = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': env.get('DB_NAME', 'tu7fa'),
+        'USER': env.get('DB_USER', ''),
+        'PASSWORD': env.get('DB_PASSWORD', ''),
+        'HOST': env.get('DB_HOST', ''),
+        'PORT': env.get('DB_PORT', ''),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
+    }
+    if env.get('DB_POOL_MAX_SIZE'):
+        # Pooled connections are returned after each request; Django refuses
+        # persistent connections on top of a pool.
+        config['CONN_MAX_AGE'] = 0
+        config['OPTIONS']['pool'] = {
+            'min_size': int(env.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(env['DB_POOL_MAX_SIZE']),
+        }
+    else:
+        config['CONN_MAX_AGE'] = int(env.get('DB_CONN_MAX_AGE', 60))
+    return config
+
+
+def database_config(base_dir, env=os.environ):
+    engine = env.get('DB_ENGINE', 'sqlite')
+    if engine == 'sqlite':
+        return sqlite_config(base_dir, env)
+    if engine == 'postgresql':
+        return postgresql_config(env)
+    raise ValueError(f'DB_ENGINE must be sqlite or postgresql, not {engine!r}')
+
+
+def replica_configs(base_dir, env=os.environ):
+    replicas = {}
+    for index, location in enumerate(filter(None, env.get('DB_REPLICAS', '').split(','))):
+        config = database_config(base_dir, env)
+        if config['ENGINE'].endswith('sqlite3'):
+            config['NAME'] = location.strip()
+        else:
+            config['HOST'] = location.strip()
+        # Tests run against a single database: replicas read the primary
+        config['TEST'] = {'MIRROR': 'default'}
+        replicas[f'replica_{index}'] = config
+    return replicas
@@ -0,0 +1,159 @@
+import csv
+import io
+import re
+import uuid
+import zlib
+from datetime import datetime, time, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from inventory.models import Item
+from sales.models import ArchivedOffer, ArchivedOrder, Offer, Order
+from users.models import ClientProfile, MaalemProfile
+
+CHUNK_SIZE = 2000
+# Rows are written into a buffer and flushed in batches to keep the number of
+# yielded chunks (and syscalls) low without holding more than a batch in memory.
+ROWS_PER_FLUSH = 500
+FORMATS = ('csv', 'ndjson')
+# Names of the files queued exports are written to, in EXPORT_DIR
+FILE_NAME = re.compile(r'[a-z_]+-[0-9a-f]{32}\.(csv|ndjson)(\.gz)?')
+
+
+class ExportError(ValueError):
+    pass
+
+
+class Dataset:
+    def __init__(self, model, date_field=None):
+        self.model = model
+        self.date_field = date_field
+        # column name (as exposed by the serializers) -> database attribute
+        self.columns = {field.name: field.attname for field in model._meta.concrete_fields}
+
+    def select(self, fields):
+        if not fields:
+            return list(self.columns)
+        unknown = [name for name in fields if name not in self.columns]
+        if unknown:
+            raise ExportError(f'unknown fields: {", ".join(unknown)}')
+        return fields
+
+    def rows(self, fields, since=None, until=None, chunk_size=CHUNK_SIZE):
+        queryset = self.model.objects.order_by('pk')
+        # Rows are fetched while streaming, after the request's routing context
+        # is gone, so bind the database chosen for this request now.
+        queryset = queryset.using(queryset.db)
+        if since or until:
+            if not self.date_field:
+                raise ExportError('this dataset has no date to filter on')
+            if since:
+                queryset = queryset.filter(**{f'{self.date_field}__gte': since})
+            if until:
+                queryset = queryset.filter(**{f'{self.date_field}__lt': until})
+        attnames = [self.columns[name] for name in fields]
+        return queryset.values_list(*attnames).iterator(chunk_size=chunk_size)
+
+
+DATASETS = {
+    'clients': Dataset(ClientProfile, 'date_joined'),
+    'maalems': Dataset(MaalemProfile),
+    'items': Dataset(Item),
+    'offers': Dataset(Offer, 'date'),
+    'orders': Dataset(Order, 'order_date'),
+    'archived_offers': Dataset(ArchivedOffer, 'date'),
+    'archived_orders': Dataset(ArchivedOrder, 'order_date'),
+}
+
+
+def parse_bound(value, end=False):
+    """Accept an ISO date or datetime; a bare `until` date includes that whole day."""
+    if not value:
+        return None
+    try:
+        # Out-of-range parts (2024-13-45) raise instead of returning None.
+        # A bare date first: parse_datetime() reads one too, as midnight.
+        day = parse_date(value)
+        moment = parse_datetime(value) if day is None else None
+    except ValueError:
+        raise ExportError(f'invalid date: {value}') from None
+    if moment is None:
+        if day is None:
+            raise ExportError(f'invalid date: {value}')
+        moment = datetime.combine(day, time.min)
+        if end:
+            moment += timedelta(days=1)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _csv_chunks(fields, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    pending = 0
+    for row in rows:
+        writer.writerow([value.isoformat() if isinstance(value, datetime) else value for value in row])
+        pending += 1
+        if pending >= ROWS_PER_FLUSH:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+
+def _ndjson_chunks(fields, rows):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    lines = []
+    for row in rows:
+        lines.append(encoder.encode(dict(zip(fields, row))))
+        if len(lines) >= ROWS_PER_FLUSH:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream(dataset, output='csv', fields=None, since=None, until=None, gzip=False):
+    """Return an iterator of encoded chunks for `dataset`, validating arguments eagerly."""
+    if dataset not in DATASETS:
+        raise ExportError(f'unknown dataset: {dataset}')
+    if output not in FORMATS:
+        raise ExportError(f'output must be one of {", ".join(FORMATS)}')
+    source = DATASETS[dataset]
+    fields = source.select(fields)
+    rows = source.rows(fields, since, until)
+    encode = _csv_chunks if output == 'csv' else _ndjson_chunks
+    chunks = (chunk.encode('utf-8') for chunk in encode(fields, rows))
+    return _gzipped(chunks) if gzip else chunks
+
+
+def streams_inline(since, until):
+    """Whether a range is small enough to stream from the request; the others go to a worker."""
+    return since is not None and until is not None and until - since <= timedelta(days=settings.EXPORT_INLINE_MAX_DAYS)
+
+
+def new_file_name(dataset, output='csv', gzip=False):
+    return f'{dataset}-{uuid.uuid4().hex}.{output}' + ('.gz' if gzip else '')
+
+
+def file_path(name):
+    """Path of a queued export in EXPORT_DIR, or None for a name no export is written to."""
+    if not FILE_NAME.fullmatch(name):
+        return None
+    return Path(settings.EXPORT_DIR) / name
@@ -0,0 +1,176 @@
+"""
+Structured, non-blocking logging.
+
+Records are turned into plain dicts on the calling thread and put on a
+bounded in-memory queue; a listener thread writes them to stdout as JSON
+lines. A slow or blocked stdout therefore never stalls a request: at worst
+the queue fills up and further records are dropped and counted.
+
+Log events with a short dotted name and the details as `extra`:
+
+    logger.info('offer.rejected', extra={'errors': serializer.errors})
+
+Every line carries the id of the request it was logged under (taken from
+an incoming X-Request-ID header or generated, and echoed in the response).
+
+LOG_LEVEL           root level (INFO)
+LOG_QUEUE_SIZE      records buffered before dropping (10000)
+LOG_SAMPLE_RATES    fraction of records kept per event, for high-volume
+                    events, e.g. "request=0.1,offer.received=0.01". Warnings
+                    and errors are never sampled out.
+"""
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueListener
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+_request_id = ContextVar('request_id', default=None)
+_VALID_REQUEST_ID = re.compile(r'^[\w.-]{1,64}$')
+# Attributes every LogRecord has; anything else on a record came from `extra`
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+access_logger = logging.getLogger('api.requests')
+
+
+def current_request_id():
+    return _request_id.get()
+
+
+def parse_sample_rates(value):
+    """'request=0.1,offer.received=0.01' -> {'request': 0.1, 'offer.received': 0.01}"""
+    rates = {}
+    for part in (value or '').split(','):
+        event, _, rate = part.partition('=')
+        if event.strip() and rate.strip():
+            rates[event.strip()] = float(rate)
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = rates or {}
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(record.msg)
+        return rate is None or random.random() < rate
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps(record.msg, default=str, ensure_ascii=False)
+
+
+class QueueJSONHandler(logging.Handler):
+    """
+    Handler that only enqueues. The listener thread is started on first use
+    and again after a fork, since threads do not survive into a forked
+    worker.
+    """
+    def __init__(self, stream=None, maxsize=10000, level=logging.NOTSET):
+        super().__init__(level)
+        self.queue = queue.Queue(maxsize)
+        self.target = logging.StreamHandler(stream or sys.stdout)
+        self.target.setFormatter(JSONFormatter())
+        self.listener = None
+        self.dropped = 0
+        self._pid = None
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        # logging.shutdown() closes the handler at exit, which drains the queue
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+
+    def prepare(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'event': record.getMessage(),
+            'request_id': _request_id.get(),
+        }
+        if entry['request_id'] is None:
+            # django.request logs after the middleware has returned, but passes the request
+            entry['request_id'] = getattr(getattr(record, 'request', None), 'id', None)
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = logging.Formatter().formatException(record.exc_info)
+        # Only the dict crosses the thread boundary, not arguments that may change later
+        return logging.makeLogRecord({'msg': entry, 'levelno': record.levelno, 'levelname': record.levelname})
+
+    def emit(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(self.prepare(record))
+        except queue.Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        if self.listener is not None and self._pid == os.getpid():
+            self.listener.stop()
+            self.listener = None
+            self._pid = None
+        super().close()
+
+
+class RequestIdMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token, started = self._begin(request)
+        try:
+            response = self.get_response(request)
+            self._finish(request, response, started)
+        finally:
+            _request_id.reset(token)
+        return response
+
+    async def __acall__(self, request):
+        token, started = self._begin(request)
+        try:
+            response = await self.get_response(request)
+            self._finish(request, response, started)
+        finally:
+            _request_id.reset(token)
+        return response
+
+    def _begin(self, request):
+        incoming = request.META.get('HTTP_X_REQUEST_ID', '')
+        request.id = incoming if _VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex
+        return _request_id.set(request.id), time.perf_counter()
+
+    def _finish(self, request, response, started):
+        response['X-Request-ID'] = request.id
+        access_logger.info('request', extra={
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+        })
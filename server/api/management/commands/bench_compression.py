@@ -0,0 +1,104 @@
+import gzip
+import json
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+
+from api.compression import brotli
+from inventory.models import Item
+
+ENDPOINTS = {
+    'items': '/inventory/item/',
+    'orders': '/sales/orders/',
+    'offers': '/sales/offers/',
+    'notifications': '/notify/notifications/',
+    'export_orders': '/export/orders/?output=ndjson',  # streamed
+}
+CODINGS = ['identity', 'gzip'] + (['br'] if brotli else [])
+SWEEP = {
+    'gzip': lambda body, level: gzip.compress(body, compresslevel=level),
+    'br': lambda body, level: brotli.compress(body, mode=brotli.MODE_TEXT, quality=level),
+}
+LEVELS = {'gzip': [1, 3, 5, 6, 9], 'br': [1, 3, 4, 5, 6, 9, 11]}
+
+
+def body_of(response):
+    return b''.join(response.streaming_content) if response.streaming else response.content
+
+
+def decode(coding, body):
+    if coding == 'gzip':
+        return gzip.decompress(body)
+    if coding == 'br':
+        return brotli.decompress(body)
+    return body
+
+
+class Command(BaseCommand):
+    help = ('Measure response size and end-to-end time of the large list endpoints with no, gzip '
+            'and brotli compression, plus a compression level sweep.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help='Generate data up to this many items.')
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--bandwidth', type=float, default=1.6,
+                            help='Link speed in Mbit/s used to estimate transfer time (1.6: slow 4G).')
+
+    def handle(self, *args, rows, repeat, bandwidth, **options):
+        client = Client()
+        with transaction.atomic():
+            if Item.objects.count() < rows:
+                self.stderr.write(f'Generating about {rows} items (rolled back afterwards)')
+                call_command('generate_data', stdout=StringIO(), seed=0, maalems=max(1, rows // 20), clients=rows // 4)
+            endpoints = {name: self.measure(client, path, repeat, bandwidth) for name, path in ENDPOINTS.items()}
+            sweep = self.sweep(body_of(client.get(ENDPOINTS['items'])), repeat)
+            transaction.set_rollback(True)
+        self.stdout.write(json.dumps(
+            {'bandwidth_mbit': bandwidth, 'endpoints': endpoints, 'level_sweep_items': sweep}, indent=2
+        ))
+
+    def measure(self, client, path, repeat, bandwidth):
+        results, identity = {}, None
+        for coding in CODINGS:
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                response = client.get(path, HTTP_ACCEPT_ENCODING=coding)
+                body = body_of(response)
+                timings.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise CommandError(f'{path} returned {response.status_code}')
+            sent = response.get('Content-Encoding', 'identity')
+            if identity is None:
+                identity = body
+            elif decode(sent, body) != identity:
+                raise CommandError(f'{path}: {coding} body does not decode to the uncompressed body')
+            server_ms = min(timings) * 1000
+            transfer_ms = len(body) * 8 / (bandwidth * 1000)
+            results[coding] = {
+                'content_encoding': sent,
+                'bytes': len(body),
+                'ratio': round(len(identity) / len(body), 1),
+                'server_ms': round(server_ms, 1),
+                'transfer_ms': round(transfer_ms, 1),
+                'end_to_end_ms': round(server_ms + transfer_ms, 1),
+            }
+        return results
+
+    def sweep(self, body, repeat):
+        results = {'bytes': len(body)}
+        for coding in CODINGS[1:]:
+            for level in LEVELS[coding]:
+                timings = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    compressed = SWEEP[coding](body, level)
+                    timings.append(time.perf_counter() - started)
+                results[f'{coding}-{level}'] = {
+                    'bytes': len(compressed), 'ms': round(min(timings) * 1000, 1),
+                }
+        return results
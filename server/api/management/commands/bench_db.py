@@ -0,0 +1,129 @@
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections, transaction
+
+from api.database import sqlite_pragmas
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS bench_write (worker INTEGER, payload TEXT)',
+    'CREATE TABLE IF NOT EXISTS bench_counter (id INTEGER PRIMARY KEY, hits INTEGER)',
+]
+
+# Raw sqlite3 settings for the two modes being compared: the stock Django
+# configuration before api/database.py, and the tuned one it now produces.
+SQLITE_PROFILES = {
+    'sqlite-default': {
+        'pragmas': {'journal_mode': 'DELETE', 'synchronous': 'FULL'},
+        'timeout': 5.0,
+        'begin': 'BEGIN',
+    },
+    'sqlite-wal': {
+        'pragmas': sqlite_pragmas(),
+        'timeout': 20.0,
+        'begin': 'BEGIN IMMEDIATE',
+    },
+}
+
+
+def _transaction(cursor, worker):
+    # Mirrors a like/offer write: read a hot row, insert, bump the hot row
+    cursor.execute('SELECT hits FROM bench_counter WHERE id = 1')
+    cursor.execute(f"INSERT INTO bench_write (worker, payload) VALUES ({int(worker)}, 'x')")
+    cursor.execute('UPDATE bench_counter SET hits = hits + 1 WHERE id = 1')
+
+
+class Command(BaseCommand):
+    help = 'Compare concurrent write throughput of SQLite journal modes and, optionally, a configured database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--writes', type=int, default=500, help='Transactions per thread.')
+        parser.add_argument('--database', action='append', default=[],
+                            help='Also benchmark this DATABASES alias (may be repeated).')
+
+    def handle(self, *args, threads, writes, database, **options):
+        results = []
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, profile in SQLITE_PROFILES.items():
+                results.append(self._run(name, threads, writes, self._sqlite_worker(Path(tmp) / f'{name}.db', profile)))
+        for alias in database:
+            results.append(self._run(alias, threads, writes, self._django_worker(alias)))
+
+        self.stdout.write(f'{"mode":<20}{"ok":>8}{"locked":>8}{"seconds":>10}{"tx/s":>10}')
+        for name, ok, failed, elapsed in results:
+            self.stdout.write(f'{name:<20}{ok:>8}{failed:>8}{elapsed:>10.2f}{ok / elapsed:>10.0f}')
+
+    def _run(self, name, threads, writes, worker):
+        setup, work, teardown = worker
+        setup()
+        counts = [[0, 0] for _ in range(threads)]
+        pool = [threading.Thread(target=work, args=(n, writes, counts[n])) for n in range(threads)]
+        started = time.perf_counter()
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        teardown()
+        return name, sum(c[0] for c in counts), sum(c[1] for c in counts), elapsed
+
+    def _sqlite_worker(self, path, profile):
+        def connect():
+            conn = sqlite3.connect(path, timeout=profile['timeout'], isolation_level=None, check_same_thread=False)
+            for pragma, value in profile['pragmas'].items():
+                conn.execute(f'PRAGMA {pragma}={value}')
+            return conn
+
+        def setup():
+            conn = connect()
+            for statement in SCHEMA:
+                conn.execute(statement)
+            conn.execute('INSERT INTO bench_counter (id, hits) VALUES (1, 0)')
+            conn.close()
+
+        def work(worker, writes, counts):
+            conn = connect()
+            cursor = conn.cursor()
+            for _ in range(writes):
+                try:
+                    cursor.execute(profile['begin'])
+                    _transaction(cursor, worker)
+                    cursor.execute('COMMIT')
+                    counts[0] += 1
+                except sqlite3.OperationalError:
+                    if conn.in_transaction:
+                        cursor.execute('ROLLBACK')
+                    counts[1] += 1
+            conn.close()
+
+        return setup, work, lambda: None
+
+    def _django_worker(self, alias):
+        def setup():
+            with connections[alias].cursor() as cursor:
+                for statement in SCHEMA:
+                    cursor.execute(statement)
+                cursor.execute('DELETE FROM bench_counter')
+                cursor.execute('INSERT INTO bench_counter (id, hits) VALUES (1, 0)')
+
+        def work(worker, writes, counts):
+            for _ in range(writes):
+                try:
+                    with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+                        _transaction(cursor, worker)
+                    counts[0] += 1
+                except DatabaseError:
+                    counts[1] += 1
+            connections[alias].close()
+
+        def teardown():
+            with connections[alias].cursor() as cursor:
+                cursor.execute('DROP TABLE bench_write')
+                cursor.execute('DROP TABLE bench_counter')
+
+        return setup, work, teardown
@@ -0,0 +1,56 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.bench import http_load, wait_for_port
+from inventory.models import Item
+from users.models import ClientProfile
+
+SERVERS = {
+    # The current deployment path: Django's threaded WSGI server
+    'wsgi': [sys.executable, 'manage.py', 'runserver', '--noreload', '{host}:{port}'],
+    # One uvicorn process serving the async views over ASGI
+    'asgi': [sys.executable, '-m', 'uvicorn', 'api.asgi:application',
+             '--host', '{host}', '--port', '{port}', '--no-access-log', '--log-level', 'warning'],
+}
+
+
+class Command(BaseCommand):
+    help = 'Compare concurrent polling throughput of the hot read endpoints under WSGI and ASGI.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=64)
+        parser.add_argument('--duration', type=float, default=10.0)
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--server', choices=sorted(SERVERS), action='append')
+
+    def handle(self, *args, concurrency, duration, host, port, server, **options):
+        client = ClientProfile.objects.order_by('pk').first()
+        item = Item.objects.order_by('pk').first()
+        if client is None or item is None:
+            raise CommandError('Needs at least one client and one item (see generate_data).')
+        paths = [
+            f'/notify/unread-notifications/client/{client.pk}/',
+            f'/inventory/item/{item.pk}/',
+            f'/inventory/item/like-status/{client.pk}/{item.pk}/',
+        ]
+        report = {}
+        for name in server or sorted(SERVERS):
+            command = [part.format(host=host, port=port) for part in SERVERS[name]]
+            process = subprocess.Popen(
+                command, cwd=settings.BASE_DIR, env=os.environ.copy(),
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            try:
+                if not wait_for_port(host, port):
+                    raise CommandError(f'{name} server did not start: {" ".join(command)}')
+                report[name] = http_load(f'http://{host}:{port}', paths, concurrency, duration)
+            finally:
+                process.terminate()
+                process.wait()
+        self.stdout.write(json.dumps(report, indent=2))
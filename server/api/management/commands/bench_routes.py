@@ -0,0 +1,156 @@
+import json
+import os
+import subprocess
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api.bench import client_load, http_load, wait_for_port
+from api.management.commands.bench_polling import SERVERS
+from inventory.models import Item
+from notify.models import Notification
+from sales.models import Offer, Order
+from users.models import ClientProfile, MaalemProfile
+
+# Read endpoints the mobile app hits, keyed by the label used in the report.
+# Placeholders are filled with ids taken from the middle of each table.
+ENDPOINTS = {
+    'maalem_list': '/users/maalem/',
+    'maalem_search': '/users/maalem/search/?q={search}&sort=rating',
+    'maalem_detail': '/users/maalem/{maalem}/',
+    'maalem_login': '/users/maalem/login/{maalem_phone}/',
+    'client_detail': '/users/client/{client}/',
+    'client_login': '/users/client/login/{client_phone}/',
+    'item_list': '/inventory/item/',
+    'item_detail': '/inventory/item/{item}/',
+    'maalem_items': '/inventory/maalem/items/{maalem}/',
+    'maalem_summary': '/inventory/maalem/summary/{maalem}/',
+    'like_status': '/inventory/item/like-status/{client}/{item}/',
+    'item_likes': '/inventory/item/likes/{item}/',
+    'item_comments': '/inventory/item/comments/{item}/',
+    'catalog_category': '/inventory/catalog/?category={category}',
+    'catalog_entry': '/inventory/catalog/{item}/',
+    'similar_items': '/inventory/item/similar/{item}/',
+    'offer_detail': '/sales/offers/{offer}/',
+    'client_offers': '/sales/offers/client/{client}/',
+    'order_detail': '/sales/orders/{order}/',
+    'client_notifications': '/notify/client-notifications/{client}/',
+    'maalem_notifications': '/notify/maalem-notifications/{maalem}/',
+    'unread_client': '/notify/unread-notifications/client/{client}/',
+    'export_orders': '/export/orders/?output=ndjson',
+}
+
+
+def middle(model):
+    """A row from the middle of the table, so lookups are not all hitting the first page."""
+    count = model.objects.count()
+    if not count:
+        raise CommandError(f'No {model.__name__} rows; run generate_data first.')
+    return model.objects.order_by('pk')[count // 2]
+
+
+def endpoint_paths(names=None):
+    """ENDPOINTS (or the ones in `names`) with their placeholders filled in."""
+    maalem, client, item = middle(MaalemProfile), middle(ClientProfile), middle(Item)
+    ids = {
+        'maalem': maalem.pk, 'maalem_phone': maalem.phoneNumber,
+        'client': client.pk, 'client_phone': client.phoneNumber,
+        'item': item.pk, 'category': quote(item.category), 'offer': middle(Offer).pk, 'order': middle(Order).pk,
+        'search': maalem.lastname[:4],
+    }
+    return {name: ENDPOINTS[name].format(**ids) for name in names or ENDPOINTS}
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Benchmark read endpoints end to end and report latency percentiles and throughput as JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=['client', *sorted(SERVERS)], default='client',
+                            help='client: in-process test client; wsgi/asgi: spawn a local server.')
+        parser.add_argument('--url', help='Benchmark an already running server instead.')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds per endpoint.')
+        parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), action='append')
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8766)
+        parser.add_argument('--output', help='Also write the report to this file.')
+        parser.add_argument('--baseline', help='Earlier report to compare against.')
+
+    def handle(self, *args, mode, url, concurrency, duration, endpoint, host, port, output, baseline, **options):
+        paths = endpoint_paths(endpoint)
+
+        if url:
+            results = self.run(paths, lambda batch: http_load(url, batch, concurrency, duration))
+        elif mode == 'client':
+            results = self.run(paths, lambda batch: client_load(batch, concurrency, duration))
+        else:
+            results = self.serve(mode, host, port, paths, concurrency, duration)
+
+        report = {
+            'commit': git_commit(),
+            'database': connection.vendor,
+            'mode': 'url' if url else mode,
+            'concurrency': concurrency,
+            'duration': duration,
+            'rows': {model.__name__: model.objects.count() for model in
+                     (MaalemProfile, ClientProfile, Item, Offer, Order, Notification)},
+            'endpoints': results,
+        }
+        if baseline:
+            report['delta'] = self.compare(results, baseline)
+        text = json.dumps(report, indent=2)
+        if output:
+            with open(output, 'w') as fh:
+                fh.write(text + '\n')
+        self.stdout.write(text)
+
+    def run(self, paths, load):
+        # One endpoint at a time so each number reflects that route alone
+        results = {}
+        for name, path in paths.items():
+            results[name] = {'path': path, **load([path])[path]}
+            self.stderr.write(f'{name}: {results[name]["rps"]} req/s, p95 {results[name]["p95_ms"]} ms')
+        return results
+
+    def serve(self, mode, host, port, paths, concurrency, duration):
+        command = [part.format(host=host, port=port) for part in SERVERS[mode]]
+        process = subprocess.Popen(
+            command, cwd=settings.BASE_DIR, env=os.environ.copy(),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            if not wait_for_port(host, port):
+                raise CommandError(f'{mode} server did not start: {" ".join(command)}')
+            return self.run(paths, lambda batch: http_load(f'http://{host}:{port}', batch, concurrency, duration))
+        finally:
+            process.terminate()
+            process.wait()
+
+    def compare(self, results, path):
+        try:
+            with open(path) as fh:
+                previous = json.load(fh)['endpoints']
+        except (OSError, ValueError, KeyError) as exc:
+            raise CommandError(f'Cannot read baseline {path}: {exc}')
+        delta = {}
+        for name, current in results.items():
+            before = previous.get(name)
+            if not before:
+                continue
+            delta[name] = {
+                key: round((current[key] - before[key]) / before[key] * 100, 1) if before[key] else None
+                for key in ('rps', 'p50_ms', 'p95_ms', 'p99_ms')
+            }
+        return {'baseline': path, 'percent_change': delta}
@@ -0,0 +1,75 @@
+import json
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import FastJSONRenderer
+from inventory.models import Item
+from inventory.serializers import ItemListSerializer, ItemSerializer
+from notify.models import Notification
+from notify.serializers import NotificationListSerializer, NotificationSerializer
+from sales.models import Offer, Order
+from sales.serializers import OfferListSerializer, OfferSerializer, OrderListSerializer, OrderSerializer
+from users.models import ClientProfile
+from users.serializers import ClientListSerializer, ClientSerializer
+
+# model, serializer the list view used to render with, lean replacement
+LISTS = {
+    'items': (Item, ItemSerializer, ItemListSerializer),
+    'clients': (ClientProfile, ClientSerializer, ClientListSerializer),
+    'offers': (Offer, OfferSerializer, OfferListSerializer),
+    'orders': (Order, OrderSerializer, OrderListSerializer),
+    'notifications': (Notification, NotificationSerializer, NotificationListSerializer),
+}
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), body
+
+
+class Command(BaseCommand):
+    help = ('Time ModelSerializer + JSONRenderer against ValuesSerializer + FastJSONRenderer '
+            'on large list responses, generating throwaway rows when the database is too small.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5, help='Report the best of this many runs.')
+
+    def handle(self, *args, rows, repeat, **options):
+        with transaction.atomic():
+            if min(model.objects.count() for model, _, _ in LISTS.values()) < rows:
+                self.stderr.write(f'Generating at least {rows} rows per table (rolled back afterwards)')
+                # Orders come from the ~35% of offers that were accepted, the
+                # sparsest table, so size everything off that
+                call_command(
+                    'generate_data', stdout=StringIO(), seed=0, maalems=max(1, rows // 15),
+                    clients=rows, offers_per_client=4, notifications_per_client=4, likes_per_client=1,
+                    comments_per_client=0,
+                )
+            report = {name: self.measure(*spec, rows, repeat) for name, spec in LISTS.items()}
+            transaction.set_rollback(True)
+        self.stdout.write(json.dumps({'rows': rows, 'repeat': repeat, 'lists': report}, indent=2))
+
+    def measure(self, model, serializer_class, list_serializer_class, rows, repeat):
+        queryset = model.objects.order_by('pk')[:rows]
+
+        before, expected = best_of(repeat, lambda: JSONRenderer().render(serializer_class(queryset, many=True).data))
+        after, body = best_of(repeat, lambda: FastJSONRenderer().render(list_serializer_class(queryset).data))
+        if json.loads(body) != json.loads(expected):
+            raise CommandError(f'{model.__name__}: lean output differs from {serializer_class.__name__}')
+        return {
+            'rows': queryset.count(),
+            'model_serializer_ms': round(before * 1000, 1),
+            'values_serializer_ms': round(after * 1000, 1),
+            'speedup': round(before / after, 1) if after else None,
+            'bytes': len(body),
+        }
@@ -0,0 +1,138 @@
+import re
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from api.management.commands.bench_routes import ENDPOINTS, endpoint_paths
+
+# Read endpoints whose job is to go through a whole table (every item, every
+# maalem, an export); their scans are expected.
+FULL_SCANS = {'item_list', 'maalem_list', 'maalem_search', 'export_orders'}
+
+# Plan lines that read a whole table: SQLite's "SCAN <table>" (with or
+# without an index, which only changes the order) and PostgreSQL's seq scans.
+# PostgreSQL prefers a seq scan over an index on small tables, so plans are
+# taken with enable_seqscan off: one left then means no usable index.
+SCANS = {
+    'sqlite': re.compile(r'^SCAN (?!CONSTANT ROW)(\S+)'),
+    'postgresql': re.compile(r'Seq Scan on (\S+)'),
+}
+
+# A cached response runs no queries. Requests are made with every cache alias
+# swapped for a dummy, rather than clearing them, which would also drop the
+# logins, throttle buckets and replica pins of the running site.
+DUMMY_CACHE = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+
+# On SQLite an index search is also flagged when the columns it matches
+# leave more than this share of the table per lookup (an index on a column
+# with a handful of values, say), going by the statistics ANALYZE collects.
+# A statement ending in LIMIT that needs no sort stops after one page, so it
+# is not.
+SEARCH = re.compile(r'^SEARCH (\S+) USING (?:COVERING )?INDEX (\S+) \((.*)\)')
+PAGED = re.compile(r'\sLIMIT \d+(?: OFFSET \d+)?$')
+MAX_SHARE = 0.05
+MIN_ROWS = 100
+
+
+def explain(connection, sql):
+    """Plan lines of one captured statement."""
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute(f'EXPLAIN {sql}')
+        return [row[0] for row in cursor.fetchall()]
+
+
+def index_stats(connection):
+    """
+    {index: [rows, rows per value of the first column, of the first two, ...]}
+    from ANALYZE, rolled back so the database is left as it was.
+    """
+    if connection.vendor != 'sqlite':
+        return {}
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+        cursor.execute('SELECT idx, stat FROM sqlite_stat1 WHERE idx IS NOT NULL')
+        stats = {}
+        for index, stat in cursor.fetchall():
+            counts = []
+            for value in stat.split():
+                if not value.isdigit():
+                    break
+                counts.append(int(value))
+            stats[index] = counts
+        transaction.set_rollback(True, using=connection.alias)
+    return stats
+
+
+def problems(vendor, sql, plan, stats):
+    """Why a statement's plan reads more of a table than it should, one line per table."""
+    found = [f'full scan of {match.group(1)}' for line in plan if (match := SCANS[vendor].search(line.strip()))]
+    if PAGED.search(sql) and not any('TEMP B-TREE' in line for line in plan):
+        return found
+    for line in plan:
+        match = SEARCH.search(line.strip())
+        counts = stats.get(match.group(2)) if match else None
+        if not counts or len(counts) < 2:
+            continue
+        matched = sum(1 for term in match.group(3).split(' AND ') if re.fullmatch(r'\w+=\?', term))
+        rows = counts[min(matched, len(counts) - 1)]
+        if rows > max(MIN_ROWS, counts[0] * MAX_SHARE):
+            found.append(f'{match.group(2)} leaves {rows} of {counts[0]} rows of {match.group(1)} per lookup')
+    return found
+
+
+class Command(BaseCommand):
+    help = (
+        'Request the hot read endpoints, EXPLAIN every SELECT they run and fail if '
+        'any of them scans a whole table or searches it with an unselective index.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', choices=sorted(set(ENDPOINTS) - FULL_SCANS), action='append')
+
+    def handle(self, *args, endpoint, verbosity, **options):
+        aliases = [alias for alias in connections if connections[alias].vendor in SCANS]
+        if not aliases:
+            raise CommandError(f'Query plans can only be checked on {" or ".join(SCANS)}.')
+        client = Client(raise_request_exception=False)
+        plans = []
+        for name, path in endpoint_paths(endpoint or sorted(set(ENDPOINTS) - FULL_SCANS)).items():
+            with ExitStack() as stack:
+                stack.enter_context(override_settings(CACHES={alias: DUMMY_CACHE for alias in settings.CACHES}))
+                captured = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in aliases]
+                response = client.get(path)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            if response.status_code != 200:
+                raise CommandError(f'{name}: {path} returned {response.status_code}')
+            for context in captured:
+                for query in context.captured_queries:
+                    if query['sql'].lstrip().upper().startswith(('SELECT', 'WITH')):
+                        plans.append((name, context.connection, query['sql'], explain(context.connection, query['sql'])))
+
+        # Collected after the plans, which are then the ones taken without statistics
+        stats = {alias: index_stats(connections[alias]) for alias in aliases}
+        flagged = 0
+        for name in dict.fromkeys(name for name, *_ in plans):
+            selects = [(connection, sql, plan) for other, connection, sql, plan in plans if other == name]
+            failed = 0
+            for connection, sql, plan in selects:
+                found = problems(connection.vendor, sql, plan, stats[connection.alias])
+                failed += bool(found)
+                for problem in found:
+                    self.stdout.write(self.style.ERROR(f'FAIL  {name}: {problem}'))
+                if found or verbosity > 1:
+                    self.stdout.write(f'  {sql}\n' + ''.join(f'    {line}\n' for line in plan))
+            if not failed:
+                self.stdout.write(f'ok    {name} ({len(selects)} queries)')
+            flagged += failed
+        if flagged:
+            raise CommandError(f'{flagged} hot queries read more of a table than their indexes should allow')
+        self.stdout.write(self.style.SUCCESS('Every hot query is served by a selective index'))
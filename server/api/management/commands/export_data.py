@@ -0,0 +1,40 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.export import DATASETS, FORMATS, ExportError, parse_bound, stream
+
+
+class Command(BaseCommand):
+    help = 'Stream a dataset to a file or stdout as CSV or NDJSON with constant memory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(DATASETS))
+        parser.add_argument('--output', choices=FORMATS, default='csv')
+        parser.add_argument('--fields', default='', help='Comma separated column names.')
+        parser.add_argument('--since', help='ISO date or datetime (inclusive).')
+        parser.add_argument('--until', help='ISO date or datetime (a bare date includes that day).')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--file', help='Destination path; defaults to stdout.')
+
+    def handle(self, *args, dataset, output, fields, since, until, gzip, file, **options):
+        try:
+            chunks = stream(
+                dataset,
+                output=output,
+                fields=[name for name in fields.split(',') if name],
+                since=parse_bound(since),
+                until=parse_bound(until, end=True),
+                gzip=gzip,
+            )
+        except ExportError as e:
+            raise CommandError(str(e))
+        destination = open(file, 'wb') if file else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                destination.write(chunk)
+        finally:
+            if file:
+                destination.close()
+            else:
+                destination.flush()
@@ -0,0 +1,240 @@
+import contextlib
+import random
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from changes.feed import ENTITY_NAMES, record
+from inventory.models import Comment, Item, Like
+from notify.models import Notification
+from sales.models import Offer, Order, OrderRating
+from users.models import ClientProfile, MaalemProfile
+
+FIRSTNAMES = ['Hamza', 'Youssef', 'Fatima', 'Khadija', 'Omar', 'Salma', 'Mehdi', 'Aicha', 'Rachid', 'Nadia',
+              'Karim', 'Imane', 'Said', 'Zineb', 'Anas', 'Hajar', 'Brahim', 'Meryem', 'Hassan', 'Souad']
+LASTNAMES = ['El Amrani', 'Benali', 'Alaoui', 'Tazi', 'Idrissi', 'Berrada', 'Bennani', 'Chraibi', 'Fassi',
+             'Ouazzani', 'Lahlou', 'Sefrioui', 'Kettani', 'Naciri', 'Hajji', 'Zniber']
+CITIES = ['Fes', 'Marrakech', 'Rabat', 'Casablanca', 'Tanger', 'Meknes', 'Essaouira', 'Safi', 'Tetouan', 'Agadir']
+CATEGORIES = {
+    'zellige': ['Zellige table', 'Zellige fountain', 'Zellige panel'],
+    'pottery': ['Tagine pot', 'Safi bowl', 'Painted plate', 'Clay vase'],
+    'leather': ['Leather pouf', 'Babouches', 'Leather bag', 'Camel leather journal'],
+    'carpets': ['Beni Ourain rug', 'Kilim', 'Boucherouite rug', 'Azilal carpet'],
+    'woodwork': ['Cedar box', 'Thuya chest', 'Carved mirror', 'Mashrabiya screen'],
+    'metalwork': ['Brass lantern', 'Copper tray', 'Silver teapot', 'Pierced lamp'],
+}
+COMMENTS = ['Beautiful work', 'Is this handmade?', 'Can you ship to Rabat?', 'Love the colours',
+            'What are the dimensions?', 'Bought one last year, excellent quality', 'Available in blue?']
+MESSAGES = ['Your offer was accepted', 'Your order has been picked up', 'Your order was delivered',
+            'You have a new offer', 'Payment collected for your order', 'A client liked your item']
+# Weights follow what the sales funnel looks like in practice: most offers are
+# still pending or rejected, and most orders that exist have been delivered.
+OFFER_STATUSES = (['pending', 'accepted', 'rejected'], [45, 35, 20])
+ORDER_STATUSES = (['pickedUp', 'delivered', 'cash_collected', 'maalem_paid', 'returned'], [10, 25, 20, 40, 5])
+CENT = Decimal('0.01')
+
+
+@contextlib.contextmanager
+def explicit_timestamps(*fields):
+    """Let bulk_create keep the backdated values instead of stamping now()."""
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in saved:
+            field.auto_now_add = value
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with realistic synthetic marketplace data using chunked bulk inserts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--maalems', type=int, default=100)
+        parser.add_argument('--clients', type=int, default=1000)
+        parser.add_argument('--items-per-maalem', type=int, default=20)
+        parser.add_argument('--likes-per-client', type=int, default=15)
+        parser.add_argument('--comments-per-client', type=int, default=3)
+        parser.add_argument('--offers-per-client', type=int, default=4)
+        parser.add_argument('--notifications-per-client', type=int, default=5)
+        parser.add_argument('--days', type=int, default=365, help='Spread timestamps over this many past days.')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows per bulk_create batch.')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible datasets.')
+
+    def handle(self, *args, **options):
+        if options['maalems'] < 1 or options['clients'] < 1:
+            raise CommandError('Need at least one maalem and one client.')
+        self.rng = random.Random(options['seed'])
+        self.chunk_size = options['chunk_size']
+        self.now = timezone.now()
+        self.days = options['days']
+
+        with transaction.atomic():
+            maalem_ids = self.maalems(options['maalems'])
+            client_ids = self.clients(options['clients'])
+            items = self.items(maalem_ids, options['items_per_maalem'])
+            self.likes(client_ids, items, options['likes_per_client'])
+            self.comments(client_ids, items, options['comments_per_client'])
+            orders = self.offers_and_orders(client_ids, items, options['offers_per_client'])
+            self.ratings(orders)
+            self.notifications(client_ids, maalem_ids, options['notifications_per_client'])
+        # Also drops the cached responses, which bulk_create() left in place
+        call_command('recompute_ratings', stdout=StringIO())
+        call_command('rebuild_catalog', stdout=StringIO())
+        call_command('build_similar_items', full=True, stdout=StringIO())
+        self.stdout.write(self.style.SUCCESS('Synthetic dataset generated'))
+
+    def insert(self, model, objs):
+        model.objects.bulk_create(objs, batch_size=self.chunk_size)
+        if model in ENTITY_NAMES:
+            # bulk_create() sends no signals for the change feed
+            record(model, [obj.pk for obj in objs], batch_size=self.chunk_size)
+        self.stdout.write(f'{model.__name__}: {len(objs)} rows')
+        return objs
+
+    def past(self, after=None):
+        start = after or self.now - timedelta(days=self.days)
+        return start + (self.now - start) * self.rng.random()
+
+    def person(self):
+        return self.rng.choice(FIRSTNAMES), self.rng.choice(LASTNAMES)
+
+    def address(self):
+        return f'{self.rng.randint(1, 250)} Derb {self.rng.choice(LASTNAMES)}, {self.rng.choice(CITIES)}'
+
+    def phones(self, model, prefix, count):
+        # Offset past existing rows so repeated runs append instead of colliding
+        start = model.objects.count()
+        return [f'{prefix}{start + n:08d}' for n in range(count)]
+
+    def maalems(self, count):
+        objs = []
+        for phone in self.phones(MaalemProfile, '05', count):
+            firstname, lastname = self.person()
+            objs.append(MaalemProfile(firstname=firstname, lastname=lastname, address=self.address(), phoneNumber=phone))
+        return [obj.id_maalem for obj in self.insert(MaalemProfile, objs)]
+
+    def clients(self, count):
+        objs = []
+        with explicit_timestamps(ClientProfile._meta.get_field('date_joined')):
+            for phone in self.phones(ClientProfile, '07', count):
+                firstname, lastname = self.person()
+                objs.append(ClientProfile(
+                    firstname=firstname, lastname=lastname, address=self.address(), phoneNumber=phone,
+                    date_joined=self.past(),
+                ))
+            return [obj.client_id for obj in self.insert(ClientProfile, objs)]
+
+    def items(self, maalem_ids, per_maalem):
+        objs = []
+        for maalem_id in maalem_ids:
+            for _ in range(max(0, round(self.rng.gauss(per_maalem, per_maalem / 4)))):
+                category = self.rng.choice(list(CATEGORIES))
+                title = self.rng.choice(CATEGORIES[category])
+                ask = Decimal(self.rng.randint(80, 6000))
+                objs.append(Item(
+                    maalem_id=maalem_id, title=title, category=category,
+                    description=f'Handmade {title.lower()} from {self.rng.choice(CITIES)}.',
+                    photoUrl=f'https://picsum.photos/seed/tu7fa{self.rng.getrandbits(32)}/600/600',
+                    maalemAskPrice=ask, minSellPrice=(ask * Decimal('0.8')).quantize(CENT),
+                    stockQuantity=self.rng.randint(0, 12),
+                ))
+        return self.insert(Item, objs)
+
+    def sample_items(self, items, count):
+        return self.rng.sample(items, min(len(items), count))
+
+    def likes(self, client_ids, items, per_client):
+        objs = []
+        with explicit_timestamps(Like._meta.get_field('created_at')):
+            for client_id in client_ids:
+                for item in self.sample_items(items, self.rng.randint(0, 2 * per_client)):
+                    objs.append(Like(client_id=client_id, item_id=item.item_id, created_at=self.past()))
+            self.insert(Like, objs)
+
+    def comments(self, client_ids, items, per_client):
+        objs = []
+        with explicit_timestamps(Comment._meta.get_field('created_at')):
+            for client_id in client_ids:
+                for item in self.sample_items(items, self.rng.randint(0, 2 * per_client)):
+                    objs.append(Comment(
+                        client_id=client_id, item_id=item.item_id, text=self.rng.choice(COMMENTS), created_at=self.past(),
+                    ))
+            self.insert(Comment, objs)
+
+    def offers_and_orders(self, client_ids, items, per_client):
+        offers = []
+        with explicit_timestamps(Offer._meta.get_field('date')):
+            for client_id in client_ids:
+                for item in self.sample_items(items, self.rng.randint(0, 2 * per_client)):
+                    net = self.rng.uniform(float(item.minSellPrice), float(item.maalemAskPrice))
+                    net = Decimal(net).quantize(CENT)
+                    margin = (net * Decimal(str(item.platformFeePercentage)) / 100).quantize(CENT)
+                    offers.append(Offer(
+                        client_id=client_id, item_id=item.item_id, offer_quantity=self.rng.randint(1, 3),
+                        maalem_net_offer=net, platform_margin=margin, client_offer_total=net + margin,
+                        status=self.rng.choices(*OFFER_STATUSES)[0], date=self.past(),
+                    ))
+            self.insert(Offer, offers)
+
+        maalem_of = {item.item_id: item.maalem_id for item in items}
+        orders = []
+        with explicit_timestamps(Order._meta.get_field('order_date')):
+            for offer in offers:
+                if offer.status != 'accepted':
+                    continue
+                delivery_fee = Decimal(self.rng.choice([20, 30, 45]))
+                final_price = offer.client_offer_total * offer.offer_quantity + delivery_fee
+                status = self.rng.choices(*ORDER_STATUSES)[0]
+                ordered = self.past(after=offer.date)
+                order = Order(
+                    offer_id=offer.offer_id, order_quantity=offer.offer_quantity, status=status,
+                    platform_margin=offer.platform_margin * offer.offer_quantity,
+                    maalem_net=offer.maalem_net_offer * offer.offer_quantity,
+                    delivery_fee=delivery_fee, final_price=final_price,
+                    final_paid=final_price if status in ('cash_collected', 'maalem_paid') else Decimal('0.00'),
+                    pickup_address=self.address(), delivery_address=self.address(), order_date=ordered,
+                    pickup_time=ordered + timedelta(hours=self.rng.randint(2, 48)),
+                    delivery_time=ordered + timedelta(days=self.rng.randint(1, 6)) if status != 'pickedUp' else None,
+                )
+                order.client_id = offer.client_id
+                order.maalem_id = maalem_of[offer.item_id]
+                orders.append(order)
+            return self.insert(Order, orders)
+
+    def ratings(self, orders):
+        objs = []
+        # Inserted without signals; recompute_ratings rebuilds the maalem totals afterwards
+        with explicit_timestamps(OrderRating._meta.get_field('created_at')):
+            for order in orders:
+                if order.status in OrderRating.RATEABLE_STATUSES and self.rng.random() < 0.6:
+                    objs.append(OrderRating(
+                        order_id=order.order_id, client_id=order.client_id, maalem_id=order.maalem_id,
+                        score=self.rng.choices([1, 2, 3, 4, 5], [3, 5, 12, 35, 45])[0],
+                        created_at=self.past(after=order.order_date),
+                    ))
+            self.insert(OrderRating, objs)
+
+    def notifications(self, client_ids, maalem_ids, per_client):
+        client_type = ContentType.objects.get_for_model(ClientProfile)
+        maalem_type = ContentType.objects.get_for_model(MaalemProfile)
+        recipients = [(client_type, pk) for pk in client_ids] + [(maalem_type, pk) for pk in maalem_ids]
+        objs = []
+        with explicit_timestamps(Notification._meta.get_field('created_at')):
+            for content_type, object_id in recipients:
+                for _ in range(self.rng.randint(0, 2 * per_client)):
+                    created = self.past()
+                    objs.append(Notification(
+                        recipient_content_type=content_type, recipient_object_id=object_id,
+                        message=self.rng.choice(MESSAGES), created_at=created,
+                        # Older notifications have mostly been read
+                        is_read=(self.now - created).days > 7 and self.rng.random() < 0.8,
+                    ))
+            self.insert(Notification, objs)
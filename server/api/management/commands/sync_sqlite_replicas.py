@@ -0,0 +1,40 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api.routers import replicas
+
+
+class Command(BaseCommand):
+    help = 'Copy the SQLite primary into every replica file with the online backup API.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep syncing every N seconds instead of once.')
+
+    def handle(self, *args, interval, **options):
+        primary = settings.DATABASES['default']
+        if not primary['ENGINE'].endswith('sqlite3'):
+            raise CommandError('Replicas are only copied for SQLite; use streaming replication for PostgreSQL.')
+        aliases = replicas()
+        if not aliases:
+            raise CommandError('No replicas configured (set DB_REPLICAS).')
+        while True:
+            for alias in aliases:
+                started = time.perf_counter()
+                # Replica connections in this process would hold stale pages
+                connections[alias].close()
+                source = sqlite3.connect(primary['NAME'])
+                target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                    source.close()
+                self.stdout.write(f'{alias}: synced in {time.perf_counter() - started:.2f}s')
+            if not interval:
+                break
+            time.sleep(interval)
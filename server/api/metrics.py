@@ -0,0 +1,165 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.http import HttpResponse
+
+# Per-route request metrics in Prometheus text format. Buckets are fixed up
+# front and each series is a flat list of ints, so recording a request is a
+# few bisects and increments under one lock.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+DB_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+METRICS = (
+    ('http_request_duration_seconds', 'Request latency by route.', LATENCY_BUCKETS),
+    ('http_request_db_queries', 'SQL queries executed per request.', QUERY_BUCKETS),
+    ('http_request_db_seconds', 'Time spent in SQL per request.', DB_TIME_BUCKETS),
+    ('http_response_size_bytes', 'Response body size (streamed bodies are not counted).', SIZE_BUCKETS),
+)
+
+UNMATCHED = '<unmatched>'
+
+
+class Series:
+    """One histogram per metric for a (route, method, status) label set."""
+    __slots__ = ('counts', 'sums')
+
+    def __init__(self):
+        self.counts = [[0] * (len(buckets) + 1) for _, _, buckets in METRICS]
+        self.sums = [0.0] * len(METRICS)
+
+    def observe(self, values):
+        for index, value in enumerate(values):
+            if value is None:
+                continue
+            self.counts[index][bisect_left(METRICS[index][2], value)] += 1
+            self.sums[index] += value
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def observe(self, labels, values):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = Series()
+            series.observe(values)
+
+    def render(self):
+        with self.lock:
+            snapshot = [(labels, [list(c) for c in s.counts], list(s.sums)) for labels, s in self.series.items()]
+        lines = []
+        for index, (name, help_text, buckets) in enumerate(METRICS):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for (route, method, status), counts, sums in sorted(snapshot):
+                label = f'route="{route}",method="{method}",status="{status}"'
+                running = 0
+                for bound, count in zip(buckets, counts[index]):
+                    running += count
+                    lines.append(f'{name}_bucket{{{label},le="{bound}"}} {running}')
+                running += counts[index][-1]
+                lines.append(f'{name}_bucket{{{label},le="+Inf"}} {running}')
+                lines.append(f'{name}_sum{{{label}}} {sums[index]}')
+                lines.append(f'{name}_count{{{label}}} {running}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+# Functions returning extra exposition text for /metrics/, e.g. tasks.metrics.queue_metrics
+collectors = []
+
+
+class QueryCounter:
+    # A batch sub-request's queries also count for the batch (`parent`)
+    __slots__ = ('queries', 'seconds', 'parent')
+
+    def __init__(self, parent=None):
+        self.queries = 0
+        self.seconds = 0.0
+        self.parent = parent
+
+
+# The request's counter travels in a ContextVar so queries run by the async ORM
+# on executor threads (which use their own connections) are still attributed.
+_counter = ContextVar('sql_counter', default=None)
+
+
+def count_queries(execute, sql, params, many, context):
+    counter = _counter.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        while counter is not None:
+            counter.seconds += elapsed
+            counter.queries += 1
+            counter = counter.parent
+
+
+def install_query_counter(sender, connection, **kwargs):
+    # connection_created fires on every reconnect of the same wrapper
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        counter = QueryCounter(_counter.get())
+        token = _counter.set(counter)
+        try:
+            response = self.get_response(request)
+        finally:
+            _counter.reset(token)
+        self._record(request, response, counter, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        counter = QueryCounter(_counter.get())
+        token = _counter.set(counter)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _counter.reset(token)
+        self._record(request, response, counter, started)
+        return response
+
+    def _record(self, request, response, counter, started):
+        match = request.resolver_match
+        route = match.route if match else UNMATCHED
+        if route == 'metrics/':
+            return
+        size = None if response.streaming else len(response.content)
+        registry.observe(
+            (route, request.method, f'{response.status_code // 100}xx'),
+            (time.perf_counter() - started, counter.queries, counter.seconds, size),
+        )
+
+
+def metrics_view(request):
+    body = registry.render() + ''.join(collector() for collector in collectors)
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
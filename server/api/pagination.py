@@ -0,0 +1,15 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class StandardPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class KeysetPagination(CursorPagination):
+    """Cursor (keyset) pagination on the primary key: `WHERE pk > cursor LIMIT n`."""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = 'pk'
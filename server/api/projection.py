@@ -0,0 +1,73 @@
+import functools
+
+from asgiref.sync import iscoroutinefunction
+from django.http import JsonResponse
+from rest_framework import status
+
+from .serializers import ValuesSerializer
+
+# Sparse fieldsets for read endpoints:
+#   ?fields=title,maalemAskPrice,photoUrl   only these keys
+#   ?exclude=description                    every key but these
+# Views wrapped in @sparse_fields find the resolved names on
+# request.sparse_fields (None when the client asked for everything) and push
+# them into the query with only_fields() / ValuesSerializer(fields=...), so
+# unrequested columns are neither selected nor serialized.
+
+
+@functools.cache
+def available_fields(serializer_class):
+    if issubclass(serializer_class, ValuesSerializer):
+        return tuple(serializer_class.field_names())
+    return tuple(serializer_class().fields)
+
+
+def _split(value):
+    return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+
+def resolve_fields(params, available):
+    """Field names to return, in serializer order, or None for all of them."""
+    fields, exclude = _split(params.get('fields')), _split(params.get('exclude'))
+    if not fields and not exclude:
+        return None
+    unknown = [name for name in fields + exclude if name not in available]
+    if unknown:
+        raise ValueError(f'Unknown field(s) {", ".join(unknown)}; available: {", ".join(available)}')
+    return [name for name in available if (not fields or name in fields) and name not in exclude]
+
+
+def sparse_fields(serializer_class):
+    """Resolve ?fields= / ?exclude= against `serializer_class` before the view runs."""
+    def decorator(view):
+        def prepare(request):
+            try:
+                request.sparse_fields = resolve_fields(request.GET, available_fields(serializer_class))
+            except ValueError as exc:
+                return JsonResponse({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                return prepare(request) or await view(request, *args, **kwargs)
+        else:
+            @functools.wraps(view)
+            def wrapper(request, *args, **kwargs):
+                return prepare(request) or view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def only_fields(queryset, names):
+    """Load only the model columns behind `names`; annotations are left alone."""
+    if names is None:
+        return queryset
+    concrete = {field.name for field in queryset.model._meta.concrete_fields}
+    return queryset.only(queryset.model._meta.pk.name, *(name for name in names if name in concrete))
+
+
+def project(data, names):
+    """Apply a projection to an already serialized dict, e.g. a cached profile."""
+    if names is None:
+        return data
+    return {name: data[name] for name in names if name in data}
@@ -0,0 +1,28 @@
+"""
+The address of the client behind the reverse proxies in front of the API.
+
+Behind a proxy REMOTE_ADDR is the proxy's own address, shared by every
+caller. Each trusted proxy appends the address it received the request from
+to CLIENT_IP_HEADER, so the client is the entry TRUSTED_PROXIES from the
+right; anything left of it was sent by the client and cannot be trusted.
+
+CLIENT_IP_HEADER  header set by the proxies, e.g. X-Forwarded-For or X-Real-IP;
+                  empty (default) means clients connect directly
+TRUSTED_PROXIES   proxies in front of the API that append to it (1)
+"""
+from django.conf import settings
+
+
+def meta_key(header):
+    """'X-Forwarded-For' -> 'HTTP_X_FORWARDED_FOR'"""
+    return 'HTTP_' + header.upper().replace('-', '_')
+
+
+def client_ip(request):
+    header = settings.CLIENT_IP_HEADER
+    if header:
+        forwarded = [part.strip() for part in request.META.get(meta_key(header), '').split(',') if part.strip()]
+        if len(forwarded) >= settings.TRUSTED_PROXIES:
+            return forwarded[-settings.TRUSTED_PROXIES]
+    # Direct callers, or a request that did not come through the proxies
+    return request.META.get('REMOTE_ADDR', '')
@@ -0,0 +1,42 @@
+from decimal import Decimal
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - falls back to DRF's stdlib encoder
+    orjson = None
+
+
+class Encoder(JSONEncoder):
+    # Decimals as strings, like DRF's DecimalField (COERCE_DECIMAL_TO_STRING),
+    # so values() rows and serializer output render identically.
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return str(obj)
+        return super().default(obj)
+
+
+_default = Encoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer backed by orjson. Output matches DRF's compact UTF-8 JSON:
+    datetimes as ISO 8601 with 'Z' for UTC, Decimals as strings, and lazy
+    strings, UUIDs, querysets etc. through DRF's own encoder. Requests for
+    indentation other than 2 are handed to the stock renderer.
+    """
+    encoder_class = Encoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or indent not in (None, 2):
+            return super().render(data, accepted_media_type, renderer_context)
+        option = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_default, option=option)
@@ -0,0 +1,145 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+
+from .proxies import client_ip
+
+# Per-request routing state. Reads go to a replica only inside a view marked
+# with @use_replica, and never once the request (or the same client within
+# the last REPLICA_PIN_SECONDS) has written to the primary.
+#
+# The web client calls the API cross-origin without credentials, so it never
+# sends cookies back. A write therefore pins its caller in the 'default'
+# cache, by any client or maalem id in the URL (as api.throttle tells clients
+# apart) and, when CLIENT_IP_HEADER names the header trusted proxies put it
+# in, by client IP (api.proxies); REMOTE_ADDR alone may be a proxy shared by
+# everyone. The cookie still covers same-origin callers. Pins only ever send
+# more reads to the primary.
+#
+# Every process has to see the pins, so with replicas configured the
+# 'default' cache must not be locmem (check api.E001).
+
+PIN_COOKIE = 'db_pin_primary'
+PIN_CACHE = 'default'
+UNSAFE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+# URL kwargs naming the client a request is made for
+CLIENT_KWARGS = ('client_id', 'maalem_id')
+
+_routing = ContextVar('db_routing', default=None)
+
+
+class RoutingState:
+    __slots__ = ('replica_ok', 'pinned', 'wrote', 'pin_keys')
+
+    def __init__(self, pinned):
+        self.replica_ok = False
+        self.pinned = pinned
+        self.wrote = False
+        self.pin_keys = None
+
+
+def replicas():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica_')]
+
+
+def pin_keys(request, view_kwargs):
+    keys = [f'db_pin:{name}:{view_kwargs[name]}' for name in CLIENT_KWARGS if name in view_kwargs]
+    if settings.CLIENT_IP_HEADER:
+        keys.append(f'db_pin:ip:{client_ip(request)}')
+    return keys
+
+
+def use_replica(view):
+    """Mark a read-only view as safe to serve from a replica."""
+    view.use_replica = True
+    return view
+
+
+@contextmanager
+def primary_reads():
+    """Send the reads made inside the block to the primary, even in a @use_replica view."""
+    state = _routing.get()
+    if state is None:
+        yield
+        return
+    replica_ok, state.replica_ok = state.replica_ok, False
+    try:
+        yield
+    finally:
+        state.replica_ok = replica_ok
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or not state.replica_ok or state.pinned:
+            return 'default'
+        aliases = replicas()
+        return random.choice(aliases) if aliases else 'default'
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.pinned = state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+class ReplicaRoutingMiddleware:
+    # Async capable so async views under ASGI are not pushed onto a thread
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state, token = self._begin(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self._finish(request, state, response)
+
+    async def __acall__(self, request):
+        state, token = self._begin(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self._finish(request, state, response)
+
+    def _begin(self, request):
+        state = RoutingState(pinned=PIN_COOKIE in request.COOKIES)
+        return state, _routing.set(state)
+
+    def _finish(self, request, state, response):
+        if request.method in UNSAFE_METHODS or state.wrote:
+            keys = state.pin_keys if state.pin_keys is not None else pin_keys(request, {})
+            if keys:
+                caches[PIN_CACHE].set_many(dict.fromkeys(keys, 1), settings.REPLICA_PIN_SECONDS)
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _routing.get()
+        if state is None:
+            return
+        state.pin_keys = pin_keys(request, view_kwargs)
+        state.replica_ok = getattr(view_func, 'use_replica', False)
+        if state.replica_ok and not state.pinned and state.pin_keys:
+            state.pinned = bool(caches[PIN_CACHE].get_many(state.pin_keys))
@@ -0,0 +1,50 @@
+from django.db.models import QuerySet
+
+
+class ValuesSerializer:
+    """
+    Read-only list serializer that returns `.values()` rows as they come off the
+    cursor, skipping a ModelSerializer's per-field to_representation calls.
+
+    Keys and their order match a ModelSerializer with fields='__all__': the
+    primary key, the fields the ModelSerializer declares itself (`declared`),
+    the other plain fields, then foreign keys as their primary key value.
+    Decimals and datetimes are left as Python objects for FastJSONRenderer
+    to format the same way DRF's fields would.
+    """
+    model = None
+    declared = ()
+
+    def __init__(self, instance, many=True, fields=None):
+        self.instance = instance
+        self.fields = fields
+
+    @classmethod
+    def field_names(cls):
+        fields = cls.model._meta.concrete_fields
+        pk = cls.model._meta.pk
+        plain = [field.name for field in fields if not field.is_relation and field is not pk and field.name not in cls.declared]
+        related = [field.name for field in fields if field.is_relation and field.name not in cls.declared]
+        return [pk.name, *cls.declared, *plain, *related]
+
+    @property
+    def data(self):
+        names = self.field_names() if self.fields is None else self.fields
+        if isinstance(self.instance, QuerySet):
+            # values() with no names would select every column
+            return list(self.instance.values(*names)) if names else [{} for _ in self.instance.values('pk')]
+        # Already evaluated, e.g. a paginated page of model instances
+        attnames = [self.model._meta.get_field(name).attname for name in names]
+        return [
+            {name: getattr(obj, attname) for name, attname in zip(names, attnames)}
+            for obj in self.instance
+        ]
+
+
+class SparseFieldsMixin:
+    """ModelSerializer mixin: `fields=[...]` drops every other field from the output."""
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
@@ -10,8 +10,13 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
+import sys
 from pathlib import Path
 
+from .database import database_config, replica_configs
+from .logs import parse_sample_rates
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -38,15 +43,23 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework',
+    'api',
     'users',
     'inventory',
     'sales',
     'notify',
+    'tasks',
+    'changes',
     'corsheaders',
 ]
 
 MIDDLEWARE = [
+    'api.logs.RequestIdMiddleware',
+    'api.metrics.MetricsMiddleware',
+    'api.throttle.ThrottleMiddleware',
+    'api.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'api.routers.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,14 +91,151 @@ WSGI_APPLICATION = 'api.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
+# Configured from DB_* environment variables, see api/database.py
 
 DATABASES = {
+    'default': database_config(BASE_DIR),
+    **replica_configs(BASE_DIR),
+}
+
+# Views marked with api.routers.use_replica read from a replica unless the
+# client (same client/maalem id in the URL, or same IP behind CLIENT_IP_HEADER)
+# wrote within the last REPLICA_PIN_SECONDS (read-your-writes). The pins live
+# in the 'default' cache, so replicas need a CACHE_BACKEND other than locmem.
+DATABASE_ROUTERS = ['api.routers.PrimaryReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+
+
+# Cache
+# CACHE_BACKEND=locmem (per process, default) | file | db (run `manage.py createcachetable`)
+#   | redis (requires redis) | memcached (requires pymemcache); CACHE_LOCATION
+#   is the directory, table, redis URL or memcached host:port
+# RESPONSE_CACHE_BACKEND picks the same for the response cache (defaults to CACHE_BACKEND)
+# THROTTLE_CACHE_BACKEND picks the same for the rate limit buckets (defaults to CACHE_BACKEND)
+
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'db': 'django.core.cache.backends.db.DatabaseCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+    'memcached': 'django.core.cache.backends.memcached.PyMemcacheCache',
+}
+# Backends shared by every process, with atomic add() and incr()
+ATOMIC_CACHE_BACKENDS = ('redis', 'memcached')
+CACHE_LOCATIONS = {
+    'locmem': 'tu7fa',
+    'file': os.environ.get('CACHE_LOCATION', str(BASE_DIR / '.cache')),
+    'db': os.environ.get('CACHE_LOCATION', 'api_cache'),
+    'redis': os.environ.get('CACHE_LOCATION', 'redis://127.0.0.1:6379/0'),
+    'memcached': os.environ.get('CACHE_LOCATION', '127.0.0.1:11211'),
+}
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+
+RESPONSE_CACHE_LOCATIONS = {
+    'locmem': 'tu7fa-responses',
+    'file': os.environ.get('RESPONSE_CACHE_LOCATION', str(BASE_DIR / '.cache' / 'responses')),
+    'db': os.environ.get('RESPONSE_CACHE_LOCATION', 'api_response_cache'),
+    'redis': os.environ.get('RESPONSE_CACHE_LOCATION', 'redis://127.0.0.1:6379/1'),
+    'memcached': os.environ.get('RESPONSE_CACHE_LOCATION', '127.0.0.1:11211'),
+}
+RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', CACHE_BACKEND)
+
+THROTTLE_CACHE_LOCATIONS = {
+    'locmem': 'tu7fa-throttle',
+    'file': os.environ.get('THROTTLE_CACHE_LOCATION', str(BASE_DIR / '.cache' / 'throttle')),
+    'db': os.environ.get('THROTTLE_CACHE_LOCATION', 'api_throttle_cache'),
+    'redis': os.environ.get('THROTTLE_CACHE_LOCATION', 'redis://127.0.0.1:6379/2'),
+    'memcached': os.environ.get('THROTTLE_CACHE_LOCATION', '127.0.0.1:11211'),
+}
+THROTTLE_CACHE_BACKEND = os.environ.get('THROTTLE_CACHE_BACKEND', CACHE_BACKEND)
+
+# The aliases may share a memcached server, hence the key prefixes. redis and
+# memcached evict on their own and take no MAX_ENTRIES.
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': CACHE_LOCATIONS[CACHE_BACKEND],
+    },
+    # Rendered read responses (api.cache); entries carry their own freshness,
+    # the backend timeout only bounds how long stale ones are kept
+    'responses': {
+        'BACKEND': CACHE_BACKENDS[RESPONSE_CACHE_BACKEND],
+        'LOCATION': RESPONSE_CACHE_LOCATIONS[RESPONSE_CACHE_BACKEND],
+        'KEY_PREFIX': 'responses',
+        'OPTIONS': {} if RESPONSE_CACHE_BACKEND in ATOMIC_CACHE_BACKENDS else {'MAX_ENTRIES': int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 5000))},
+    },
+    # Token buckets of api.throttle; needs atomic incr() to hold across
+    # processes (locmem holds per process, file and db are not atomic)
+    'throttle': {
+        'BACKEND': CACHE_BACKENDS[THROTTLE_CACHE_BACKEND],
+        'LOCATION': THROTTLE_CACHE_LOCATIONS[THROTTLE_CACHE_BACKEND],
+        'KEY_PREFIX': 'throttle',
+        'OPTIONS': {} if THROTTLE_CACHE_BACKEND in ATOMIC_CACHE_BACKENDS else {'MAX_ENTRIES': int(os.environ.get('THROTTLE_CACHE_MAX_ENTRIES', 20000))},
+    },
 }
 
+# Phone-number login lookups (users.cache): profiles and unknown numbers
+LOGIN_CACHE_TIMEOUT = int(os.environ.get('LOGIN_CACHE_TIMEOUT', 300))
+LOGIN_CACHE_MISSING_TIMEOUT = int(os.environ.get('LOGIN_CACHE_MISSING_TIMEOUT', 30))
+
+# Tag-invalidated response cache for read views (api.cache)
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 60))
+RESPONSE_CACHE_STALE = int(os.environ.get('RESPONSE_CACHE_STALE', 30))
+RESPONSE_CACHE_WAIT = float(os.environ.get('RESPONSE_CACHE_WAIT', 2))
+RESPONSE_CACHE_LOCK_TIMEOUT = int(os.environ.get('RESPONSE_CACHE_LOCK_TIMEOUT', 10))
+
+# Seconds a pending offer holds its quantity before `manage.py expire_holds` expires it (sales.holds)
+OFFER_HOLD_SECONDS = int(os.environ.get('OFFER_HOLD_SECONDS', 48 * 3600))
+
+# Background tasks (tasks app, `manage.py runworker`). The retry delay doubles
+# per attempt up to the maximum; finished tasks are purged after the retention.
+TASK_MAX_ATTEMPTS = int(os.environ.get('TASK_MAX_ATTEMPTS', 5))
+TASK_RETRY_DELAY = int(os.environ.get('TASK_RETRY_DELAY', 10))
+TASK_RETRY_MAX_DELAY = int(os.environ.get('TASK_RETRY_MAX_DELAY', 3600))
+TASK_VISIBILITY_TIMEOUT = int(os.environ.get('TASK_VISIBILITY_TIMEOUT', 300))
+TASK_POLL_INTERVAL = float(os.environ.get('TASK_POLL_INTERVAL', 1))
+TASK_RETENTION_DAYS = int(os.environ.get('TASK_RETENTION_DAYS', 7))
+
+# Similar items kept per item by `manage.py build_similar_items` (inventory.similar)
+SIMILAR_ITEMS_COUNT = int(os.environ.get('SIMILAR_ITEMS_COUNT', 20))
+
+# Finished sales older than this move to the archive tables (sales.archive,
+# `manage.py archive_sales`)
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 180))
+
+# GET /export/<dataset>/ (api.export) streams ranges of up to this many days;
+# longer or open-ended ones are written to EXPORT_DIR by a worker
+# (api.tasks.export_dataset) and served from /export/files/<name>/, so web
+# and worker processes need to share the directory
+EXPORT_INLINE_MAX_DAYS = int(os.environ.get('EXPORT_INLINE_MAX_DAYS', 31))
+EXPORT_DIR = os.environ.get('EXPORT_DIR', str(BASE_DIR / 'exports'))
+
+# Change feed pages (changes app, GET /changes/)
+CHANGES_PAGE_SIZE = int(os.environ.get('CHANGES_PAGE_SIZE', 500))
+CHANGES_MAX_PAGE_SIZE = int(os.environ.get('CHANGES_MAX_PAGE_SIZE', 2000))
+
+# Per-client limits on GET requests, per route group (api.throttle):
+# group=rate[:burst], rate as n/s, n/m or n/h. Unlisted groups are not limited.
+# On by default only with a shared THROTTLE_CACHE_BACKEND; with a per-process
+# one every worker would keep its own buckets (check api.W001).
+THROTTLE_RATES = os.environ.get(
+    'THROTTLE_RATES',
+    'notify=1/s:10,inventory=5/s:30,sales=5/s:30' if THROTTLE_CACHE_BACKEND in ATOMIC_CACHE_BACKENDS else '',
+)
+
+# Reverse proxies in front of the API (api.proxies): the header they put the
+# client address in, e.g. X-Forwarded-For, and how many of them append to it
+CLIENT_IP_HEADER = os.environ.get('CLIENT_IP_HEADER', '')
+TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', 1))
+
+# Sub-requests accepted by one POST /batch/ (api.batch)
+BATCH_MAX_REQUESTS = int(os.environ.get('BATCH_MAX_REQUESTS', 20))
+
+# Response compression (api.compression)
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 860))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -123,4 +273,39 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
-CORS_ALLOW_ALL_ORIGINS = True
\ No newline at end of file
+CORS_ALLOW_ALL_ORIGINS = True
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# Structured JSON logging through a background thread (api.logs). Under
+# `manage.py test` only errors are printed unless LOG_LEVEL asks for more.
+TESTING = sys.argv[1:2] == ['test']
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'ERROR' if TESTING else 'INFO')
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'sample': {
+            '()': 'api.logs.SamplingFilter',
+            'rates': parse_sample_rates(os.environ.get('LOG_SAMPLE_RATES')),
+        },
+    },
+    'handlers': {
+        'queue': {
+            'class': 'api.logs.QueueJSONHandler',
+            'stream': 'ext://sys.stdout',
+            'maxsize': int(os.environ.get('LOG_QUEUE_SIZE', 10000)),
+            'filters': ['sample'],
+        },
+    },
+    'root': {'handlers': ['queue'], 'level': LOG_LEVEL},
+    'loggers': {
+        # Replaces Django's console handler so its records are not printed twice
+        'django': {'handlers': ['queue'], 'level': LOG_LEVEL, 'propagate': False},
+        'django.server': {'handlers': ['queue'], 'level': LOG_LEVEL, 'propagate': False},
+    },
+}
@@ -0,0 +1,17 @@
+import os
+
+from django.core.management import call_command
+
+from tasks.registry import task
+
+
+@task(max_attempts=2)
+def export_dataset(dataset, file, output='csv', fields='', since=None, until=None, gzip=False):
+    """`manage.py export_data` in the background, written to `file` on the worker's disk.
+
+    The file only appears once complete, so GET /export/files/<name>/ never serves half of one.
+    """
+    os.makedirs(os.path.dirname(file) or '.', exist_ok=True)
+    partial = f'{file}.part'
+    call_command('export_data', dataset, output=output, fields=fields, since=since, until=until, gzip=gzip, file=partial)
+    os.replace(partial, file)
@@ -0,0 +1,128 @@
+"""
+Shared fixtures for the test modules of every app: the seeded dataset the
+query budgets run against, and request payloads for it.
+"""
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
+
+from inventory import similar
+from inventory.models import Comment, Item, Like
+from notify.models import Notification
+from sales.models import Offer, Order, OrderRating
+from users.models import AdminProfile, ClientProfile, MaalemProfile
+
+
+def profile_data(ctx, phone):
+    return {'firstname': 'New', 'lastname': 'Person', 'address': 'Fes', 'phoneNumber': phone}
+
+
+def item_data(ctx):
+    return {
+        'title': 'Zellige tile', 'description': 'Hand cut', 'category': 'zellige',
+        'photoUrl': 'https://example.com/tile.jpg', 'maalemAskPrice': '100.00', 'minSellPrice': '90.00',
+    }
+
+
+def offer_data(ctx):
+    return {
+        'offer_quantity': 1, 'maalem_net_offer': '100.00', 'client_offer_total': '110.00',
+        'platform_margin': '10.00', 'client': ctx['client'], 'item': ctx['item'],
+    }
+
+
+def order_data(ctx):
+    return {
+        'order_quantity': 1, 'platform_margin': '10.00', 'maalem_net': '100.00', 'delivery_fee': '20.00',
+        'final_price': '130.00', 'pickup_address': 'Fes', 'delivery_address': 'Rabat',
+        'offer': ctx['pending_offer'], 'offer_id': ctx['pending_offer'],
+    }
+
+
+def seed(scale):
+    """
+    `scale` maalems with `scale` items each, `scale` clients who like, comment
+    on and make offers for every item of the first maalem, orders and ratings
+    for half of those offers, and `scale` notifications per profile. Returns
+    the ids the budgeted calls refer to.
+    """
+    maalems = [
+        MaalemProfile.objects.create(firstname=f'Maalem{n}', lastname='Fassi', address='Fes', phoneNumber=f'05{n:08}')
+        for n in range(scale)
+    ]
+    clients = [
+        ClientProfile.objects.create(firstname=f'Client{n}', lastname='Alami', address='Rabat', phoneNumber=f'06{n:08}')
+        for n in range(scale)
+    ]
+    items = [
+        Item.objects.create(
+            maalem=maalem, title=f'Item {maalem.pk}-{n}', description='Handmade', category='pottery',
+            photoUrl='https://example.com/item.jpg', maalemAskPrice=Decimal('100.00'),
+            minSellPrice=Decimal('90.00'), stockQuantity=scale * 4,
+        )
+        for maalem in maalems for n in range(scale)
+    ]
+    catalog = [item for item in items if item.maalem_id == maalems[0].pk]
+    orders = []
+    for client in clients:
+        for n, item in enumerate(catalog):
+            Like.objects.create(client=client, item=item)
+            Comment.objects.create(client=client, item=item, text='Lovely work')
+            offer = Offer.objects.create(
+                client=client, item=item, offer_quantity=1, maalem_net_offer=Decimal('100.00'),
+                client_offer_total=Decimal('110.00'), platform_margin=Decimal('10.00'),
+                status='accepted' if n % 2 == 0 else 'pending',
+            )
+            if offer.status == 'accepted':
+                orders.append(Order.objects.create(
+                    offer=offer, order_quantity=1, platform_margin=Decimal('10.00'), maalem_net=Decimal('100.00'),
+                    delivery_fee=Decimal('20.00'), final_price=Decimal('130.00'), pickup_address='Fes',
+                    delivery_address='Rabat', status='delivered',
+                ))
+    for order in orders[1:]:
+        OrderRating.objects.create(order=order, client_id=order.offer.client_id, maalem=maalems[0], score=4)
+
+    for model, profiles in ((MaalemProfile, maalems), (ClientProfile, clients)):
+        content_type = ContentType.objects.get_for_model(model)
+        for profile in profiles:
+            for n in range(scale):
+                Notification.objects.create(
+                    message=f'Update {n}', recipient_content_type=content_type,
+                    recipient_object_id=profile.pk, is_read=n % 2 == 0,
+                )
+    AdminProfile.objects.create(username='admin', password='secret')
+
+    # Related rows for the delete calls, without orders (which PROTECT offers)
+    spare_maalem = MaalemProfile.objects.create(firstname='Spare', lastname='Maalem', address='Sale', phoneNumber='0599999999')
+    spare_client = ClientProfile.objects.create(firstname='Spare', lastname='Client', address='Sale', phoneNumber='0699999999')
+    spare_items = [
+        Item.objects.create(
+            maalem=maalem, title='Spare', description='Spare', category='spare',
+            photoUrl='https://example.com/spare.jpg', maalemAskPrice=Decimal('10.00'), minSellPrice=Decimal('5.00'),
+        )
+        for maalem in (maalems[0], spare_maalem) for _ in range(scale)
+    ]
+    for client in clients + [spare_client]:
+        for item in spare_items:
+            Like.objects.create(client=client, item=item)
+            Comment.objects.create(client=client, item=item, text='Spare')
+
+    similar.build()
+
+    rateable_order = orders[0]
+    client = ClientProfile.objects.get(pk=rateable_order.offer.client_id)
+    return {
+        'maalem': maalems[0].pk,
+        'maalem_phone': maalems[0].phoneNumber,
+        'client': client.pk,
+        'client_phone': client.phoneNumber,
+        'item': catalog[0].pk,
+        'pending_offer': Offer.objects.filter(client=client, status='pending').first().pk,
+        'order': orders[-1].pk,
+        'rateable_order': rateable_order.pk,
+        'notification': Notification.objects.first().pk,
+        'spare_maalem': spare_maalem.pk,
+        'spare_client': spare_client.pk,
+        'spare_item': spare_items[0].pk,
+        'export_dataset': 'orders',
+    }
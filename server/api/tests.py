@@ -0,0 +1,920 @@
+import gzip
+import json
+import logging
+import random
+import re
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.http import HttpResponse, JsonResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver
+from django.urls.resolvers import URLResolver
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from api.cache import cache_key, cache_response
+from api.checks import check_pin_cache, check_throttle_cache
+from api.compression import brotli, choose_encoding
+from api.database import database_config, replica_configs
+from api.export import new_file_name, parse_bound
+from api.logs import QueueJSONHandler, SamplingFilter, access_logger, parse_sample_rates
+from api.metrics import LATENCY_BUCKETS, Registry
+from api.projection import resolve_fields
+from api.proxies import client_ip
+from api.renderers import FastJSONRenderer
+from api.routers import PIN_COOKIE, PrimaryReplicaRouter, ReplicaRoutingMiddleware, use_replica
+from api.testing import item_data, offer_data, order_data, profile_data, seed
+from api.throttle import parse_rates, take
+from inventory.models import CatalogEntry, Item
+from inventory.serializers import ItemListSerializer, ItemSerializer
+from notify.models import Notification
+from notify.serializers import NotificationListSerializer, NotificationSerializer
+from sales.models import Offer, Order, OrderRating
+from tasks.models import Task
+from tasks.registry import REGISTRY
+from sales.serializers import OfferListSerializer, OfferSerializer, OrderListSerializer, OrderSerializer
+from users.models import ClientProfile, MaalemProfile
+from users.serializers import ClientListSerializer, ClientSerializer, MaalemListSerializer, MaalemSerializer
+
+# Query budgets for every API route. Each call is made against a small and a
+# large seeded dataset and must stay within the same budget on both, so a
+# view whose query count grows with the data (an N+1) fails here. New routes
+# fail test_every_route_has_a_budget until they declare one.
+
+SKIPPED_PREFIXES = ('admin/',)
+
+
+class Call:
+    def __init__(self, method, budget, query='', data=None, **params):
+        self.method = method
+        self.budget = budget
+        self.query = query
+        self.data = data or (lambda ctx: None)
+        # path parameter -> key in the seeded context
+        self.params = params
+
+    def path(self, route, ctx):
+        path = route
+        for name, key in self.params.items():
+            value = ctx[key]
+            path = path.replace(f'<int:{name}>', str(value)).replace(f'<str:{name}>', str(value))
+        assert '<' not in path, f'unfilled parameter in {path}'
+        return '/' + path + (f'?{self.query}' if self.query else '')
+
+
+BUDGETS = {
+    'users/maalem/': [Call('GET', 1)],
+    'users/maalem/search/': [Call('GET', 2, query='q=maalem&sort=items')],
+    'users/maalem/<int:id>/': [Call('GET', 1, id='maalem')],
+    'users/maalem/login/<str:phoneNumber>/': [Call('GET', 1, phoneNumber='maalem_phone')],
+    'users/maalem/post/': [Call('POST', 3, data=lambda ctx: profile_data(ctx, '0700000000'))],
+    'users/maalem/delete/<int:id>/': [Call('DELETE', 14, id='spare_maalem')],
+    'users/maalem/update/<int:id>/': [Call('PUT', 6, data=lambda ctx: profile_data(ctx, '0700000001'), id='maalem')],
+    'users/client/': [Call('GET', 1)],
+    'users/client/<int:id>/': [Call('GET', 1, id='client')],
+    'users/client/login/<str:phoneNumber>/': [Call('GET', 1, phoneNumber='client_phone')],
+    'users/client/post/': [Call('POST', 3, data=lambda ctx: profile_data(ctx, '0611111110'))],
+    'users/client/delete/<int:id>/': [Call('DELETE', 12, id='spare_client')],
+    'users/client/update/<int:id>/': [Call('PUT', 5, data=lambda ctx: profile_data(ctx, '0611111111'), id='client')],
+    'users/admin/': [Call('GET', 1)],
+    'users/admin-secret-path-login/': [Call('POST', 1, data=lambda ctx: {'username': 'admin', 'password': 'secret'})],
+
+    'inventory/item/': [Call('GET', 1)],
+    'inventory/item/<int:id>/': [Call('GET', 1, id='item')],
+    'inventory/item/post/': [Call('POST', 4, data=lambda ctx: {**item_data(ctx), 'maalem': ctx['maalem']})],
+    'inventory/item/delete/<int:id>/': [Call('DELETE', 10, id='spare_item')],
+    'inventory/item/put/': [Call('PUT', 4, data=lambda ctx: {'item_id': ctx['item'], 'title': 'Renamed'})],
+    'inventory/catalog/': [Call('GET', 1, query='category=pottery&in_stock=1')],
+    'inventory/catalog/<int:id>/': [Call('GET', 1, id='item')],
+    'inventory/item/similar/<int:item_id>/': [Call('GET', 1, item_id='spare_item')],
+    'inventory/maalem/items/<int:maalem_id>/': [Call('GET', 1, maalem_id='maalem')],
+    'inventory/maalem/summary/<int:maalem_id>/': [Call('GET', 7, maalem_id='maalem')],
+    'inventory/maalem/items/post/<int:maalem_id>/': [Call('POST', 4, data=item_data, maalem_id='maalem')],
+    'inventory/maalem/items/delete/<int:maalem_id>/': [
+        Call('DELETE', 10, data=lambda ctx: {'item_id': ctx['spare_item']}, maalem_id='maalem'),
+    ],
+    'inventory/maalem/items/put/<int:maalem_id>/': [
+        Call('PUT', 4, data=lambda ctx: {'item_id': ctx['item'], 'title': 'Renamed'}, maalem_id='maalem'),
+    ],
+    'inventory/item/like/<int:client_id>/': [
+        Call('POST', 3, data=lambda ctx: {'item_id': ctx['spare_item']}, client_id='client'),
+    ],
+    'inventory/item/dislike/<int:client_id>/': [
+        Call('POST', 6, data=lambda ctx: {'item_id': ctx['item']}, client_id='client'),
+    ],
+    'inventory/item/comment/<int:client_id>/': [
+        Call('POST', 2, data=lambda ctx: {'item_id': ctx['item'], 'text': 'Beautiful'}, client_id='client'),
+    ],
+    'inventory/item/like-status/<int:client_id>/<int:item_id>/': [Call('GET', 2, client_id='client', item_id='item')],
+    'inventory/item/likes/<int:item_id>/': [Call('GET', 2, item_id='item')],
+    'inventory/item/comments/<int:item_id>/': [Call('GET', 2, item_id='item')],
+
+    # ?include_archived=1: one more query for the archive table
+    'sales/offers/': [Call('GET', 1), Call('GET', 2, query='include_archived=1')],
+    'sales/offers/create/': [Call('POST', 9, data=offer_data)],
+    'sales/offers/<int:offer_id>/': [
+        Call('GET', 1, offer_id='pending_offer'),
+        Call('PATCH', 6, data=lambda ctx: {'status': 'rejected'}, offer_id='pending_offer'),
+        Call('DELETE', 5, offer_id='pending_offer'),
+    ],
+    'sales/offers/client/<int:client_id>/': [
+        Call('GET', 1, client_id='client'),
+        Call('GET', 2, query='include_archived=1', client_id='client'),
+    ],
+    'sales/orders/': [Call('GET', 1), Call('GET', 2, query='include_archived=1')],
+    'sales/orders/create/': [Call('POST', 13, data=order_data)],
+    'sales/orders/<int:order_id>/': [
+        Call('GET', 1, order_id='order'),
+        Call('PATCH', 3, data=lambda ctx: {'status': 'maalem_paid'}, order_id='order'),
+        Call('DELETE', 8, order_id='order'),
+    ],
+    'sales/orders/<int:order_id>/rate/': [
+        Call('POST', 8, data=lambda ctx: {'client': ctx['client'], 'score': 4}, order_id='rateable_order'),
+    ],
+    'sales/offers/make-offer/': [Call('POST', 9, data=offer_data)],
+    'sales/orders/create-order/': [Call('POST', 13, data=order_data)],
+
+    'notify/notifications/': [Call('GET', 1)],
+    'notify/notifications/create/': [
+        Call('POST', 4, data=lambda ctx: {'recipient_type': 'client', 'recipient_id': ctx['client'], 'message': 'Hi'}),
+    ],
+    'notify/notifications/<int:notification_id>/': [Call('GET', 1, notification_id='notification')],
+    'notify/notifications/<int:notification_id>/update-delete/': [
+        Call('PATCH', 3, data=lambda ctx: {'is_read': True}, notification_id='notification'),
+        Call('DELETE', 3, notification_id='notification'),
+    ],
+    'notify/client-notifications/<int:client_id>/': [Call('GET', 1, client_id='client')],
+    'notify/maalem-notifications/<int:maalem_id>/': [Call('GET', 1, maalem_id='maalem')],
+    'notify/unread-notifications/client/<int:client_id>/': [Call('GET', 1, client_id='client')],
+    'notify/unread-notifications/maalem/<int:maalem_id>/': [Call('GET', 1, maalem_id='maalem')],
+
+    # One query for the page, one per type in it
+    'changes/': [Call('GET', 7)],
+
+    'metrics/': [Call('GET', 2)],
+    'export/<str:dataset>/': [
+        Call('GET', 1, query='output=ndjson&since=2000-01-01&until=2000-01-31', dataset='export_dataset'),
+        # Queued for a worker, once the request commits
+        Call('GET', 0, query='output=ndjson', dataset='export_dataset'),
+    ],
+    'export/files/<str:name>/': [Call('GET', 0, name='export_file')],
+    # The product page in one round trip: the sum of its parts, nothing more
+    'batch/': [Call('POST', 6, data=lambda ctx: {'requests': [
+        {'path': f'/inventory/item/{ctx["item"]}/'},
+        {'path': f'/inventory/item/likes/{ctx["item"]}/'},
+        {'path': f'/inventory/item/comments/{ctx["item"]}/'},
+        {'path': f'/users/maalem/{ctx["maalem"]}/'},
+    ]})],
+}
+
+
+def api_routes():
+    routes = []
+
+    def walk(patterns, prefix):
+        for pattern in patterns:
+            route = prefix + str(pattern.pattern)
+            if route.startswith(SKIPPED_PREFIXES):
+                continue
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns, route)
+            else:
+                routes.append(route)
+
+    walk(get_resolver().url_patterns, '')
+    return routes
+
+
+class QueryBudgetMixin:
+    scale = None
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ctx = seed(cls.scale)
+        # A finished export for GET /export/files/<name>/
+        directory = cls.enterClassContext(tempfile.TemporaryDirectory())
+        cls.enterClassContext(override_settings(EXPORT_DIR=directory))
+        cls.ctx['export_file'] = new_file_name('orders')
+        Path(directory, cls.ctx['export_file']).write_text('order_id\n')
+
+    def measure(self, route, call):
+        """Make `call` (after a warm-up run) and return (response, captured queries), rolling back its writes."""
+        client = APIClient()
+        path = call.path(route, self.ctx)
+        data = call.data(self.ctx)
+        for _ in range(2):
+            for cache in caches.all():
+                cache.clear()
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as queries:
+                    request = getattr(client, call.method.lower())
+                    response = request(path) if data is None else request(path, data, format='json')
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                transaction.set_rollback(True)
+        return response, queries
+
+    def test_query_budgets(self):
+        for route, calls in BUDGETS.items():
+            for call in calls:
+                with self.subTest(route=route, method=call.method):
+                    response, queries = self.measure(route, call)
+                    self.assertLess(response.status_code, 400, f'{call.method} {route}: {response.status_code}')
+                    if len(queries) > call.budget:
+                        sql = '\n'.join(f'  {query["sql"]}' for query in queries.captured_queries)
+                        self.fail(
+                            f'{call.method} {route} ran {len(queries)} queries with {self.scale} rows per '
+                            f'relation, budget is {call.budget}:\n{sql}'
+                        )
+
+
+class SmallDatasetQueryBudgetTests(QueryBudgetMixin, TestCase):
+    scale = 2
+
+    def test_every_route_has_a_budget(self):
+        routes = api_routes()
+        self.assertEqual(sorted(set(routes) - set(BUDGETS)), [], 'routes without a query budget')
+        self.assertEqual(sorted(set(BUDGETS) - set(routes)), [], 'budgets for routes that no longer exist')
+
+
+class LargeDatasetQueryBudgetTests(QueryBudgetMixin, TestCase):
+    scale = 8
+
+
+class ResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ctx = seed(2)
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.client = APIClient()
+
+    def get(self, path):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        return response, len(queries)
+
+    def test_hit_skips_the_database_until_a_write_invalidates_it(self):
+        paths = [f'/inventory/item/{self.ctx["item"]}/', f'/inventory/maalem/items/{self.ctx["maalem"]}/']
+        for path in paths:
+            self.assertEqual(self.get(path)[0]['X-Cache'], 'MISS')
+            response, queries = self.get(path)
+            self.assertEqual((response['X-Cache'], queries), ('HIT', 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put('/inventory/item/put/', {'item_id': self.ctx['item'], 'title': 'Renamed'}, format='json')
+
+        for path in paths:
+            response, queries = self.get(path)
+            self.assertEqual(response['X-Cache'], 'MISS')
+            self.assertIn(b'Renamed', response.content)
+        # Entries without the written item's tags are untouched
+        self.get('/users/client/')
+        self.assertEqual(self.get('/users/client/')[0]['X-Cache'], 'HIT')
+
+
+class DatabaseConfigTests(SimpleTestCase):
+    def test_sqlite(self):
+        config = database_config(Path('/srv'), {})
+        self.assertEqual((config['NAME'], config['CONN_MAX_AGE'], config['CONN_HEALTH_CHECKS']), (Path('/srv/db.sqlite3'), 60, True))
+        self.assertEqual((config['OPTIONS']['timeout'], config['OPTIONS']['transaction_mode']), (20, 'IMMEDIATE'))
+        self.assertIn('PRAGMA journal_mode=WAL', config['OPTIONS']['init_command'])
+
+        config = database_config(Path('/srv'), {'DB_NAME': '/data/db', 'DB_CONN_MAX_AGE': '0', 'DB_CACHE_SIZE': '1024'})
+        self.assertEqual((config['NAME'], config['CONN_MAX_AGE']), ('/data/db', 0))
+        self.assertIn('PRAGMA cache_size=-1024', config['OPTIONS']['init_command'])
+
+        # One test database per checkout unless one is named
+        self.assertNotEqual(config['TEST']['NAME'], database_config(Path('/home/ci/tu7fa'), {})['TEST']['NAME'])
+        self.assertEqual(config['TEST']['NAME'], database_config(Path('/srv'), {})['TEST']['NAME'])
+        self.assertEqual(database_config(Path('/srv'), {'DB_TEST_NAME': '/tmp/shard1.sqlite3'})['TEST']['NAME'], '/tmp/shard1.sqlite3')
+
+    def test_postgresql(self):
+        env = {'DB_ENGINE': 'postgresql', 'DB_HOST': 'db', 'DB_CONN_MAX_AGE': '30'}
+        config = database_config(Path('/srv'), env)
+        self.assertEqual((config['HOST'], config['CONN_MAX_AGE'], config['OPTIONS']), ('db', 30, {}))
+
+        config = database_config(Path('/srv'), {**env, 'DB_POOL_MAX_SIZE': '8'})
+        self.assertEqual((config['CONN_MAX_AGE'], config['OPTIONS']['pool']), (0, {'min_size': 2, 'max_size': 8}))
+
+        with self.assertRaises(ValueError):
+            database_config(Path('/srv'), {'DB_ENGINE': 'mysql'})
+
+    def test_replicas(self):
+        replicas = replica_configs(Path('/srv'), {'DB_REPLICAS': '/data/r0, /data/r1'})
+        self.assertEqual(list(replicas), ['replica_0', 'replica_1'])
+        self.assertEqual((replicas['replica_1']['NAME'], replicas['replica_1']['TEST']), ('/data/r1', {'MIRROR': 'default'}))
+
+        replicas = replica_configs(Path('/srv'), {'DB_ENGINE': 'postgresql', 'DB_REPLICAS': 'r0'})
+        self.assertEqual(replicas['replica_0']['HOST'], 'r0')
+        self.assertEqual(replica_configs(Path('/srv'), {}), {})
+
+
+def read_alias(request, **kwargs):
+    return HttpResponse(PrimaryReplicaRouter().db_for_read(Item))
+
+
+replica_read_alias = use_replica(lambda request, **kwargs: read_alias(request))
+
+
+@use_replica
+@cache_response('probe')
+def cached_read_alias(request, **kwargs):
+    return JsonResponse({'alias': PrimaryReplicaRouter().db_for_read(Item)})
+
+
+@mock.patch('api.routers.replicas', return_value=['replica_1'])
+class RoutingTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+
+    def alias(self, view, method='get', ip='203.0.113.1', cookies=None, **kwargs):
+        def get_response(request):
+            middleware.process_view(request, view, (), kwargs)
+            return view(request, **kwargs)
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        # Every caller comes through the same proxy
+        request = getattr(RequestFactory(), method)('/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=ip)
+        request.COOKIES.update(cookies or {})
+        return middleware(request).content.decode()
+
+    def test_only_marked_views_read_from_a_replica(self, replicas):
+        self.assertEqual(self.alias(replica_read_alias), 'replica_1')
+        self.assertEqual(self.alias(read_alias), 'default')
+
+    @override_settings(CLIENT_IP_HEADER='X-Forwarded-For')
+    def test_writes_pin_the_caller_to_the_primary(self, replicas):
+        self.alias(read_alias, 'post', ip='203.0.113.2')
+        self.assertEqual(self.alias(replica_read_alias, ip='203.0.113.2'), 'default')
+        self.assertEqual(self.alias(replica_read_alias, ip='203.0.113.3'), 'replica_1')
+
+        # The client id in the URL pins the same user on another address
+        self.alias(read_alias, 'put', ip='203.0.113.4', client_id=7)
+        self.assertEqual(self.alias(replica_read_alias, ip='203.0.113.5', client_id=7), 'default')
+        self.assertEqual(self.alias(replica_read_alias, ip='203.0.113.5', client_id=8), 'replica_1')
+
+        # Same-origin callers still send the cookie back
+        self.assertEqual(self.alias(replica_read_alias, ip='203.0.113.6', cookies={PIN_COOKIE: '1'}), 'default')
+
+        # Pins expire with the cache entries
+        caches['default'].clear()
+        self.assertEqual(self.alias(replica_read_alias, ip='203.0.113.2'), 'replica_1')
+
+    def test_untrusted_addresses_pin_nobody(self, replicas):
+        # Without CLIENT_IP_HEADER the address is the proxy's, shared by every caller
+        self.alias(read_alias, 'post', ip='203.0.113.2')
+        self.assertEqual(self.alias(replica_read_alias, ip='203.0.113.3'), 'replica_1')
+        self.alias(read_alias, 'post', maalem_id=3)
+        self.assertEqual(self.alias(replica_read_alias, maalem_id=3), 'default')
+
+    def test_pins_need_a_shared_cache(self, replicas):
+        self.assertEqual([error.id for error in check_pin_cache(None)], ['api.E001'])
+        with mock.patch('api.checks.caches', {'default': RedisCache('redis://cache:6379', {})}):
+            self.assertEqual(check_pin_cache(None), [])
+        replicas.return_value = []
+        self.assertEqual(check_pin_cache(None), [])
+
+    @override_settings(RESPONSE_CACHE_WAIT=0)
+    def test_cached_responses_are_built_from_the_primary(self, replicas):
+        caches['responses'].clear()
+        self.assertEqual(json.loads(self.alias(cached_read_alias)), {'alias': 'default'})
+        # Another worker is rebuilding: the response is not stored, so it may come from a replica
+        caches['responses'].clear()
+        caches['responses'].add(f'lock:{cache_key(RequestFactory().get("/"))}', 1)
+        self.assertEqual(json.loads(self.alias(cached_read_alias)), {'alias': 'replica_1'})
+
+
+def scrape(client):
+    """{'name{labels}': value} of every sample on /metrics/."""
+    text = client.get('/metrics/').content.decode()
+    return {key: float(value) for key, value in re.findall(r'^(\S+) (\S+)$', text, re.M) if key != '#'}
+
+
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ctx = seed(2)
+
+    def setUp(self):
+        for alias in ('responses', 'throttle'):
+            caches[alias].clear()
+
+    def test_histograms_are_cumulative(self):
+        registry = Registry()
+        for seconds in (0.003, 0.02, 0.02, 30.0):
+            registry.observe(('items/', 'GET', '2xx'), (seconds, 1, 0.001, None))
+        text = registry.render()
+        label = 'route="items/",method="GET",status="2xx"'
+        for bound, count in zip(LATENCY_BUCKETS, (1, 1, 3, 3)):
+            self.assertIn(f'http_request_duration_seconds_bucket{{{label},le="{bound}"}} {count}\n', text)
+        self.assertIn(f'http_request_duration_seconds_bucket{{{label},le="+Inf"}} 4\n', text)
+        self.assertIn(f'http_request_duration_seconds_count{{{label}}} 4\n', text)
+        self.assertIn(f'http_request_db_queries_sum{{{label}}} 4.0\n', text)
+        # No size observed: the size histogram stays empty
+        self.assertIn(f'http_response_size_bytes_count{{{label}}} 0\n', text)
+
+    def test_requests_are_recorded_by_route(self):
+        client = APIClient()
+        summary = 'route="inventory/maalem/summary/<int:maalem_id>/",method="GET",status="2xx"'
+        detail = 'route="inventory/item/<int:id>/",method="GET",status="2xx"'
+        before = scrape(client)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(f'/inventory/maalem/summary/{self.ctx["maalem"]}/')
+        # Taken now: the next request resets the connection's query log
+        query_count = len(queries)
+        client.get(f'/inventory/item/{self.ctx["item"]}/')
+        client.get('/no/such/route/')
+        after = scrape(client)
+
+        def delta(name, label):
+            return after[f'{name}{{{label}}}'] - before.get(f'{name}{{{label}}}', 0)
+
+        self.assertEqual(delta('http_request_duration_seconds_count', summary), 1)
+        self.assertEqual(delta('http_request_db_queries_sum', summary), query_count)
+        self.assertGreater(delta('http_request_db_seconds_sum', summary), 0)
+        self.assertEqual(delta('http_response_size_bytes_sum', summary), len(response.content))
+        # The async view's query runs on an executor thread's connection
+        self.assertEqual(delta('http_request_db_queries_sum', detail), 1)
+        self.assertEqual(delta('http_request_duration_seconds_count', 'route="<unmatched>",method="GET",status="4xx"'), 1)
+        # Scrapes are not measured
+        self.assertFalse(any('route="metrics/"' in key for key in after))
+
+
+class RendererTests(TestCase):
+    SERIALIZERS = (
+        (ItemListSerializer, ItemSerializer), (OfferListSerializer, OfferSerializer),
+        (OrderListSerializer, OrderSerializer), (MaalemListSerializer, MaalemSerializer),
+        (ClientListSerializer, ClientSerializer), (NotificationListSerializer, NotificationSerializer),
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        seed(2)
+        # Values DRF formats on its own: trailing zeros, microseconds
+        Item.objects.filter(pk=Item.objects.first().pk).update(maalemAskPrice='12.50')
+        Notification.objects.update(created_at=timezone.now().replace(microsecond=123456))
+
+    def test_values_rows_render_like_drf(self):
+        for values_serializer, model_serializer in self.SERIALIZERS:
+            queryset = values_serializer.model.objects.order_by('pk')
+            expected = JSONRenderer().render(model_serializer(queryset, many=True).data)
+            with self.subTest(model=values_serializer.model.__name__):
+                self.assertEqual(FastJSONRenderer().render(values_serializer(queryset).data), expected)
+                # A page of instances
+                self.assertEqual(FastJSONRenderer().render(values_serializer(list(queryset)).data), expected)
+
+        fields = ['title', 'maalemAskPrice', 'maalem']
+        queryset = Item.objects.order_by('pk')
+        self.assertEqual(
+            FastJSONRenderer().render(ItemListSerializer(queryset, fields=fields).data),
+            JSONRenderer().render(ItemSerializer(queryset, many=True, fields=fields).data),
+        )
+
+    def test_indentation(self):
+        data = NotificationListSerializer(Notification.objects.order_by('pk')).data
+        for indent in (2, 4):
+            context = {'indent': indent}
+            self.assertEqual(
+                json.loads(FastJSONRenderer().render(data, renderer_context=context)),
+                json.loads(JSONRenderer().render(data, renderer_context=context)),
+            )
+        self.assertIn(b'\n    {', FastJSONRenderer().render(data, renderer_context={'indent': 4}))
+
+
+class SparseFieldsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ctx = seed(2)
+
+    def setUp(self):
+        for alias in ('responses', 'throttle'):
+            caches[alias].clear()
+        self.client = APIClient()
+
+    def test_resolve_fields(self):
+        available = ('id', 'title', 'description', 'price')
+        self.assertIsNone(resolve_fields({}, available))
+        self.assertIsNone(resolve_fields({'fields': ' , '}, available))
+        # Serializer order, whatever order they were asked in
+        self.assertEqual(resolve_fields({'fields': 'price, title'}, available), ['title', 'price'])
+        self.assertEqual(resolve_fields({'exclude': 'description'}, available), ['id', 'title', 'price'])
+        self.assertEqual(resolve_fields({'fields': 'title,price', 'exclude': 'price'}, available), ['title'])
+        with self.assertRaisesMessage(ValueError, 'Unknown field(s) colour, size'):
+            resolve_fields({'fields': 'title,colour', 'exclude': 'size'}, available)
+
+    def test_projection_reaches_the_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/inventory/item/', {'fields': 'photoUrl,title'})
+        self.assertEqual({tuple(row) for row in response.json()}, {('title', 'photoUrl')})
+        self.assertNotIn('"description"', queries[-1]['sql'])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/inventory/maalem/summary/{self.ctx["maalem"]}/', {'fields': 'title,like_count'})
+        self.assertEqual({tuple(row) for row in response.json()['results']}, {('like_count', 'title')})
+        # The sales stats are not computed
+        items_query = next(query['sql'] for query in queries if 'inventory_like' in query['sql'])
+        self.assertNotIn('sales_order', items_query)
+
+        response = self.client.get(f'/inventory/item/{self.ctx["item"]}/', {'exclude': 'description'})
+        self.assertNotIn('description', response.json())
+        self.assertIn('title', response.json())
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get('/inventory/item/', {'exclude': 'nope'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Unknown field(s) nope', response.json()['error'])
+        self.assertEqual(self.client.get('/users/maalem/search/', {'fields': 'item_count,nope'}).status_code, 400)
+
+
+class CompressionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ctx = seed(2)
+
+    def setUp(self):
+        for alias in ('responses', 'throttle'):
+            caches[alias].clear()
+
+    def get(self, path, coding=None, **params):
+        headers = {'HTTP_ACCEPT_ENCODING': coding} if coding else {}
+        response = APIClient().get(path, params, **headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_negotiation(self):
+        best = 'br' if brotli else 'gzip'
+        for header, expected in [
+            ('gzip, deflate, br', best), ('gzip;q=0, br', 'br' if brotli else None), ('br;q=0, gzip', 'gzip'),
+            ('*', best), ('br;q=0, *', 'gzip'), ('*;q=0', None), ('identity', None), ('GZIP;q=0.5', 'gzip'),
+            ('gzip;q=abc', None), ('', None), (None, None),
+        ]:
+            with self.subTest(header=header):
+                self.assertEqual(choose_encoding(header), expected)
+
+    def test_bodies_round_trip(self):
+        path = '/inventory/item/'
+        response, plain = self.get(path)
+        self.assertNotIn('Content-Encoding', response)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+        response, body = self.get(path, 'gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual((int(response['Content-Length']), gzip.decompress(body)), (len(body), plain))
+        if brotli:
+            response, body = self.get(path, 'br')
+            self.assertEqual((response['Content-Encoding'], brotli.decompress(body)), ('br', plain))
+
+        # Streamed, chunk by chunk
+        today = timezone.now().date()
+        week = {'since': (today - timedelta(days=6)).isoformat(), 'until': (today + timedelta(days=1)).isoformat()}
+        _, plain = self.get('/export/orders/', output='ndjson', **week)
+        self.assertTrue(plain)
+        response, body = self.get('/export/orders/', 'gzip', output='ndjson', **week)
+        self.assertEqual((response['Content-Encoding'], gzip.decompress(body)), ('gzip', plain))
+        # Already gzipped
+        response, body = self.get('/export/orders/', 'gzip', gzip=1, **week)
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(gzip.decompress(body).splitlines()[0][:8], b'order_id')
+
+    def test_size_threshold(self):
+        path = f'/inventory/item/{self.ctx["item"]}/'
+        response, body = self.get(path, 'gzip')
+        self.assertLess(len(body), 860)
+        self.assertNotIn('Content-Encoding', response)
+        self.assertNotIn('Accept-Encoding', response.get('Vary', ''))
+        with override_settings(COMPRESSION_MIN_SIZE=100):
+            response, body = self.get(path, 'gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(body))['item_id'], self.ctx['item'])
+
+
+class LoggingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ctx = seed(2)
+
+    def capture(self, logger):
+        """JSON lines `logger` writes at INFO while the block runs; read them after close()."""
+        stream = StringIO()
+        handler = QueueJSONHandler(stream)
+        level, propagate = logger.level, logger.propagate
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(handler)
+
+        def restore():
+            logger.removeHandler(handler)
+            logger.setLevel(level)
+            logger.propagate = propagate
+
+        self.addCleanup(restore)
+        return handler, stream
+
+    def lines(self, handler, stream):
+        # Stops the listener once the queue is drained
+        handler.close()
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    def test_request_ids(self):
+        handler, stream = self.capture(access_logger)
+        client = APIClient()
+        path = f'/inventory/item/{self.ctx["item"]}/'
+        self.assertEqual(client.get(path, HTTP_X_REQUEST_ID='edge-7f3a.1')['X-Request-ID'], 'edge-7f3a.1')
+        # Not something to copy into logs as is: replaced
+        generated = client.get(path, HTTP_X_REQUEST_ID='a b"}')['X-Request-ID']
+        self.assertRegex(generated, r'^[0-9a-f]{32}$')
+        self.assertNotEqual(client.get(path)['X-Request-ID'], generated)
+
+        first, second = self.lines(handler, stream)[:2]
+        self.assertEqual(
+            {key: first[key] for key in ('level', 'logger', 'event', 'request_id', 'method', 'path', 'status')},
+            {'level': 'INFO', 'logger': 'api.requests', 'event': 'request', 'request_id': 'edge-7f3a.1',
+             'method': 'GET', 'path': path, 'status': 200},
+        )
+        self.assertEqual(second['request_id'], generated)
+        self.assertIn('duration_ms', first)
+
+    def test_exceptions_are_formatted(self):
+        logger = logging.getLogger('api.tests')
+        handler, stream = self.capture(logger)
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            logger.exception('task.failed', extra={'task': 7})
+        [line] = self.lines(handler, stream)
+        self.assertEqual((line['event'], line['level'], line['task'], line['request_id']), ('task.failed', 'ERROR', 7, None))
+        self.assertIn('ValueError: boom', line['exc'])
+
+    def test_sampling(self):
+        self.assertEqual(parse_sample_rates('request=0.1, offer.received = 0.01,,bad'), {'request': 0.1, 'offer.received': 0.01})
+        sampler = SamplingFilter({'request': 0.0, 'item.viewed': 0.25})
+
+        def kept(event, level=logging.INFO, count=1):
+            record = logging.LogRecord('api', level, '', 0, event, None, None)
+            return sum(sampler.filter(record) for _ in range(count))
+
+        self.assertEqual(kept('request'), 0)
+        self.assertEqual(kept('request', logging.WARNING), 1)
+        self.assertEqual(kept('offer.received'), 1)
+        random.seed(0)
+        self.assertAlmostEqual(kept('item.viewed', count=4000) / 4000, 0.25, delta=0.03)
+
+
+class ThrottleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ctx = seed(2)
+
+    def setUp(self):
+        caches['throttle'].clear()
+
+    def test_bucket_refills_at_the_rate(self):
+        limit = parse_rates('notify=2/s:3')['notify']
+        granted = [take('bucket', limit, now=100.0) for _ in range(4)]
+        self.assertEqual(granted[:3], [0, 0, 0])
+        self.assertAlmostEqual(granted[3], 0.5)
+        self.assertEqual(take('bucket', limit, now=100.5), 0)
+        self.assertGreater(take('bucket', limit, now=100.5), 0)
+        # Idle long enough, the bucket is full again but no fuller
+        self.assertEqual([take('bucket', limit, now=110.0) for _ in range(4)][:3], [0, 0, 0])
+
+    @override_settings(THROTTLE_RATES='notify=1/m:2')
+    def test_polling_is_limited_per_client_and_writes_are_not(self):
+        client, url = APIClient(), f'/notify/client-notifications/{self.ctx["client"]}/'
+        self.assertEqual([client.get(url).status_code for _ in range(3)], [200, 200, 429])
+        rejected = client.get(url)
+        self.assertEqual(rejected['Retry-After'], str(rejected.json()['retry_after']))
+        self.assertGreater(int(rejected['Retry-After']), 0)
+        other = ClientProfile.objects.exclude(pk=self.ctx['client']).first().pk
+        self.assertEqual(client.get(f'/notify/client-notifications/{other}/').status_code, 200)
+        self.assertIn('http_throttled_requests_total{group="notify"}', client.get('/metrics/').content.decode())
+
+    @override_settings(THROTTLE_RATES='notify=1/m:2')
+    def test_batched_reads_share_the_limit(self):
+        client, url = APIClient(), f'/notify/client-notifications/{self.ctx["client"]}/'
+        response = client.post('/batch/', {'requests': [{'path': url}] * 5}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([sub['status'] for sub in response.json()['responses']], [200, 200, 429, 429, 429])
+        self.assertEqual(client.get(url).status_code, 429)
+        # Sub-requests are measured under their own route
+        metrics = client.get('/metrics/').content.decode()
+        self.assertIn('route="notify/client-notifications/<int:client_id>/",method="GET",status="4xx"', metrics)
+
+    @override_settings(THROTTLE_RATES='inventory=1/m:1', CLIENT_IP_HEADER='X-Forwarded-For')
+    def test_anonymous_callers_are_told_apart_behind_the_proxy(self):
+        client, url = APIClient(), f'/inventory/item/{self.ctx["item"]}/'
+        self.assertEqual(client.get(url, HTTP_X_FORWARDED_FOR='203.0.113.1').status_code, 200)
+        self.assertEqual(client.get(url, HTTP_X_FORWARDED_FOR='203.0.113.2').status_code, 200)
+        # A client cannot get a fresh bucket by forging the entries left of the proxy's
+        self.assertEqual(client.get(url, HTTP_X_FORWARDED_FOR='198.51.100.9, 203.0.113.1').status_code, 429)
+
+    def test_limits_warn_without_a_shared_cache(self):
+        with override_settings(THROTTLE_RATES=''):
+            self.assertEqual(check_throttle_cache(None), [])
+        with override_settings(THROTTLE_RATES='notify=1/s'):
+            self.assertEqual([warning.id for warning in check_throttle_cache(None)], ['api.W001'])
+            with mock.patch('api.checks.caches', {'throttle': RedisCache('redis://cache:6379', {})}):
+                self.assertEqual(check_throttle_cache(None), [])
+
+
+class ProxyTests(SimpleTestCase):
+    def ip(self, **meta):
+        return client_ip(RequestFactory().get('/', REMOTE_ADDR='10.0.0.1', **meta))
+
+    def test_direct_callers(self):
+        self.assertEqual(self.ip(HTTP_X_FORWARDED_FOR='203.0.113.1'), '10.0.0.1')
+
+    @override_settings(CLIENT_IP_HEADER='X-Forwarded-For', TRUSTED_PROXIES=2)
+    def test_the_address_the_first_trusted_proxy_saw(self):
+        self.assertEqual(self.ip(HTTP_X_FORWARDED_FOR='198.51.100.9, 203.0.113.1, 10.0.0.2'), '203.0.113.1')
+        # Not through the proxies
+        self.assertEqual(self.ip(HTTP_X_FORWARDED_FOR='203.0.113.1'), '10.0.0.1')
+        self.assertEqual(self.ip(), '10.0.0.1')
+
+
+class BatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ctx = seed(2)
+
+    def batch(self, requests, **options):
+        return APIClient().post('/batch/', {'requests': requests, **options}, format='json')
+
+    def test_responses_come_back_in_order(self):
+        response = self.batch([
+            {'path': f'/inventory/item/{self.ctx["item"]}/?fields=title'},
+            {'path': '/no/such/route/'},
+            {'method': 'PATCH', 'path': f'/notify/notifications/{self.ctx["notification"]}/update-delete/', 'body': {'is_read': True}},
+        ])
+        responses = response.json()['responses']
+        self.assertEqual([sub['status'] for sub in responses], [200, 404, 200])
+        self.assertEqual(set(responses[0]['body']), {'title'})
+
+    @override_settings(BATCH_MAX_REQUESTS=2)
+    def test_invalid_batches_are_rejected(self):
+        item = {'path': f'/inventory/item/{self.ctx["item"]}/'}
+        for requests in (
+            [],
+            [item] * 3,
+            [{'path': '/batch/'}],
+            [{'method': 'TRACE', 'path': item['path']}],
+            [{'path': 'http://example.com/inventory/item/'}],
+            [{'method': 'GET'}],
+        ):
+            with self.subTest(requests=requests):
+                response = self.batch(requests)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+    def test_atomic_batch_rolls_back_at_the_first_error(self):
+        item, rename = self.ctx['item'], {'method': 'PUT', 'path': '/inventory/item/put/'}
+        requests = [
+            {**rename, 'body': {'item_id': item, 'title': 'First'}},
+            {'path': '/inventory/item/999999/'},
+            {**rename, 'body': {'item_id': item, 'title': 'Second'}},
+        ]
+        result = self.batch(requests, atomic=True).json()
+        self.assertEqual(([sub['status'] for sub in result['responses']], result['rolled_back']), ([202, 404], True))
+        self.assertNotIn(Item.objects.get(pk=item).title, ('First', 'Second'))
+
+        result = self.batch(requests).json()
+        self.assertEqual([sub['status'] for sub in result['responses']], [202, 404, 202])
+        self.assertEqual(Item.objects.get(pk=item).title, 'Second')
+
+
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ctx = seed(2)
+
+    def test_hot_queries_use_indexes(self):
+        # Warm entries neither hide the queries nor get dropped
+        APIClient().get(f'/inventory/item/{self.ctx["item"]}/')
+        caches['default'].set('kept', 1)
+        out = StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertIn('ok    unread_client', out.getvalue())
+        self.assertIn('ok    item_detail', out.getvalue())
+        self.assertEqual(caches['default'].get('kept'), 1)
+        self.assertEqual(APIClient().get(f'/inventory/item/{self.ctx["item"]}/')['X-Cache'], 'HIT')
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ctx = seed(2)
+
+    def export(self, dataset, **params):
+        response = APIClient().get(f'/export/{dataset}/', params)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_fields_bounds_and_gzip(self):
+        today = timezone.now().date()
+        month = {'since': (today - timedelta(days=29)).isoformat(), 'until': (today + timedelta(days=1)).isoformat()}
+        response, body = self.export('orders', fields='order_id,status', **month)
+        lines = body.decode().splitlines()
+        self.assertEqual(lines[0], 'order_id,status')
+        self.assertEqual(len(lines) - 1, Order.objects.count())
+
+        response, body = self.export('orders', fields='order_id', gzip=1, since='1999-12-25', until='1999-12-31')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertEqual(gzip.decompress(body).decode().splitlines(), ['order_id'])
+        _, body = self.export('offers', output='ndjson', fields='offer_id', **month)
+        self.assertEqual(len(body.splitlines()), Offer.objects.count())
+
+    def test_long_ranges_are_written_by_a_worker(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(EXPORT_DIR=directory):
+            for params in [{}, {'since': '2000-01-01'}, {'since': '2000-01-01', 'until': '2000-03-01'}]:
+                with self.subTest(**params):
+                    self.assertEqual(self.export('orders', **params)[0].status_code, 202)
+            Task.objects.all().delete()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                response, body = self.export('orders', fields='order_id,status', gzip=1)
+            url = response.json()['url']
+            (task,) = Task.objects.all()
+            self.assertEqual((task.name, task.kwargs['fields'], task.kwargs['gzip']), ('api.export_dataset', 'order_id,status', True))
+            self.assertEqual(APIClient().get(url).status_code, 404)
+
+            REGISTRY[task.name](**task.kwargs)
+            response = APIClient().get(url)
+            self.assertEqual((response.status_code, response['Content-Type']), (200, 'application/gzip'))
+            lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+            self.assertEqual(len(lines) - 1, Order.objects.count())
+            self.assertEqual(APIClient().get('/export/files/..%2Fdb.sqlite3/').status_code, 404)
+
+    def test_bare_dates_cover_the_whole_day(self):
+        self.assertEqual(parse_bound('2024-03-01', end=True), parse_bound('2024-03-02'))
+        self.assertEqual(parse_bound('2024-03-01T10:00', end=True), parse_bound('2024-03-01T10:00'))
+        today = timezone.now().date().isoformat()
+        _, body = self.export('orders', fields='order_id', since=today, until=today)
+        self.assertEqual(len(body.splitlines()) - 1, Order.objects.count())
+
+    def test_bad_arguments_are_rejected(self):
+        for dataset, params in [
+            ('orders', {'since': '2024-13-45'}),
+            ('orders', {'until': '2024-02-30T10:00'}),
+            ('orders', {'since': 'yesterday'}),
+            ('orders', {'fields': 'order_id,password'}),
+            ('orders', {'output': 'xml'}),
+            ('items', {'since': '2024-01-01'}),
+            ('payments', {}),
+        ]:
+            with self.subTest(dataset=dataset, **params):
+                response, body = self.export(dataset, **params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', json.loads(body))
+
+
+class SyntheticDataTests(TransactionTestCase):
+    # Committed rows: the benchmark's worker threads use their own connections
+
+    def generate(self, **options):
+        call_command('generate_data', stdout=StringIO(), seed=1, likes_per_client=2, comments_per_client=1,
+                     offers_per_client=3, notifications_per_client=2, chunk_size=7, **options)
+
+    def bench(self, **options):
+        out = StringIO()
+        call_command('bench_routes', endpoint=['maalem_detail', 'item_detail'], concurrency=2, duration=0.2,
+                     stdout=out, stderr=StringIO(), **options)
+        return json.loads(out.getvalue())
+
+    def test_generate_then_benchmark(self):
+        self.generate(maalems=3, clients=10, items_per_maalem=4)
+        self.assertEqual((MaalemProfile.objects.count(), ClientProfile.objects.count()), (3, 10))
+        self.assertFalse(Order.objects.exclude(offer__status='accepted').exists())
+        self.assertFalse(OrderRating.objects.exclude(order__status__in=OrderRating.RATEABLE_STATUSES).exists())
+        for maalem in MaalemProfile.objects.all():
+            self.assertEqual(maalem.rating_count, OrderRating.objects.filter(maalem=maalem).count())
+        self.assertEqual(CatalogEntry.objects.count(), Item.objects.count())
+        # Later runs append
+        self.generate(maalems=2, clients=2, items_per_maalem=1)
+        self.assertEqual((MaalemProfile.objects.count(), ClientProfile.objects.count()), (5, 12))
+        with self.assertRaises(CommandError):
+            self.generate(maalems=0, clients=1)
+
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = f'{directory}/baseline.json'
+            report = self.bench(output=baseline)
+            self.assertEqual(report['rows']['MaalemProfile'], 5)
+            self.assertEqual(set(report['endpoints']), {'maalem_detail', 'item_detail'})
+            for result in report['endpoints'].values():
+                self.assertGreater(result['requests'], 0)
+                self.assertEqual(result['errors'], 0)
+                self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+                self.assertLessEqual(result['p95_ms'], result['p99_ms'])
+            delta = self.bench(baseline=baseline)['delta']
+            self.assertEqual(set(delta['percent_change']), {'maalem_detail', 'item_detail'})
@@ -0,0 +1,161 @@
+"""
+Per-client rate limits for read traffic, so polling tabs cannot starve the
+writes of a single database.
+
+Each route group (the first path segment: notify, inventory, sales, ...)
+has a token bucket per client: `burst` requests at once, refilled at
+`rate` per second. Clients are told apart by the client or maalem id in
+the URL when there is one, so all the tabs of one user share a bucket
+and users behind one NAT do not, and by IP address otherwise (the
+client's, behind trusted proxies; see api.proxies). Only GET
+and HEAD are limited; writes are what the limits protect. The GETs in a
+POST /batch/ are limited one by one, as if made on their own (api.batch).
+
+Buckets are GCRA timestamps ("theoretical arrival time" in ms) in the
+'throttle' cache alias, updated with add() and incr() only. Those are
+atomic in memcached and redis, which is what makes the limits hold across
+processes and hosts. locmem keeps buckets per process, so each worker
+would allow the full rate, and the file and db backends are not atomic:
+the default limits only apply with a redis or memcached backend, and
+limits set on another one get the api.W001 check warning.
+
+A rejected request gets 429 with Retry-After and is counted in
+http_throttled_requests_total{group=...} on /metrics/.
+
+THROTTLE_RATES         group=rate[:burst] pairs, rate as n/s, n/m or n/h,
+                       e.g. "notify=1/s:10,inventory=5/s:30". Groups not
+                       listed are not limited; an empty value disables it.
+                       Defaults to notify=1/s:10,inventory=5/s:30,sales=5/s:30
+                       with a redis or memcached backend, else empty.
+THROTTLE_CACHE_BACKEND redis | memcached, or locmem | file | db, as CACHE_BACKEND
+"""
+import math
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+
+from .proxies import client_ip
+
+ALIAS = 'throttle'
+SAFE_METHODS = ('GET', 'HEAD')
+PERIODS = {'s': 1, 'm': 60, 'h': 3600}
+# URL kwargs naming the client a request is made for
+CLIENT_KWARGS = ('client_id', 'maalem_id')
+
+_rejected_lock = threading.Lock()
+_rejected = Counter()
+
+
+class Limit:
+    __slots__ = ('interval', 'burst')
+
+    def __init__(self, rate, burst):
+        # Milliseconds per token
+        self.interval = max(1, round(1000 / rate))
+        self.burst = burst
+
+    def __repr__(self):
+        return f'<Limit {1000 / self.interval:g}/s burst {self.burst}>'
+
+
+def parse_rates(value):
+    """'notify=1/s:10,inventory=300/m' -> {'notify': Limit(1, 10), 'inventory': Limit(5, 5)}"""
+    limits = {}
+    for part in (value or '').split(','):
+        group, _, spec = part.partition('=')
+        if not group.strip() or not spec.strip():
+            continue
+        rate, _, burst = spec.strip().partition(':')
+        count, _, period = rate.partition('/')
+        per_second = float(count) / PERIODS[period.strip() or 's']
+        limits[group.strip()] = Limit(per_second, int(burst) if burst else max(1, math.ceil(per_second)))
+    return limits
+
+
+def take(key, limit, now=None):
+    """Take a token from the bucket `key`: 0 if granted, else seconds until one is available."""
+    cache = caches[ALIAS]
+    now = int((time.time() if now is None else now) * 1000)
+    timeout = math.ceil(limit.burst * limit.interval / 1000) + 1
+    if cache.add(key, now + limit.interval, timeout):
+        return 0
+    try:
+        tat = cache.incr(key, limit.interval)
+    except ValueError:
+        # Expired between add() and incr()
+        cache.set(key, now + limit.interval, timeout)
+        return 0
+    if tat < now + limit.interval:
+        # The bucket had filled up; count from now, not from when it was last used
+        tat = cache.incr(key, now + limit.interval - tat)
+    wait = tat - now - limit.burst * limit.interval
+    if wait > 0:
+        # A rejected request does not use up a token
+        cache.decr(key, limit.interval)
+        return wait / 1000
+    cache.touch(key, timeout)
+    return 0
+
+
+def client_key(request, view_kwargs):
+    for name in CLIENT_KWARGS:
+        if name in view_kwargs:
+            return f'{name}:{view_kwargs[name]}'
+    return f'ip:{client_ip(request)}'
+
+
+def rejected_counts():
+    with _rejected_lock:
+        return dict(_rejected)
+
+
+def throttle_metrics():
+    lines = [
+        '# HELP http_throttled_requests_total Requests rejected with 429 by api.throttle, by route group.',
+        '# TYPE http_throttled_requests_total counter',
+    ]
+    lines += [f'http_throttled_requests_total{{group="{group}"}} {count}' for group, count in sorted(rejected_counts().items())]
+    return '\n'.join(lines) + '\n'
+
+
+class ThrottleMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.limits = parse_rates(settings.THROTTLE_RATES)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        # Everything happens in process_view, once the URL is resolved; under
+        # ASGI this passes the coroutine through
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        return check(request, view_kwargs, self.limits)
+
+
+def check(request, view_kwargs, limits):
+    """The 429 response for a resolved request over its group's limit, else None."""
+    if request.method not in SAFE_METHODS or request.resolver_match is None:
+        return None
+    group = request.resolver_match.route.split('/', 1)[0]
+    limit = limits.get(group)
+    if limit is None:
+        return None
+    wait = take(f'throttle:{group}:{client_key(request, view_kwargs)}', limit)
+    if not wait:
+        return None
+    with _rejected_lock:
+        _rejected[group] += 1
+    retry_after = math.ceil(wait)
+    response = JsonResponse({'error': 'Too many requests', 'retry_after': retry_after}, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
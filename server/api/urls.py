@@ -17,11 +17,19 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import include, path
 
+from . import views
+from .metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('users/', include('users.urls')),
     path('inventory/', include('inventory.urls')),
     path('sales/', include('sales.urls')),
     path('notify/', include('notify.urls')),
+    path('changes/', include('changes.urls')),
+    path('metrics/', metrics_view),                        # <------ PROMETHEUS SCRAPE
+    path('export/<str:dataset>/', views.export_dataset),  # <------ STREAMING CSV / NDJSON EXPORT
+    path('export/files/<str:name>/', views.export_file),   # <------ EXPORTS WRITTEN BY A WORKER
+    path('batch/', views.batch_requests),                  # <------ SEVERAL API CALLS IN ONE ROUND TRIP
 ]
 
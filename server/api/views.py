@@ -0,0 +1,65 @@
+from django.http import FileResponse, StreamingHttpResponse
+from rest_framework import status
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from . import batch, tasks
+from .routers import use_replica
+from .export import ExportError, file_path, new_file_name, parse_bound, stream, streams_inline
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+# ?output=csv|ndjson&fields=a,b&since=<date>&until=<date>&gzip=1
+# Ranges of up to EXPORT_INLINE_MAX_DAYS are streamed; longer or open-ended
+# ones are written by a worker and answered with 202 and the file's URL.
+@use_replica
+@api_view(['GET'])
+def export_dataset(request, dataset):
+    params = request.query_params
+    output = params.get('output', 'csv')
+    fields = [name for name in params.get('fields', '').split(',') if name]
+    gzip = params.get('gzip') in ('1', 'true')
+    try:
+        since = parse_bound(params.get('since'))
+        until = parse_bound(params.get('until'), end=True)
+        # Validates the arguments; rows are only read once iterated
+        chunks = stream(dataset, output=output, fields=fields, since=since, until=until, gzip=gzip)
+    except ExportError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if not streams_inline(since, until):
+        name = new_file_name(dataset, output, gzip)
+        tasks.export_dataset.enqueue_on_commit(
+            dataset=dataset, file=str(file_path(name)), output=output, fields=','.join(fields),
+            since=params.get('since'), until=params.get('until'), gzip=gzip,
+        )
+        return Response({'status': 'queued', 'url': f'/export/files/{name}/'}, status=status.HTTP_202_ACCEPTED)
+    filename = f'{dataset}.{output}' + ('.gz' if gzip else '')
+    response = StreamingHttpResponse(
+        chunks, content_type='application/gzip' if gzip else CONTENT_TYPES[output]
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+# 404 until the worker has written the file
+@api_view(['GET'])
+def export_file(request, name):
+    path = file_path(name)
+    if path is None or not path.exists():
+        return Response({'error': 'Export not found or not finished yet'}, status=status.HTTP_404_NOT_FOUND)
+    content_type = 'application/gzip' if name.endswith('.gz') else CONTENT_TYPES[name.rsplit('.', 1)[1]]
+    return FileResponse(path.open('rb'), as_attachment=True, filename=name, content_type=content_type)
+
+
+# {"atomic": false, "requests": [{"method": "GET", "path": "/inventory/item/1/", "body": null}, ...]}
+@api_view(['POST'])
+def batch_requests(request):
+    try:
+        result = batch.run(request._request, request.data)
+    except batch.BatchError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(result)
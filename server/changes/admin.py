@@ -0,0 +1,7 @@
+from django.contrib import admin
+from .models import Change
+
+# Register your models here.
+
+
+admin.site.register(Change)
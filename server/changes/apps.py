@@ -0,0 +1,22 @@
+from django.apps import AppConfig
+
+
+class ChangesConfig(AppConfig):
+    name = 'changes'
+
+    def ready(self):
+        from inventory.models import Item
+        from inventory.serializers import ItemListSerializer
+        from notify.models import Notification
+        from notify.serializers import NotificationListSerializer
+        from sales.models import Offer, Order
+        from sales.serializers import OfferListSerializer, OrderListSerializer
+        from users.models import ClientProfile, MaalemProfile
+        from users.serializers import ClientListSerializer, MaalemListSerializer
+        from .feed import track
+        track('item', Item, ItemListSerializer)
+        track('offer', Offer, OfferListSerializer)
+        track('order', Order, OrderListSerializer)
+        track('notification', Notification, NotificationListSerializer)
+        track('maalem', MaalemProfile, MaalemListSerializer)
+        track('client', ClientProfile, ClientListSerializer)
@@ -0,0 +1,150 @@
+"""
+Change feed for clients that keep a local mirror of the catalog.
+
+Every write to a tracked model appends a Change row with the next sequence
+number: an upsert, or a tombstone when the object was deleted. A client
+keeps the highest `seq` it has applied and asks for what came after it:
+
+    GET /changes/?since=0              everything, as upserts (first sync)
+    GET /changes/?since=1520&limit=500 the next page
+    GET /changes/?since=1520&types=item,offer
+
+Upserts carry the object's current row, as the list endpoints serialize
+it, so a page costs one query for the changes and one per type in it;
+several changes to one object inside a page collapse into the last one.
+
+The sequence must not let a reader see seq N+1 while N can still commit,
+or the reader's cursor would skip N for good. SQLite serializes writers;
+on PostgreSQL record() takes a transaction-level advisory lock, so change
+rows commit in sequence order.
+
+Saves and deletes are recorded by signal handlers. update() and
+bulk_create() send no signals, so code doing them calls record() itself.
+compact() deletes the rows a newer change to the same object supersedes;
+tombstones are kept, a client may come back after any length of time.
+"""
+import threading
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Exists, Model, OuterRef
+from django.db.models.signals import post_delete, post_save, pre_delete
+
+from .models import Change
+
+# name -> (model, list serializer), filled in by ChangesConfig.ready()
+ENTITIES = {}
+ENTITY_NAMES = {}
+# pg_advisory_xact_lock key, any constant the application does not use elsewhere
+SEQUENCE_LOCK = 0x7E57C4A6
+# Tombstones of a cascade, per Model.delete() in progress on this thread
+_cascades = threading.local()
+
+
+class FeedError(ValueError):
+    pass
+
+
+def _deleting(sender, instance, origin=None, **kwargs):
+    if instance is origin:
+        # Also drops what a failed earlier delete of the same object left behind
+        vars(_cascades)[id(origin)] = defaultdict(list)
+
+
+def _deleted(sender, instance, origin=None, **kwargs):
+    # The collector sends post_delete for the objects a delete cascades to
+    # first and for the deleted object itself last, so their tombstones are
+    # held until then and recorded one insert per type, not one per row
+    pending = vars(_cascades).get(id(origin)) if isinstance(origin, Model) else None
+    if pending is None:
+        record(sender, [instance.pk], deleted=True)
+        return
+    pending[sender].append(instance.pk)
+    if instance is origin:
+        del vars(_cascades)[id(origin)]
+        for model, object_ids in pending.items():
+            record(model, object_ids, deleted=True)
+
+
+def track(name, model, serializer):
+    """Record every save and delete of `model` under the entity `name`."""
+    ENTITIES[name] = (model, serializer)
+    ENTITY_NAMES[model] = name
+
+    def saved(sender, instance, **kwargs):
+        record(model, [instance.pk])
+
+    post_save.connect(saved, sender=model, weak=False)
+    pre_delete.connect(_deleting, sender=model)
+    post_delete.connect(_deleted, sender=model)
+
+
+def _serialize_writers():
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [SEQUENCE_LOCK])
+
+
+def record(model, object_ids, deleted=False, batch_size=None):
+    """Append a change for each of `object_ids`, in the current transaction if there is one."""
+    name = ENTITY_NAMES[model]
+    changes = [Change(entity=name, object_id=object_id, deleted=deleted) for object_id in object_ids]
+    if not changes:
+        return
+    with transaction.atomic(savepoint=False):
+        _serialize_writers()
+        Change.objects.bulk_create(changes, batch_size=batch_size)
+
+
+def parse_types(value):
+    names = [name for name in (value or '').split(',') if name]
+    unknown = [name for name in names if name not in ENTITIES]
+    if unknown:
+        raise FeedError(f'unknown types: {", ".join(unknown)}; expected {", ".join(ENTITIES)}')
+    return names
+
+
+def read(since, limit, types=None):
+    """One page of changes after `since`: {'changes': [...], 'next': <seq>, 'has_more': bool}."""
+    changes = Change.objects.filter(seq__gt=since).order_by('seq')
+    if types:
+        changes = changes.filter(entity__in=types)
+    rows = list(changes.values_list('seq', 'entity', 'object_id', 'deleted')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    latest = {}
+    for row in rows:
+        latest[row[1], row[2]] = row
+    upserts = defaultdict(list)
+    for seq, name, object_id, deleted in latest.values():
+        if not deleted:
+            upserts[name].append(object_id)
+    current = {}
+    for name, ids in upserts.items():
+        model, serializer = ENTITIES[name]
+        pk = model._meta.pk.name
+        for data in serializer(model.objects.filter(pk__in=ids)).data:
+            current[name, data[pk]] = data
+
+    feed = []
+    for seq, name, object_id, deleted in sorted(latest.values()):
+        data = None if deleted else current.get((name, object_id))
+        # An upsert whose row is gone was deleted since; its tombstone comes later
+        entry = {'seq': seq, 'type': name, 'id': object_id, 'op': 'delete' if data is None else 'upsert'}
+        if data is not None:
+            entry['data'] = data
+        feed.append(entry)
+    return {'changes': feed, 'next': rows[-1][0] if rows else since, 'has_more': has_more}
+
+
+def compact(batch_size=1000):
+    """Delete changes superseded by a newer one to the same object; returns how many."""
+    newer = Change.objects.filter(entity=OuterRef('entity'), object_id=OuterRef('object_id'), seq__gt=OuterRef('seq'))
+    superseded = Change.objects.filter(Exists(newer)).order_by('seq').values_list('seq', flat=True)
+    removed = 0
+    while True:
+        seqs = list(superseded[:batch_size])
+        if not seqs:
+            return removed
+        removed += Change.objects.filter(seq__in=seqs).delete()[0]
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from changes.feed import compact
+
+
+class Command(BaseCommand):
+    help = 'Delete change feed rows superseded by a newer change to the same object.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows deleted per statement.')
+
+    def handle(self, *args, batch_size, **options):
+        removed = compact(batch_size)
+        self.stdout.write(self.style.SUCCESS(f'{removed} superseded change(s) removed'))
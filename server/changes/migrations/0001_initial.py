@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-19 12:04
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('entity', models.CharField(max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['entity', 'object_id', 'seq'], name='change_object_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations
+
+BATCH_SIZE = 2000
+# entity name -> (app label, model name), as tracked by ChangesConfig.ready()
+ENTITIES = {
+    'maalem': ('users', 'MaalemProfile'),
+    'client': ('users', 'ClientProfile'),
+    'item': ('inventory', 'Item'),
+    'offer': ('sales', 'Offer'),
+    'order': ('sales', 'Order'),
+    'notification': ('notify', 'Notification'),
+}
+
+
+def backfill_changes(apps, schema_editor):
+    # One upsert per existing row, so a first sync from since=0 sees every
+    # object and not only those written after the feed existed
+    Change = apps.get_model('changes', 'Change')
+    for entity, (app_label, model_name) in ENTITIES.items():
+        Model = apps.get_model(app_label, model_name)
+        ids = Model.objects.order_by('pk').values_list('pk', flat=True)
+        batch = []
+        for object_id in ids.iterator(chunk_size=BATCH_SIZE):
+            batch.append(Change(entity=entity, object_id=object_id))
+            if len(batch) == BATCH_SIZE:
+                Change.objects.bulk_create(batch)
+                batch = []
+        Change.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('changes', '0001_initial'),
+        ('inventory', '0002_item_stock_holds'),
+        ('notify', '0001_initial'),
+        ('sales', '0003_offer_stock_holds'),
+        ('users', '0007_normalize_phone_numbers'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_changes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Change(models.Model):
+    # Allocated on insert and never reused (AUTOINCREMENT on SQLite, an
+    # identity column on PostgreSQL), so it only ever grows
+    seq = models.BigAutoField(primary_key=True)
+    entity = models.CharField(max_length=20)
+    object_id = models.PositiveIntegerField()
+    # Tombstone: the object was deleted
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Finding the rows a newer change to the same object supersedes (compact())
+            models.Index(fields=['entity', 'object_id', 'seq'], name='change_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"Change {self.seq} {self.entity} {self.object_id}{' deleted' if self.deleted else ''}"
@@ -0,0 +1,8 @@
+from tasks.registry import task
+from . import feed
+
+
+@task()
+def compact_changes(batch_size=1000):
+    """`manage.py compact_changes` as a task, for deployments that already run a worker."""
+    feed.compact(batch_size)
@@ -0,0 +1,46 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.testing import seed
+from inventory.models import Item
+from .feed import compact
+
+
+class ChangeFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ctx = seed(2)
+
+    def feed(self, since, **params):
+        response = APIClient().get('/changes/', {'since': since, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_mirror_follows_upserts_and_cascaded_tombstones(self):
+        cursor = 0
+        while (page := self.feed(cursor, limit=500))['changes']:
+            cursor = page['next']
+        self.assertFalse(page['has_more'])
+
+        client = APIClient()
+        client.put('/inventory/item/put/', {'item_id': self.ctx['item'], 'title': 'Renamed'}, format='json')
+        client.put('/inventory/item/put/', {'item_id': self.ctx['item'], 'title': 'Renamed again'}, format='json')
+        spare_items = list(Item.objects.filter(maalem_id=self.ctx['spare_maalem']).values_list('pk', flat=True))
+        client.delete(f'/users/maalem/delete/{self.ctx["spare_maalem"]}/')
+
+        changes = self.feed(cursor)['changes']
+        upserts = [(change['type'], change['id'], change['data']['title']) for change in changes if change['op'] == 'upsert']
+        self.assertEqual(upserts, [('item', self.ctx['item'], 'Renamed again')])
+        deletes = {(change['type'], change['id']) for change in changes if change['op'] == 'delete'}
+        self.assertEqual(deletes, {('maalem', self.ctx['spare_maalem'])} | {('item', pk) for pk in spare_items})
+        self.assertEqual([change['type'] for change in self.feed(cursor, types='maalem')['changes']], ['maalem'])
+
+        # Compaction keeps one row per object, and a full resync sees the latest state
+        self.assertGreater(compact(), 0)
+        full = [(change['type'], change['id']) for change in self.feed(0, limit=2000)['changes']]
+        self.assertEqual(len(full), len(set(full)))
+        self.assertIn(('item', self.ctx['item']), full)
+
+    def test_invalid_cursor_is_rejected(self):
+        for params in ({'since': 'abc'}, {'since': -1}, {'limit': 0}, {'types': 'likes'}):
+            self.assertEqual(APIClient().get('/changes/', params).status_code, 400)
@@ -0,0 +1,35 @@
+from django.conf import settings
+from rest_framework import status
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from api.routers import use_replica
+from .feed import FeedError, parse_types, read
+
+
+def _bounded_int(value, default, low, high, name):
+    if value in (None, ''):
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise FeedError(f'{name} must be an integer') from None
+    if not low <= number <= high:
+        raise FeedError(f'{name} must be between {low} and {high}')
+    return number
+
+
+# ?since=<seq>&limit=<n>&types=item,offer
+@use_replica
+@api_view(['GET'])
+def change_feed(request):
+    params = request.query_params
+    try:
+        since = _bounded_int(params.get('since'), 0, 0, 2 ** 63 - 1, 'since')
+        limit = _bounded_int(
+            params.get('limit'), settings.CHANGES_PAGE_SIZE, 1, settings.CHANGES_MAX_PAGE_SIZE, 'limit'
+        )
+        types = parse_types(params.get('types'))
+    except FeedError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(read(since, limit, types))
@@ -1,5 +1,22 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save, pre_delete
 
 
 class InventoryConfig(AppConfig):
     name = 'inventory'
+
+    def ready(self):
+        from api.cache import invalidate_on_write
+        from . import catalog, similar
+        from .models import Item, Like
+        post_save.connect(catalog.item_saved, sender=Item)
+        post_save.connect(catalog.maalem_saved, sender='users.MaalemProfile')
+        post_save.connect(catalog.like_saved, sender=Like)
+        post_delete.connect(catalog.like_deleted, sender=Like)
+        pre_delete.connect(catalog.client_deleting, sender='users.ClientProfile')
+        post_save.connect(similar.like_saved, sender=Like)
+        post_delete.connect(similar.like_deleted, sender=Like)
+        pre_delete.connect(similar.client_deleting, sender='users.ClientProfile')
+        invalidate_on_write(Item, lambda item: ['catalog', f'item:{item.pk}', f'maalem:{item.maalem_id}:items'])
+        # Product cards carry the like count
+        invalidate_on_write(Like, lambda like: ['likes', f'item:{like.item_id}:likes'])
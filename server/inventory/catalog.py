@@ -0,0 +1,105 @@
+from django.db import transaction
+from django.db.models import F, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Concat
+
+from .models import CatalogEntry, Item, Like
+from .stats import annotate_item_stats
+
+# Keeps CatalogEntry, the denormalized product cards, in step with the rows
+# it copies from. Each kind of write patches only what it changes:
+#
+#   item saved           every column but like_count, in one statement
+#   item deleted         the card goes with it (CASCADE)
+#   stock moved          stock columns, from sales.holds (stock_changed)
+#   maalem renamed       maalem_name on every card of the maalem
+#   like added/removed   like_count +/- 1; a deleted client's likes in one
+#                        UPDATE before the cascade
+#
+# update() and bulk_create() on items send no signals, so code doing them
+# calls refresh() or stock_changed() itself, or runs rebuild_catalog.
+
+COPIED = [
+    'title', 'description', 'category', 'photoUrl', 'maalemAskPrice', 'minSellPrice',
+    'platformFeePercentage', 'stockQuantity', 'availableQuantity',
+]
+UPDATED = ['maalem_id', 'maalem_name', *COPIED, 'like_count']
+
+
+def refresh(items):
+    """Rebuild the cards of an Item queryset: one query to read, one upsert to write."""
+    rows = annotate_item_stats(items, ['like_count']).annotate(
+        maalem_name=Concat('maalem__firstname', Value(' '), 'maalem__lastname'),
+    ).values('item_id', *UPDATED)
+    entries = [CatalogEntry(**row) for row in rows]
+    CatalogEntry.objects.bulk_create(
+        entries, update_conflicts=True, unique_fields=['item'], update_fields=UPDATED,
+    )
+    return len(entries)
+
+
+def stock_changed(item_ids):
+    columns = _copied_from_item()
+    CatalogEntry.objects.filter(item_id__in=item_ids).update(
+        stockQuantity=columns['stockQuantity'], availableQuantity=columns['availableQuantity'],
+    )
+
+
+def rebuild(chunk_size=1000, stdout=None):
+    """Rebuild every card, one item id range per transaction; returns how many."""
+    last_id = Item.objects.aggregate(last=Max('item_id'))['last'] or 0
+    rebuilt = 0
+    for low in range(0, last_id + 1, chunk_size):
+        high = low + chunk_size
+        with transaction.atomic():
+            count = refresh(Item.objects.filter(item_id__gte=low, item_id__lt=high))
+        rebuilt += count
+        if stdout:
+            stdout.write(f'items {low}-{high - 1}: {count} cards')
+    return rebuilt
+
+
+def _copied_from_item():
+    """UPDATE right-hand sides reading each card's item row, likes excepted."""
+    item = Item.objects.filter(pk=OuterRef('item_id'))
+    name = item.annotate(name=Concat('maalem__firstname', Value(' '), 'maalem__lastname')).values('name')
+    return {
+        'maalem_id': Subquery(item.values('maalem_id')),
+        'maalem_name': Subquery(name),
+        **{field: Subquery(item.values(field)) for field in COPIED},
+    }
+
+
+def item_saved(sender, instance, created, **kwargs):
+    if created:
+        # Nothing refers to a new item yet: no likes, nothing reserved
+        CatalogEntry.objects.create(
+            item_id=instance.pk,
+            maalem_id=instance.maalem_id,
+            maalem_name=str(instance.maalem),
+            **{field: getattr(instance, field) for field in COPIED if field != 'availableQuantity'},
+            availableQuantity=instance.stockQuantity - instance.reservedQuantity,
+        )
+    elif not CatalogEntry.objects.filter(item_id=instance.pk).update(**_copied_from_item()):
+        refresh(Item.objects.filter(pk=instance.pk))
+
+
+def maalem_saved(sender, instance, created, **kwargs):
+    if not created:
+        CatalogEntry.objects.filter(maalem_id=instance.pk).update(maalem_name=str(instance))
+
+
+def like_saved(sender, instance, created, **kwargs):
+    if created:
+        CatalogEntry.objects.filter(item_id=instance.item_id).update(like_count=F('like_count') + 1)
+
+
+def like_deleted(sender, instance, origin=None, **kwargs):
+    # Likes removed by a client or item delete are handled there
+    if getattr(origin, 'model', type(origin)) is Like:
+        CatalogEntry.objects.filter(item_id=instance.item_id).update(like_count=F('like_count') - 1)
+
+
+def client_deleting(sender, instance, **kwargs):
+    # Runs before the cascade removes the client's likes, at most one per item
+    liked = Like.objects.filter(client_id=instance.pk).values('item_id')
+    CatalogEntry.objects.filter(item_id__in=liked).update(like_count=F('like_count') - 1)
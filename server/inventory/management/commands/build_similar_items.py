@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from inventory import similar
+
+
+class Command(BaseCommand):
+    help = (
+        'Compute "similar items" (co-like cosine similarity) for the items whose likes '
+        'changed since the last run, or for every item with --full.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recompute every item.')
+        parser.add_argument('--count', type=int, help='Similar items kept per item (SIMILAR_ITEMS_COUNT).')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Items per similarity block and transaction.')
+
+    def handle(self, *args, full, count, chunk_size, **options):
+        method = similar.build if full else similar.refresh
+        written = method(count, chunk_size, stdout=self.stdout)
+        engine = 'scipy' if similar.sparse is not None else 'python'
+        self.stdout.write(self.style.SUCCESS(f'Computed similar items for {written} item(s) ({engine})'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from inventory.catalog import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized catalog cards (CatalogEntry) from items, maalems and likes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Items per transaction.')
+
+    def handle(self, *args, chunk_size, **options):
+        rebuilt = rebuild(chunk_size, stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rebuilt} catalog cards'))
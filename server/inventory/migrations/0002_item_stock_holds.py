@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-19 12:00
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0001_initial'),
+        ('users', '0007_normalize_phone_numbers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='reservedQuantity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddConstraint(
+            model_name='item',
+            constraint=models.CheckConstraint(condition=models.Q(('reservedQuantity__lte', models.F('stockQuantity'))), name='item_reserved_within_stock'),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='availableQuantity',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('stockQuantity'), '-', models.F('reservedQuantity')), output_field=models.IntegerField()),
+        ),
+    ]
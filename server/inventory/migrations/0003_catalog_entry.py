@@ -0,0 +1,64 @@
+# Generated by Django 6.0.1 on 2026-10-19 12:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Concat
+
+BATCH_SIZE = 1000
+COPIED = [
+    'title', 'description', 'category', 'photoUrl', 'maalemAskPrice', 'minSellPrice',
+    'platformFeePercentage', 'stockQuantity', 'availableQuantity',
+]
+
+
+def build_catalog(apps, schema_editor):
+    # Same cards as inventory.catalog.refresh(), so the catalog endpoints are
+    # complete as soon as the table exists
+    Item = apps.get_model('inventory', 'Item')
+    Like = apps.get_model('inventory', 'Like')
+    CatalogEntry = apps.get_model('inventory', 'CatalogEntry')
+    likes = Like.objects.filter(item=OuterRef('pk')).order_by().values('item').annotate(n=Count('pk')).values('n')
+    rows = Item.objects.order_by('pk').annotate(
+        maalem_name=Concat('maalem__firstname', Value(' '), 'maalem__lastname'),
+        like_count=Coalesce(Subquery(likes), 0),
+    ).values('item_id', 'maalem_id', 'maalem_name', 'like_count', *COPIED)
+    batch = []
+    for row in rows.iterator(chunk_size=BATCH_SIZE):
+        batch.append(CatalogEntry(**row))
+        if len(batch) == BATCH_SIZE:
+            CatalogEntry.objects.bulk_create(batch)
+            batch = []
+    CatalogEntry.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_item_stock_holds'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogEntry',
+            fields=[
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='catalog_entry', serialize=False, to='inventory.item')),
+                ('maalem_id', models.PositiveIntegerField()),
+                ('maalem_name', models.CharField(max_length=201)),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField()),
+                ('category', models.CharField(max_length=100)),
+                ('photoUrl', models.URLField(max_length=500)),
+                ('maalemAskPrice', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('minSellPrice', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('platformFeePercentage', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('stockQuantity', models.PositiveIntegerField()),
+                ('availableQuantity', models.IntegerField()),
+                ('like_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['category', 'item'], name='catalog_category_idx'), models.Index(fields=['maalem_id', 'item'], name='catalog_maalem_idx')],
+            },
+        ),
+        migrations.RunPython(build_catalog, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.0.1 on 2026-10-19 12:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def mark_liked_items(apps, schema_editor):
+    # Everything liked so far is new to the similarity builder; the first
+    # `build_similar_items` (or refresh_similar_items task) computes it all
+    Like = apps.get_model('inventory', 'Like')
+    LikesChanged = apps.get_model('inventory', 'LikesChanged')
+    item_ids = Like.objects.order_by('item_id').values_list('item_id', flat=True).distinct()
+    LikesChanged.objects.bulk_create([LikesChanged(item_id=item_id) for item_id in item_ids], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_catalog_entry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LikesChanged',
+            fields=[
+                ('item_id', models.IntegerField(primary_key=True, serialize=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SimilarItem',
+            fields=[
+                ('pk', models.CompositePrimaryKey('item', 'rank', blank=True, editable=False, primary_key=True, serialize=False)),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('item', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='similar_items', to='inventory.item')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to', to='inventory.item')),
+            ],
+        ),
+        migrations.RunPython(mark_liked_items, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import F, Q
 from django.core.validators import MaxValueValidator, MinValueValidator
 
 
@@ -32,11 +33,84 @@ class Item(models.Model):
         validators=[MinValueValidator(0), MaxValueValidator(100)]
     )
     stockQuantity = models.PositiveIntegerField(default=1)
+    # Units held by pending offers (sales.holds); they stay in stockQuantity
+    # until the offer becomes an order
+    reservedQuantity = models.PositiveIntegerField(default=0)
+    availableQuantity = models.GeneratedField(
+        expression=F('stockQuantity') - F('reservedQuantity'),
+        output_field=models.IntegerField(),
+        db_persist=True,
+    )
+
+    class Meta:
+        constraints = [
+            # The last line of defence against overselling
+            models.CheckConstraint(condition=Q(reservedQuantity__lte=F('stockQuantity')), name='item_reserved_within_stock'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.maalem.firstname} {self.maalem.lastname}"
 
+    def save(self, *args, **kwargs):
+        # reservedQuantity only moves through the conditional UPDATEs in
+        # sales.holds; saving an instance loaded earlier must not write back a
+        # stale count over holds taken in the meantime
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and not field.generated and field.name != 'reservedQuantity'
+            ]
+        super().save(*args, **kwargs)
+
+
+class CatalogEntry(models.Model):
+    # Read model: one ready-to-serve product card per item, kept up to date by
+    # inventory.catalog. Copies what a card needs from the item, its maalem and
+    # its likes, so catalog reads never join. Never edit rows by hand; run
+    # `manage.py rebuild_catalog` if they drift.
+    item = models.OneToOneField(Item, primary_key=True, on_delete=models.CASCADE, related_name='catalog_entry')
+    maalem_id = models.PositiveIntegerField()
+    maalem_name = models.CharField(max_length=201)
+    title = models.CharField(max_length=255)
+    description = models.TextField()
+    category = models.CharField(max_length=100)
+    photoUrl = models.URLField(max_length=500)
+    maalemAskPrice = models.DecimalField(max_digits=10, decimal_places=2)
+    minSellPrice = models.DecimalField(max_digits=10, decimal_places=2)
+    platformFeePercentage = models.DecimalField(max_digits=5, decimal_places=2)
+    stockQuantity = models.PositiveIntegerField()
+    availableQuantity = models.IntegerField()
+    like_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['category', 'item'], name='catalog_category_idx'),
+            models.Index(fields=['maalem_id', 'item'], name='catalog_maalem_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} - {self.maalem_name}"
+
+
+class SimilarItem(models.Model):
+    # "Clients who liked this also liked": an item's most similar items by
+    # cosine similarity of who liked them, rank 1 first. Computed offline by
+    # inventory.similar (`manage.py build_similar_items`), never per request.
+    pk = models.CompositePrimaryKey('item', 'rank')
+    # The primary key indexes item first; no index of its own
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='similar_items', db_index=False)
+    rank = models.PositiveSmallIntegerField()
+    similar = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='similar_to')
+    score = models.FloatField()
+
+    def __str__(self):
+        return f"{self.item_id} #{self.rank}: {self.similar_id} ({self.score:.3f})"
+
 
+class LikesChanged(models.Model):
+    # Items liked or unliked since inventory.similar last computed their
+    # similar items; its incremental refresh starts from these
+    item_id = models.IntegerField(primary_key=True)
 
 
 class Like(models.Model):
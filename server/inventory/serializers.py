@@ -1,7 +1,37 @@
 from rest_framework import serializers
-from .models import Item
+from api.serializers import SparseFieldsMixin, ValuesSerializer
+from .models import CatalogEntry, Item
 
-class ItemSerializer(serializers.ModelSerializer):
+class ItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Item
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+        read_only_fields = ['reservedQuantity']
+
+    def validate_stockQuantity(self, value):
+        reserved = self.instance.reservedQuantity if self.instance else 0
+        if value < reserved:
+            raise serializers.ValidationError(f'{reserved} unit(s) are held by pending offers')
+        return value
+
+class ItemListSerializer(ValuesSerializer):
+    model = Item
+
+class CatalogEntrySerializer(ValuesSerializer):
+    model = CatalogEntry
+
+    @classmethod
+    def field_names(cls):
+        # The card is keyed by item_id, like the item it renders
+        return ['item_id', *super().field_names()[1:]]
+
+class ItemSummarySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    like_count = serializers.IntegerField(read_only=True)
+    pending_offers = serializers.IntegerField(read_only=True)
+    accepted_offers = serializers.IntegerField(read_only=True)
+    units_sold = serializers.IntegerField(read_only=True)
+    revenue = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = Item
+        fields = '__all__'
@@ -0,0 +1,178 @@
+"""
+"Similar items" from who liked what, precomputed offline.
+
+Two items are similar when the same clients liked them: the score is the
+cosine similarity of their likes, co-likes / sqrt(likes of A * likes of B).
+Each item keeps its SIMILAR_ITEMS_COUNT best in SimilarItem, ties broken by
+item id, and GET /inventory/item/similar/<id>/ serves them as product cards.
+
+build(): every item, `chunk_size` items per step. The likes are loaded once
+as (client, item) pairs and each step computes the chunk's rows of the
+item x item similarity matrix, so memory is the like list plus one chunk of
+rows, never the whole matrix. With NumPy and SciPy installed the rows are
+a sparse matrix product; without them, co-like counts in plain Python
+(same results, slower).
+
+refresh(): only what the likes recorded in LikesChanged can have moved, i.e.
+the changed items, the items their likers also liked (their score with a
+changed item moved) and the items listing a changed item. A deleted item
+drops out of every list by cascade; lists it leaves short fill up again the
+next time their items are refreshed or on a full build.
+"""
+import heapq
+import math
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from api.cache import invalidate
+from .models import Item, Like, LikesChanged, SimilarItem
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # pragma: no cover
+    np = sparse = None
+
+# Scores are stored rounded, so float noise does not decide between equal scores
+PRECISION = 6
+
+
+def _likes():
+    return list(Like.objects.values_list('client_id', 'item_id').iterator(chunk_size=10000))
+
+
+def _python_rows(likes, item_ids, count):
+    likers, liked = defaultdict(list), defaultdict(list)
+    for client_id, item_id in likes:
+        likers[item_id].append(client_id)
+        liked[client_id].append(item_id)
+    for item_id in item_ids:
+        co_likes = Counter()
+        for client_id in likers.get(item_id, ()):
+            co_likes.update(liked[client_id])
+        co_likes.pop(item_id, None)
+        norm = len(likers.get(item_id, ()))
+        scored = [
+            (-round(co / math.sqrt(norm * len(likers[other])), PRECISION), other)
+            for other, co in co_likes.items()
+        ]
+        yield item_id, [(other, -score) for score, other in heapq.nsmallest(count, scored)]
+
+
+def _sparse_rows(likes, item_ids, count, chunk_size):
+    pairs = np.array(likes, dtype=np.int64).reshape(-1, 2)
+    items, item_pos = np.unique(pairs[:, 1], return_inverse=True)
+    clients, client_pos = np.unique(pairs[:, 0], return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(pairs)), (item_pos, client_pos)), shape=(len(items), len(clients)),
+    )
+    # Rows scaled to unit length: their dot products are the cosines
+    matrix = (sparse.diags(1 / np.sqrt(np.asarray(matrix.sum(axis=1)).ravel())) @ matrix).tocsr()
+    transposed = matrix.T.tocsr()
+    wanted = np.asarray(item_ids, dtype=np.int64)
+    rows = np.searchsorted(items, wanted)
+    liked = (rows < len(items)) & (items[np.minimum(rows, len(items) - 1)] == wanted)
+    for start in range(0, len(wanted), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        chunk_ids, chunk_rows, chunk_liked = wanted[chunk], rows[chunk], liked[chunk]
+        block = (matrix[chunk_rows[chunk_liked]] @ transposed).tocsr()
+        offset = 0
+        for item_id, row, has_likes in zip(chunk_ids, chunk_rows, chunk_liked):
+            if not has_likes:
+                yield int(item_id), []
+                continue
+            low, high = block.indptr[offset], block.indptr[offset + 1]
+            offset += 1
+            others, scores = block.indices[low:high], np.round(block.data[low:high], PRECISION)
+            keep = others != row
+            others, scores = items[others[keep]], scores[keep]
+            if len(scores) > count:
+                # Everything scoring at least the count-th best, then exact order
+                floor = np.partition(scores, len(scores) - count)[len(scores) - count]
+                keep = scores >= floor
+                others, scores = others[keep], scores[keep]
+            order = np.lexsort((others, -scores))[:count]
+            yield int(item_id), [(int(others[i]), float(scores[i])) for i in order]
+
+
+def similar_rows(item_ids, count=None, chunk_size=1000, likes=None):
+    """(item_id, [(similar_id, score), ...] best first) for each of `item_ids`."""
+    count = count or settings.SIMILAR_ITEMS_COUNT
+    likes = _likes() if likes is None else likes
+    if np is not None and likes:
+        return _sparse_rows(likes, item_ids, count, chunk_size)
+    return _python_rows(likes, item_ids, count)
+
+
+def _store(rows):
+    item_ids = [item_id for item_id, _ in rows]
+    with transaction.atomic():
+        SimilarItem.objects.filter(item_id__in=item_ids).delete()
+        SimilarItem.objects.bulk_create([
+            SimilarItem(item_id=item_id, rank=rank, similar_id=similar_id, score=score)
+            for item_id, similar in rows
+            for rank, (similar_id, score) in enumerate(similar, 1)
+        ])
+
+
+def _write(item_ids, count, chunk_size, stdout):
+    likes = _likes()
+    written, batch = 0, []
+    for row in similar_rows(item_ids, count, chunk_size, likes):
+        batch.append(row)
+        if len(batch) == chunk_size:
+            _store(batch)
+            written += len(batch)
+            batch = []
+            if stdout:
+                stdout.write(f'{written} of {len(item_ids)} items')
+    _store(batch)
+    invalidate('similar')
+    return written + len(batch)
+
+
+def build(count=None, chunk_size=1000, stdout=None):
+    """Recompute the similar items of every item; returns how many items."""
+    # Likes changing from here on are marked again and refreshed next time
+    LikesChanged.objects.all().delete()
+    item_ids = list(Item.objects.order_by('pk').values_list('pk', flat=True))
+    return _write(item_ids, count, chunk_size, stdout)
+
+
+def refresh(count=None, chunk_size=1000, stdout=None):
+    """Recompute what the likes changed since the last build or refresh; returns how many items."""
+    with transaction.atomic():
+        changed = list(LikesChanged.objects.values_list('item_id', flat=True))
+        LikesChanged.objects.filter(item_id__in=changed).delete()
+    if not changed:
+        return 0
+    likers = Like.objects.filter(item_id__in=changed).values('client_id')
+    affected = set(changed)
+    affected.update(Like.objects.filter(client_id__in=likers).values_list('item_id', flat=True).distinct())
+    affected.update(SimilarItem.objects.filter(similar_id__in=changed).values_list('item_id', flat=True))
+    try:
+        return _write(sorted(affected), count, chunk_size, stdout)
+    except BaseException:
+        mark(changed)
+        raise
+
+
+def mark(item_ids):
+    LikesChanged.objects.bulk_create([LikesChanged(item_id=item_id) for item_id in item_ids], ignore_conflicts=True)
+
+
+def like_saved(sender, instance, created, **kwargs):
+    if created:
+        mark([instance.item_id])
+
+
+def like_deleted(sender, instance, origin=None, **kwargs):
+    # A client's likes going with the client are marked in client_deleting
+    if getattr(origin, 'model', type(origin)) is Like:
+        mark([instance.item_id])
+
+
+def client_deleting(sender, instance, **kwargs):
+    mark(Like.objects.filter(client_id=instance.pk).values_list('item_id', flat=True))
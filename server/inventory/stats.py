@@ -0,0 +1,83 @@
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, IntegerField, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from sales.models import ArchivedOffer, ArchivedOrder, Offer, Order
+from .models import Item, Like
+
+# Orders that still count as a sale; returned goods are excluded. Archived
+# offers and orders (sales.archive) count the same as live ones.
+SOLD_ORDERS = ~Q(status='returned')
+CENTS = Decimal('0.01')
+
+
+def _per_item(queryset, item_path, aggregate, output_field):
+    # Correlated aggregate: one scalar subquery per row, no join fan-out
+    # between likes, offers and orders.
+    rows = queryset.filter(**{item_path: OuterRef('pk')}).order_by().values(item_path)
+    return Coalesce(
+        Subquery(rows.annotate(value=aggregate).values('value'), output_field=output_field),
+        0,
+        output_field=output_field,
+    )
+
+
+def annotate_item_stats(items, fields=None):
+    """
+    Annotate like, offer and sales figures on an `Item` queryset in a single
+    query. With `fields`, only the stats named there are computed.
+    """
+    money = DecimalField(max_digits=12, decimal_places=2)
+    sold, archived_sold = Order.objects.filter(SOLD_ORDERS), ArchivedOrder.objects.filter(SOLD_ORDERS)
+    accepted = Q(status='accepted')
+    stats = {
+        'like_count': _per_item(Like.objects.all(), 'item', Count('pk'), IntegerField()),
+        'pending_offers': _per_item(Offer.objects.filter(status='pending'), 'item', Count('pk'), IntegerField()),
+        'accepted_offers': (
+            _per_item(Offer.objects.filter(accepted), 'item', Count('pk'), IntegerField())
+            + _per_item(ArchivedOffer.objects.filter(accepted), 'item', Count('pk'), IntegerField())
+        ),
+        'units_sold': (
+            _per_item(sold, 'offer__item', Sum('order_quantity'), IntegerField())
+            + _per_item(archived_sold, 'offer__item', Sum('order_quantity'), IntegerField())
+        ),
+        'revenue': (
+            _per_item(sold, 'offer__item', Sum('maalem_net'), money)
+            + _per_item(archived_sold, 'offer__item', Sum('maalem_net'), money)
+        ),
+    }
+    if fields is not None:
+        stats = {name: stat for name, stat in stats.items() if name in fields}
+    return items.annotate(**stats)
+
+
+def maalem_totals(maalem_id):
+    """Totals over every item of a maalem, in five aggregate queries."""
+    totals = {}
+    totals.update(Like.objects.filter(item__maalem_id=maalem_id).aggregate(
+        like_count=Count('pk'),
+    ))
+    totals.update(Offer.objects.filter(item__maalem_id=maalem_id).aggregate(
+        pending_offers=Count('pk', filter=Q(status='pending')),
+        accepted_offers=Count('pk', filter=Q(status='accepted')),
+    ))
+    totals.update(Order.objects.filter(SOLD_ORDERS, offer__item__maalem_id=maalem_id).aggregate(
+        units_sold=Coalesce(Sum('order_quantity'), 0),
+        revenue=Coalesce(Sum('maalem_net'), Decimal('0.00')),
+    ))
+    # One row per archived offer: the join to its order cannot fan out
+    archived = ArchivedOffer.objects.filter(item__maalem_id=maalem_id).aggregate(
+        accepted_offers=Count('pk', filter=Q(status='accepted')),
+        units_sold=Coalesce(Sum('order__order_quantity', filter=~Q(order__status='returned')), 0),
+        revenue=Coalesce(Sum('order__maalem_net', filter=~Q(order__status='returned')), Decimal('0.00')),
+    )
+    for name, value in archived.items():
+        totals[name] += value
+    # SQLite sums decimals without their scale; match the items' '0.00'
+    totals['revenue'] = totals['revenue'].quantize(CENTS)
+    totals.update(Item.objects.filter(maalem_id=maalem_id).aggregate(
+        item_count=Count('pk'),
+        stock=Coalesce(Sum('stockQuantity'), 0),
+    ))
+    return totals
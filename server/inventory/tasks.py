@@ -0,0 +1,8 @@
+from tasks.registry import task
+from . import similar
+
+
+@task()
+def refresh_similar_items():
+    """Recompute the similar items of what was liked or unliked since the last run."""
+    similar.refresh()
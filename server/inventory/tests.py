@@ -1,3 +1,141 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import caches
+from django.test import AsyncClient, TestCase
+from rest_framework.test import APIClient
+
+from api.testing import offer_data, profile_data, seed
+from sales.models import Offer, Order
+from users.models import ClientProfile, MaalemProfile
+from . import catalog, similar
+from .models import CatalogEntry, Item, Like, LikesChanged, SimilarItem
+
+
+class CatalogProjectionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ctx = seed(2)
+
+    def cards(self):
+        return {card['item_id']: card for card in CatalogEntry.objects.values('item_id', *catalog.UPDATED)}
+
+    def test_incremental_updates_match_a_full_rebuild(self):
+        client = APIClient()
+        item, other_client = self.ctx['item'], ClientProfile.objects.exclude(pk=self.ctx['client']).first().pk
+        client.post(f'/inventory/item/dislike/{self.ctx["client"]}/', {'item_id': item}, format='json')
+        client.post(f'/inventory/item/like/{self.ctx["client"]}/', {'item_id': item}, format='json')
+        client.post(f'/inventory/item/dislike/{other_client}/', {'item_id': item}, format='json')
+        client.put('/inventory/item/put/', {'item_id': item, 'title': 'Renamed', 'stockQuantity': 50}, format='json')
+        client.post('/sales/offers/make-offer/', offer_data(self.ctx), format='json')
+        client.put(f'/users/maalem/update/{self.ctx["maalem"]}/', profile_data(self.ctx, '0700000001'), format='json')
+        client.delete(f'/users/client/delete/{self.ctx["spare_client"]}/')
+        client.delete(f'/inventory/item/delete/{self.ctx["spare_item"]}/')
+
+        incremental = self.cards()
+        self.assertEqual(incremental[item]['title'], 'Renamed')
+        self.assertEqual(incremental[item]['maalem_name'], str(MaalemProfile.objects.get(pk=self.ctx['maalem'])))
+        self.assertEqual(incremental[item]['like_count'], Like.objects.filter(item_id=item).count())
+        self.assertNotIn(self.ctx['spare_item'], incremental)
+        catalog.rebuild()
+        self.assertEqual(incremental, self.cards())
+
+        response = client.get(f'/inventory/catalog/{item}/', {'fields': 'title,like_count'})
+        self.assertEqual(response.json(), {'title': 'Renamed', 'like_count': incremental[item]['like_count']})
+
+
+class MaalemSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ctx = seed(2)
+        # Returned goods are not sales
+        Order.objects.filter(pk=cls.ctx['order']).update(status='returned')
+
+    def expected(self, item):
+        sold = Order.objects.filter(offer__item=item).exclude(status='returned')
+        return {
+            'like_count': Like.objects.filter(item=item).count(),
+            'pending_offers': Offer.objects.filter(item=item, status='pending').count(),
+            'accepted_offers': Offer.objects.filter(item=item, status='accepted').count(),
+            'units_sold': sum(order.order_quantity for order in sold),
+            'revenue': sum((order.maalem_net for order in sold), Decimal('0.00')),
+        }
+
+    def test_items_and_totals_match_per_item_counts(self):
+        client, path = APIClient(), f'/inventory/maalem/summary/{self.ctx["maalem"]}/'
+        page = client.get(path, {'page_size': 1}).json()
+        totals, results = page['totals'], page['results']
+        while page['next']:
+            page = client.get(page['next']).json()
+            self.assertNotIn('totals', page)
+            results += page['results']
+
+        items = Item.objects.filter(maalem_id=self.ctx['maalem']).order_by('pk')
+        self.assertEqual([item['item_id'] for item in results], [item.pk for item in items])
+        expected_totals = dict.fromkeys(self.expected(items[0]), 0)
+        for item, row in zip(items, results):
+            expected = self.expected(item)
+            self.assertEqual({name: row[name] for name in expected}, {**expected, 'revenue': str(expected['revenue'])})
+            for name, value in expected.items():
+                expected_totals[name] += value
+        self.assertEqual(expected_totals['units_sold'], 1)
+        self.assertEqual(
+            {name: totals[name] for name in expected_totals},
+            {**expected_totals, 'revenue': str(expected_totals['revenue'])},
+        )
+        self.assertEqual((totals['item_count'], totals['stock']), (len(items), sum(item.stockQuantity for item in items)))
+
+        self.assertEqual(client.get('/inventory/maalem/summary/999999/').status_code, 404)
+
+
+class AsyncItemViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ctx = seed(2)
+
+    def setUp(self):
+        for alias in ('responses', 'throttle'):
+            caches[alias].clear()
+        self.client = AsyncClient()
+
+    async def test_item_detail_and_likes(self):
+        item, client = self.ctx['item'], self.ctx['client']
+        response = await self.client.get(f'/inventory/item/{item}/')
+        self.assertEqual((response.status_code, response.json()['item_id']), (200, item))
+        self.assertEqual((await self.client.get('/inventory/item/999999/')).status_code, 404)
+
+        self.assertEqual((await self.client.get(f'/inventory/item/likes/{item}/')).json(), {'item_id': item, 'like_count': 2})
+        self.assertEqual((await self.client.get(f'/inventory/item/like-status/{client}/{item}/')).json(), {'has_liked': True})
+        self.assertEqual((await self.client.get(f'/inventory/item/like-status/{self.ctx["spare_client"]}/{item}/')).json(), {'has_liked': False})
+        self.assertEqual((await self.client.get('/inventory/item/likes/999999/')).status_code, 404)
+
+
+class SimilarItemsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ctx = seed(2)
+
+    def table(self):
+        return list(SimilarItem.objects.order_by('item_id', 'rank').values_list('item_id', 'rank', 'similar_id', 'score'))
+
+    def test_refresh_after_like_changes_matches_a_full_build(self):
+        client, item = APIClient(), self.ctx['item']
+        other_client = ClientProfile.objects.exclude(pk=self.ctx['client']).first().pk
+        not_liked = Item.objects.exclude(like__client_id=self.ctx['client']).first().pk
+        changes = [
+            lambda: client.post(f'/inventory/item/like/{self.ctx["client"]}/', {'item_id': not_liked}, format='json'),
+            lambda: client.post(f'/inventory/item/dislike/{other_client}/', {'item_id': item}, format='json'),
+            lambda: client.delete(f'/users/client/delete/{self.ctx["spare_client"]}/'),
+        ]
+        for change in changes:
+            change()
+            self.assertGreater(similar.refresh(), 0)
+            self.assertFalse(LikesChanged.objects.exists())
+            incremental = self.table()
+            similar.build()
+            self.assertEqual(incremental, self.table())
+
+        cards = client.get(f'/inventory/item/similar/{self.ctx["spare_item"]}/', {'fields': 'item_id,title'}).json()
+        expected = SimilarItem.objects.filter(item_id=self.ctx['spare_item']).order_by('rank')
+        self.assertEqual([card['item_id'] for card in cards], [row.similar_id for row in expected])
+        self.assertEqual(set(cards[0]), {'item_id', 'title', 'score'})
+        self.assertEqual(client.get('/inventory/item/similar/999999/').status_code, 404)
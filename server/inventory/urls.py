@@ -8,7 +8,12 @@ urlpatterns = [
     path('item/delete/<int:id>/', views.del_item),    # <------ DELETE ITEM
     path('item/put/', views.update_item),             # <------ UPDATE ITEM
 
+    path('catalog/', views.get_catalog),                    # <------ PRODUCT CARDS (PRECOMPUTED)
+    path('catalog/<int:id>/', views.get_catalog_entry),     # <------ ONE PRODUCT CARD
+    path('item/similar/<int:item_id>/', views.get_similar_items),  # <------ CLIENTS WHO LIKED THIS ALSO LIKED
+
     path('maalem/items/<int:maalem_id>/', views.get_items_by_maalem),  # <------ MAALEMS SEE THEIR ITEMS
+    path('maalem/summary/<int:maalem_id>/', views.maalem_summary),     # <------ MAALEM DASHBOARD STATS
     path('maalem/items/post/<int:maalem_id>/', views.insert_item_by_maalem),  # <------ MAALEM INSERT ITEM
     path('maalem/items/delete/<int:maalem_id>/', views.del_item_by_maalem),  # <------ MAALEM DELETE ITEM
     path('maalem/items/put/<int:maalem_id>/', views.update_item_by_maalem),  # <------ MAALEM UPDATE ITEM
@@ -1,18 +1,33 @@
+import logging
+
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.decorators import api_view
-from .models import Item, Like, Comment
-from .serializers import ItemSerializer
+from django.db.models import F
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from api.routers import use_replica
+from users.models import MaalemProfile
+from api.pagination import KeysetPagination
+from api.cache import cache_response
+from api.projection import only_fields, sparse_fields
+from .models import CatalogEntry, Item, Like, Comment
+from .serializers import CatalogEntrySerializer, ItemSerializer, ItemListSerializer, ItemSummarySerializer
+from .stats import annotate_item_stats, maalem_totals
+
+logger = logging.getLogger(__name__)
 
 
 
+@use_replica
+@cache_response('catalog')
+@sparse_fields(ItemListSerializer)
 @api_view(['GET'])
 def get_item(request):
-    items = Item.objects.all()
+    items = ItemListSerializer(Item.objects.all(), fields=request.sparse_fields).data
     if not items:
         return Response({'error':'no data'}, status=status.HTTP_404_NOT_FOUND)
-    serialized = ItemSerializer(items, many=True)
-    return Response(serialized.data)
+    return Response(items)
 
 @api_view(['POST'])
 def insert_item(request):
@@ -20,7 +35,7 @@ def insert_item(request):
     if serializer.is_valid():
         serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
-    print(serializer.errors)
+    logger.info('item.rejected', extra={'errors': serializer.errors})
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
  
 @api_view(['DELETE'])
@@ -44,30 +59,106 @@ def update_item(request):
         return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-@api_view(['GET'])
-def get_item_by_id(request, id):
+@use_replica
+@cache_response('item:{id}')
+@sparse_fields(ItemSerializer)
+@require_GET     # <------- async: polled on every product page
+async def get_item_by_id(request, id):
     try:
-        item = Item.objects.get(item_id=id)
+        item = await only_fields(Item.objects.all(), request.sparse_fields).aget(item_id=id)
     except Item.DoesNotExist:
+        return JsonResponse({'error': 'Item not found'}, status=status.HTTP_404_NOT_FOUND)
+    serialized = ItemSerializer(item, fields=request.sparse_fields)
+    return JsonResponse(serialized.data)
+
+
+
+
+
+
+
+
+
+# ?category=<name>&maalem=<id>&in_stock=1&cursor=<c>&page_size=<n>&fields=<a,b>
+@use_replica
+@cache_response('catalog', 'maalems', 'likes')
+@sparse_fields(CatalogEntrySerializer)
+@api_view(['GET'])   # <------- product cards, precomputed: one table, no joins
+def get_catalog(request):
+    params = request.query_params
+    entries = CatalogEntry.objects.all()
+    if params.get('category'):
+        entries = entries.filter(category=params['category'])
+    if params.get('maalem'):
+        if not params['maalem'].isdigit():
+            return Response({'error': 'maalem must be an id'}, status=status.HTTP_400_BAD_REQUEST)
+        entries = entries.filter(maalem_id=params['maalem'])
+    if params.get('in_stock') in ('1', 'true'):
+        entries = entries.filter(availableQuantity__gt=0)
+    fields = request.sparse_fields
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(only_fields(entries, fields), request)
+    return paginator.get_paginated_response(CatalogEntrySerializer(page, fields=fields).data)
+
+
+@use_replica
+@cache_response('item:{id}', 'item:{id}:likes', 'maalems')
+@sparse_fields(CatalogEntrySerializer)
+@require_GET     # <------- async: one product card
+async def get_catalog_entry(request, id):
+    names = CatalogEntrySerializer.field_names() if request.sparse_fields is None else request.sparse_fields
+    card = await CatalogEntry.objects.filter(item_id=id).values('pk', *names).afirst()
+    if card is None:
+        return JsonResponse({'error': 'Item not found'}, status=status.HTTP_404_NOT_FOUND)
+    return JsonResponse({name: card[name] for name in names})
+
+
+@use_replica
+@cache_response('similar', 'catalog', 'maalems', 'likes')
+@sparse_fields(CatalogEntrySerializer)
+@api_view(['GET'])   # <------- "liked this also liked", precomputed by build_similar_items
+def get_similar_items(request, item_id):
+    names = CatalogEntrySerializer.field_names() if request.sparse_fields is None else request.sparse_fields
+    cards = list(
+        CatalogEntry.objects.filter(item__similar_to__item_id=item_id)
+        .order_by('item__similar_to__rank')
+        .values(*names, score=F('item__similar_to__score'))
+    )
+    if not cards and not Item.objects.filter(item_id=item_id).exists():
         return Response({'error': 'Item not found'}, status=status.HTTP_404_NOT_FOUND)
-    serialized = ItemSerializer(item)
-    return Response(serialized.data)
-
-
-
-
-
-
-
+    return Response(cards)
 
 
+@use_replica
+@cache_response('maalem:{maalem_id}:items')
+@sparse_fields(ItemListSerializer)
 @api_view(['GET'])   # <------- maalem sees his own items
 def get_items_by_maalem(request, maalem_id):  
-    items = Item.objects.filter(maalem_id=maalem_id)
+    items = ItemListSerializer(Item.objects.filter(maalem_id=maalem_id), fields=request.sparse_fields).data
     if not items:
         return Response({'error': 'No items found for this Maalem'}, status=status.HTTP_404_NOT_FOUND)
-    serialized = ItemSerializer(items, many=True)
-    return Response(serialized.data)
+    return Response(items)
+
+
+@use_replica
+@sparse_fields(ItemSummarySerializer)
+@api_view(['GET'])   # <------- maalem dashboard: items with stats, totals on the first page
+def maalem_summary(request, maalem_id):
+    if not MaalemProfile.objects.filter(id_maalem=maalem_id).exists():
+        return Response({'error': 'Maalem not found'}, status=status.HTTP_404_NOT_FOUND)
+    fields = request.sparse_fields
+    items = annotate_item_stats(only_fields(Item.objects.filter(maalem_id=maalem_id), fields), fields)
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(items, request)
+    data = {
+        'maalem_id': maalem_id,
+        'next': paginator.get_next_link(),
+        'previous': paginator.get_previous_link(),
+        'results': ItemSummarySerializer(page, many=True, fields=fields).data,
+    }
+    if not request.query_params.get(paginator.cursor_query_param):
+        data['totals'] = maalem_totals(maalem_id)
+    return Response(data)
 
 
 @api_view(['POST'])     # <----- maalem insert an item of his own
@@ -155,22 +246,17 @@ def comment_to_item(request, client_id):
             text=comment_text
         )
     except Exception as e:
-        print(f'🔴🔴 the error: {e}')
+        logger.exception('comment.failed', extra={'client_id': client_id})
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     return Response({'message': 'Comment added successfully'}, status=status.HTTP_201_CREATED)
 
 
-@api_view(['GET'])
-def like_status(request, client_id, item_id):
-    try:
-        item = Item.objects.get(item_id=item_id)
-    except Item.DoesNotExist:
-        return Response({'error': 'Item not found'}, status=status.HTTP_404_NOT_FOUND)
-    try:
-        like = Like.objects.get(client_id=client_id, item=item)
-        return Response({'has_liked': True}, status=status.HTTP_200_OK)
-    except Like.DoesNotExist:
-        return Response({'has_liked': False}, status=status.HTTP_200_OK)
+@require_GET     # <------- async
+async def like_status(request, client_id, item_id):
+    if not await Item.objects.filter(item_id=item_id).aexists():
+        return JsonResponse({'error': 'Item not found'}, status=status.HTTP_404_NOT_FOUND)
+    has_liked = await Like.objects.filter(client_id=client_id, item_id=item_id).aexists()
+    return JsonResponse({'has_liked': has_liked}, status=status.HTTP_200_OK)
 
 
 
@@ -180,17 +266,16 @@ def like_status(request, client_id, item_id):
 
 
 
-@api_view(['GET'])
-def get_likes_for_item(request, item_id):
-    try:
-        item = Item.objects.get(item_id=item_id)
-    except Item.DoesNotExist:
-        return Response({'error': 'Item not found'}, status=status.HTTP_404_NOT_FOUND)
-    likes = Like.objects.filter(item=item)
-    like_count = likes.count()
-    return Response({'item_id': item_id, 'like_count': like_count})
+@use_replica
+@require_GET     # <------- async
+async def get_likes_for_item(request, item_id):
+    if not await Item.objects.filter(item_id=item_id).aexists():
+        return JsonResponse({'error': 'Item not found'}, status=status.HTTP_404_NOT_FOUND)
+    like_count = await Like.objects.filter(item_id=item_id).acount()
+    return JsonResponse({'item_id': item_id, 'like_count': like_count})
 
 
+@use_replica
 @api_view(['GET'])
 def get_comments_for_item(request, item_id):
     try:
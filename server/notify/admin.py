@@ -1,7 +1,27 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from notify.models import Notification
 
+from .tasks import broadcast
+
 # Register your models here.
 
 
-admin.site.register(Notification)
\ No newline at end of file
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    actions = ['broadcast_to_clients', 'broadcast_to_maalems']
+
+    # The fan-out writes a row per recipient, so it runs on a worker once the
+    # admin's request has committed
+    def _broadcast(self, request, queryset, recipients):
+        messages_sent = set(queryset.values_list('message', flat=True))
+        for message in messages_sent:
+            broadcast.enqueue_on_commit(message=message, recipients=recipients)
+        self.message_user(request, f'{len(messages_sent)} broadcast(s) to all {recipients} queued.', messages.SUCCESS)
+
+    @admin.action(description='Send these messages to every client')
+    def broadcast_to_clients(self, request, queryset):
+        self._broadcast(request, queryset, 'clients')
+
+    @admin.action(description='Send these messages to every maalem')
+    def broadcast_to_maalems(self, request, queryset):
+        self._broadcast(request, queryset, 'maalems')
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 12:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('notify', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient_content_type', 'recipient_object_id', 'is_read'], name='notification_recipient_idx'),
+        ),
+    ]
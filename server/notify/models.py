@@ -16,4 +16,9 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # The inbox and unread-count polls; without it they search by
+            # content type alone, which leaves half the table per lookup
+            models.Index(fields=['recipient_content_type', 'recipient_object_id', 'is_read'], name='notification_recipient_idx'),
+        ]
 
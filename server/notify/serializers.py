@@ -1,7 +1,11 @@
 from rest_framework import serializers
+from api.serializers import SparseFieldsMixin, ValuesSerializer
 from .models import Notification
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Notification
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class NotificationListSerializer(ValuesSerializer):
+    model = Notification
@@ -0,0 +1,32 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+
+from changes.feed import record
+from tasks.registry import task
+from users.models import ClientProfile, MaalemProfile
+from .models import Notification
+
+RECIPIENTS = {'clients': ClientProfile, 'maalems': MaalemProfile}
+CHUNK_SIZE = 1000
+
+
+@task()
+def broadcast(message, recipients):
+    """Send `message` to every client or every maalem ('clients' / 'maalems')."""
+    model = RECIPIENTS[recipients]
+    content_type = ContentType.objects.get_for_model(model)
+    ids = model.objects.order_by('pk').values_list('pk', flat=True)
+    # One transaction, so a failed attempt leaves nothing behind for the retry to duplicate
+    with transaction.atomic():
+        batch = []
+        for object_id in ids.iterator(chunk_size=CHUNK_SIZE):
+            batch.append(Notification(message=message, recipient_content_type=content_type, recipient_object_id=object_id))
+            if len(batch) == CHUNK_SIZE:
+                _send(batch)
+                batch = []
+        _send(batch)
+
+
+def _send(batch):
+    Notification.objects.bulk_create(batch)
+    record(Notification, [notification.pk for notification in batch])
@@ -1,3 +1,65 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
+from django.test import AsyncClient, TestCase
 
-# Create your tests here.
+from api.testing import seed
+from tasks.models import Task
+from tasks.registry import REGISTRY
+from users.models import ClientProfile, MaalemProfile
+from .models import Notification
+
+
+class PollingViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ctx = seed(2)
+        cls.content_types = ContentType.objects.get_for_models(ClientProfile, MaalemProfile)
+
+    def setUp(self):
+        for alias in ('responses', 'throttle'):
+            caches[alias].clear()
+        self.client = AsyncClient()
+
+    async def test_unread_counts(self):
+        for kind, model, object_id in (('client', ClientProfile, self.ctx['client']), ('maalem', MaalemProfile, self.ctx['maalem'])):
+            path = f'/notify/unread-notifications/{kind}/{object_id}/'
+            response = await self.client.get(path)
+            self.assertEqual((response.status_code, response.json()), (200, {'unread_count': 1}))
+
+            content_type = self.content_types[model]
+            await Notification.objects.acreate(message='New', recipient_content_type=content_type, recipient_object_id=object_id)
+            self.assertEqual((await self.client.get(path)).json(), {'unread_count': 2})
+
+        self.assertEqual((await self.client.get('/notify/unread-notifications/client/999999/')).json(), {'unread_count': 0})
+        self.assertEqual((await self.client.post(f'/notify/unread-notifications/client/{self.ctx["client"]}/')).status_code, 405)
+
+    async def test_notification_lists(self):
+        response = await self.client.get(f'/notify/client-notifications/{self.ctx["client"]}/')
+        self.assertEqual(response.status_code, 200)
+        content_type = self.content_types[ClientProfile]
+        expected = Notification.objects.filter(recipient_content_type=content_type, recipient_object_id=self.ctx['client'])
+        self.assertEqual([n['notification_id'] for n in response.json()], [n.pk async for n in expected])
+        self.assertEqual((await self.client.get('/notify/maalem-notifications/999999/')).json(), [])
+
+
+class BroadcastAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ctx = seed(2)
+        cls.admin = User.objects.create_superuser('staff', password='secret')
+
+    def test_broadcasts_are_queued_for_a_worker(self):
+        self.client.force_login(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/admin/notify/notification/', {
+                'action': 'broadcast_to_clients', '_selected_action': [self.ctx['notification']],
+            })
+        self.assertEqual(response.status_code, 302)
+        (task,) = Task.objects.all()
+        message = Notification.objects.get(pk=self.ctx['notification']).message
+        self.assertEqual((task.name, task.kwargs), ('notify.broadcast', {'message': message, 'recipients': 'clients'}))
+
+        sent = Notification.objects.filter(message=message).count()
+        REGISTRY[task.name](**task.kwargs)
+        self.assertEqual(Notification.objects.filter(message=message).count(), sent + ClientProfile.objects.count())
@@ -1,9 +1,15 @@
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.decorators import api_view
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_GET
+from api.renderers import FastJSONRenderer
+from api.projection import only_fields, sparse_fields
+from api.routers import use_replica
 from .models import Notification
 from users.models import MaalemProfile, ClientProfile
-from .serializers import NotificationSerializer
+from .serializers import NotificationSerializer, NotificationListSerializer
 from django.contrib.contenttypes.models import ContentType
 
 
@@ -13,10 +19,12 @@ MODEL_MAP = {
 }
 
 
+@use_replica
+@sparse_fields(NotificationListSerializer)
 @api_view(['GET'])
 def notification_list(request):
     notifications = Notification.objects.all()
-    serializer = NotificationSerializer(notifications, many=True)
+    serializer = NotificationListSerializer(notifications, fields=request.sparse_fields)
     return Response(serializer.data)
 
 
@@ -52,13 +60,14 @@ def notification_create(request): # even triggering this endpoint : adming appro
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@sparse_fields(NotificationSerializer)
 @api_view(['GET'])
 def notification_detail(request, notification_id):
     try:
-        notification = Notification.objects.get(notification_id=notification_id)
+        notification = only_fields(Notification.objects.all(), request.sparse_fields).get(notification_id=notification_id)
     except Notification.DoesNotExist:
         return Response({'error': 'Notification not found'}, status=status.HTTP_404_NOT_FOUND)
-    serializer = NotificationSerializer(notification)
+    serializer = NotificationSerializer(notification, fields=request.sparse_fields)
     return Response(serializer.data)
 
 
@@ -88,44 +97,55 @@ def notification_update_delete(request, notification_id):
 
 #______________________________________________________________________________#
 #--------------------------RETRIEVING NOTIFICATIONS----------------------------#
-@api_view(['GET'])
-def client_notifications(request, client_id):
-    client_content_type = ContentType.objects.get(model='clientprofile')
-    notifications = Notification.objects.filter(
-        recipient_content_type=client_content_type,
-        recipient_object_id=client_id
-    )
-    serializer = NotificationSerializer(notifications, many=True)
-    return Response(serializer.data)
+async def _content_type_id(model):
+    # get_for_model() caches per process (cleared on flush), so polls skip the lookup
+    content_type = await sync_to_async(ContentType.objects.get_for_model)(model)
+    return content_type.id
 
 
-@api_view(['GET'])
-def maalem_notifications(request, maalem_id):
-    maalem_content_type = ContentType.objects.get(model='maalemprofile')
+async def _notifications_for(model, object_id, fields=None):
     notifications = Notification.objects.filter(
-        recipient_content_type=maalem_content_type,
-        recipient_object_id=maalem_id
+        recipient_content_type_id=await _content_type_id(model),
+        recipient_object_id=object_id
     )
-    serializer = NotificationSerializer(notifications, many=True)
-    return Response(serializer.data)
+    if fields is None:
+        fields = NotificationListSerializer.field_names()
+    if fields:
+        rows = [row async for row in notifications.values(*fields)]
+    else:
+        rows = [{} async for _ in notifications.values('pk')]
+    return HttpResponse(FastJSONRenderer().render(rows), content_type='application/json')
+
+
+async def _unread_count_for(model, object_id):
+    count = await Notification.objects.filter(
+        recipient_content_type_id=await _content_type_id(model),
+        recipient_object_id=object_id,
+        is_read=False
+    ).acount()
+    return JsonResponse({'unread_count': count})
 
 
-@api_view(['GET'])
-def client_unread_notifications_count(request, client_id):
-    client_content_type = ContentType.objects.get(model='clientprofile')
-    count = Notification.objects.filter(
-        recipient_content_type=client_content_type,
-        recipient_object_id=client_id,
-        is_read=False
-    ).count()
-    return Response({'unread_count': count})
+@use_replica
+@sparse_fields(NotificationListSerializer)
+@require_GET
+async def client_notifications(request, client_id):
+    return await _notifications_for(ClientProfile, client_id, request.sparse_fields)
 
-@api_view(['GET'])
-def maalem_unread_notifications_count(request, maalem_id):
-    maalem_content_type = ContentType.objects.get(model='maalemprofile')
-    count = Notification.objects.filter(
-        recipient_content_type=maalem_content_type,
-        recipient_object_id=maalem_id,
-        is_read=False
-    ).count()
-    return Response({'unread_count': count})
\ No newline at end of file
+
+@use_replica
+@sparse_fields(NotificationListSerializer)
+@require_GET
+async def maalem_notifications(request, maalem_id):
+    return await _notifications_for(MaalemProfile, maalem_id, request.sparse_fields)
+
+
+@use_replica
+@require_GET    # <------- polled every few seconds by the header badge
+async def client_unread_notifications_count(request, client_id):
+    return await _unread_count_for(ClientProfile, client_id)
+
+@use_replica
+@require_GET
+async def maalem_unread_notifications_count(request, maalem_id):
+    return await _unread_count_for(MaalemProfile, maalem_id)
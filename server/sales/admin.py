@@ -1,8 +1,9 @@
 from django.contrib import admin
-from .models import Offer, Order
+from .models import Offer, Order, OrderRating
 
 # Register your models here.
 
 
 admin.site.register(Offer)
-admin.site.register(Order)
\ No newline at end of file
+admin.site.register(Order)
+admin.site.register(OrderRating)
\ No newline at end of file
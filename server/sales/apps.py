@@ -1,5 +1,21 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save, pre_save
 
 
 class SalesConfig(AppConfig):
     name = 'sales'
+
+    def ready(self):
+        from api.cache import invalidate_on_write
+        from .models import ArchivedOffer, ArchivedOrder, Offer, Order
+        from .holds import offer_deleted
+        from .ratings import rating_deleted, rating_saved, rating_saving
+        pre_save.connect(rating_saving, sender='sales.OrderRating')
+        post_save.connect(rating_saved, sender='sales.OrderRating')
+        post_delete.connect(rating_deleted, sender='sales.OrderRating')
+        post_delete.connect(offer_deleted, sender='sales.Offer')
+        invalidate_on_write(Offer, lambda offer: ['offers', f'offer:{offer.pk}', f'client:{offer.client_id}:offers'])
+        invalidate_on_write(Order, lambda order: ['orders', f'order:{order.pk}'])
+        # ?include_archived=1 reads are cached under the same tags
+        invalidate_on_write(ArchivedOffer, lambda offer: ['offers', f'offer:{offer.pk}', f'client:{offer.client_id}:offers'])
+        invalidate_on_write(ArchivedOrder, lambda order: ['orders', f'order:{order.pk}'])
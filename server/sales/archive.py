@@ -0,0 +1,127 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from api.cache import invalidate
+from changes.feed import record
+from .models import ArchivedOffer, ArchivedOrder, Offer, Order, OrderRating
+
+# Hot/cold split of sales history. Orders that are finished (paid out to the
+# maalem, or returned) move to ArchivedOrder with their offer once older than
+# ARCHIVE_AFTER_DAYS; offers that were rejected or expired without becoming
+# an order move to ArchivedOffer on their own. Nothing else moves: an
+# accepted offer stays as long as its order does, so Order.offer's PROTECT
+# never points across tables, and ArchivedOrder.offer PROTECTs the copies
+# the same way.
+#
+# Each batch is one transaction: copy offers, copy orders, point their
+# ratings at the archived order, delete the orders, delete the offers. The
+# deletes are plain DELETE statements, without the collector or the model
+# signals, which are for rows that stop existing: a rating must not leave
+# the maalem's totals and a hold has nothing to release. What the signals
+# would do is done here per batch instead: the change feed gets the
+# tombstones (archived rows leave the default reads) and the response cache
+# tags are invalidated.
+#
+# Skipping the collector relies on what the batch itself guarantees, under
+# the row locks it holds:
+#   - OrderRating.order (CASCADE): every rating of a moved order was
+#     repointed to its archived copy just before, so there is nothing left
+#     to cascade to.
+#   - Order.offer (PROTECT): orders are deleted before offers, and an offer
+#     moves either with its order or, in archive_offers, only if it has none.
+# The database's own foreign keys still back both, checked at commit: a
+# batch that broke them fails with IntegrityError and rolls back whole.
+
+ORDER_STATUSES = ('maalem_paid', 'returned')
+OFFER_STATUSES = ('rejected', 'expired')
+
+
+def cutoff(days=None):
+    return timezone.now() - timedelta(days=settings.ARCHIVE_AFTER_DAYS if days is None else days)
+
+
+def _copy(model, archive, ids, now):
+    columns = [field.attname for field in model._meta.concrete_fields]
+    rows = model.objects.filter(pk__in=ids).values(*columns)
+    archive.objects.bulk_create([archive(**row, archived_at=now) for row in rows])
+
+
+def _delete(model, ids):
+    if not ids:
+        return
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(model._meta.db_table)} WHERE {quote(model._meta.pk.column)} IN ({", ".join(["%s"] * len(ids))})',
+            ids,
+        )
+
+
+def _move(order_ids, offer_ids):
+    now = timezone.now()
+    _copy(Offer, ArchivedOffer, offer_ids, now)
+    _copy(Order, ArchivedOrder, order_ids, now)
+    OrderRating.objects.filter(order_id__in=order_ids).update(archived_order_id=F('order_id'), order=None)
+    _delete(Order, order_ids)
+    _delete(Offer, offer_ids)
+    record(Order, order_ids, deleted=True)
+    record(Offer, offer_ids, deleted=True)
+
+
+def _invalidate(order_ids, offers):
+    tags = {'orders', 'offers', *(f'order:{order_id}' for order_id in order_ids)}
+    for offer_id, client_id in offers:
+        tags.update((f'offer:{offer_id}', f'client:{client_id}:offers'))
+    invalidate(*tags)
+
+
+def archive_orders(before, batch_size=500):
+    """Archive finished orders placed before `before`, with their offers; returns how many orders."""
+    archived = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                Order.objects.select_for_update(of=('self',))
+                .filter(status__in=ORDER_STATUSES, order_date__lt=before)
+                .order_by('order_date')
+                .values_list('order_id', 'offer_id', 'offer__client_id')[:batch_size]
+            )
+            if not rows:
+                return archived
+            order_ids = [row[0] for row in rows]
+            _move(order_ids, [row[1] for row in rows])
+            _invalidate(order_ids, [row[1:] for row in rows])
+        archived += len(rows)
+        if len(rows) < batch_size:
+            return archived
+
+
+def archive_offers(before, batch_size=500):
+    """Archive rejected and expired offers without an order, made before `before`; returns how many."""
+    archived = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                Offer.objects.select_for_update(of=('self',))
+                .filter(status__in=OFFER_STATUSES, date__lt=before, order__isnull=True)
+                .order_by('date')
+                .values_list('offer_id', 'client_id')[:batch_size]
+            )
+            if not rows:
+                return archived
+            _move([], [row[0] for row in rows])
+            _invalidate([], rows)
+        archived += len(rows)
+        if len(rows) < batch_size:
+            return archived
+
+
+def archive(days=None, batch_size=500):
+    """Move everything finished more than `days` (ARCHIVE_AFTER_DAYS) ago; returns (orders, offers)."""
+    before = cutoff(days)
+    return archive_orders(before, batch_size), archive_offers(before, batch_size)
@@ -0,0 +1,162 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from api.cache import invalidate
+from changes.feed import record
+from inventory import catalog
+from inventory.models import Item
+from .models import Offer
+
+# Stock holds. A pending offer reserves its quantity on the item the moment
+# it is made, so two clients can no longer both be promised the last unit.
+# Every change is a single conditional UPDATE: reserving only matches the
+# item row while availableQuantity (stockQuantity - reservedQuantity, a
+# stored generated column) still covers the quantity, so concurrent offers
+# serialize on the row lock and the loser gets OutOfStock instead of an
+# oversold item. Holds end when the offer is converted, leaves pending, is
+# deleted, or reaches hold_expires_at and is swept by expire_holds(). An
+# offer accepted before its order exists keeps its hold (expire_holds()
+# only sweeps pending offers) until the order is created and sell() turns
+# the hold into the sale.
+#
+# These are update() calls, which send no model signals, so the response
+# cache tags of the item are invalidated, its change recorded and its
+# catalog card updated here. The offer updates in release() and sell() are
+# not recorded: their callers save or delete the offer right after, which is.
+
+
+class OutOfStock(Exception):
+    def __init__(self, available):
+        self.available = max(available or 0, 0)
+        super().__init__(f'Only {self.available} unit(s) available')
+
+
+def _stock_changed(item_id, maalem_id):
+    invalidate('catalog', f'item:{item_id}', f'maalem:{maalem_id}:items')
+    record(Item, [item_id])
+    catalog.stock_changed([item_id])
+
+
+def hold_expiry():
+    return timezone.now() + timedelta(seconds=settings.OFFER_HOLD_SECONDS)
+
+
+def reserve(item, quantity):
+    """Reserve `quantity` units of `item`, or raise OutOfStock if fewer are available."""
+    reserved = Item.objects.filter(item_id=item.pk, availableQuantity__gte=quantity).update(
+        reservedQuantity=F('reservedQuantity') + quantity,
+    )
+    if not reserved:
+        raise OutOfStock(Item.objects.filter(item_id=item.pk).values_list('availableQuantity', flat=True).first())
+    _stock_changed(item.pk, item.maalem_id)
+
+
+def unreserve(item_id, maalem_id, quantity):
+    Item.objects.filter(item_id=item_id).update(reservedQuantity=F('reservedQuantity') - quantity)
+    _stock_changed(item_id, maalem_id)
+
+
+def release(offer):
+    """Give back the units an offer holds; False if it held none (released, expired or converted already)."""
+    with transaction.atomic(savepoint=False):
+        # Conditional on the hold, so the sweeper and a rejection racing for
+        # the same offer release it once
+        if not Offer.objects.filter(offer_id=offer.pk, hold_expires_at__isnull=False).update(hold_expires_at=None):
+            return False
+        unreserve(offer.item_id, offer.item.maalem_id, offer.offer_quantity)
+    offer.hold_expires_at = None
+    return True
+
+
+def _moves_hold(offer, data):
+    # A different item or quantity needs its hold taken again
+    return (
+        ('item' in data and data['item'].pk != offer.item_id)
+        or data.get('offer_quantity', offer.offer_quantity) != offer.offer_quantity
+    )
+
+
+def save_offer(serializer):
+    """
+    Save an offer from a validated OfferSerializer, keeping its hold in step:
+    a pending offer holds its quantity, and accepting it keeps the hold for
+    the order to take over with sell(); anything else holds nothing. Raises
+    OutOfStock, with nothing saved, when the item cannot cover the quantity.
+    """
+    offer, data = serializer.instance, serializer.validated_data
+    status = data.get('status', offer.status if offer else 'pending')
+    with transaction.atomic():
+        if offer is not None and offer.status == 'pending' and status == 'accepted' and not _moves_hold(offer, data):
+            return serializer.save()
+        if offer is not None:
+            release(offer)
+        if status != 'pending':
+            return serializer.save()
+        item = data['item'] if 'item' in data else offer.item
+        reserve(item, data['offer_quantity'] if 'offer_quantity' in data else offer.offer_quantity)
+        return serializer.save(hold_expires_at=hold_expiry())
+
+
+def sell(offer):
+    """
+    Take an offer's quantity out of stock when it becomes an order. Held units
+    move out of stock and the hold together; an offer without a hold (made
+    before holds existed, or expired) needs that many units available.
+    """
+    quantity = offer.offer_quantity
+    with transaction.atomic(savepoint=False):
+        if Offer.objects.filter(offer_id=offer.pk, hold_expires_at__isnull=False).update(hold_expires_at=None):
+            Item.objects.filter(item_id=offer.item_id).update(
+                stockQuantity=F('stockQuantity') - quantity,
+                reservedQuantity=F('reservedQuantity') - quantity,
+            )
+        elif not Item.objects.filter(item_id=offer.item_id, availableQuantity__gte=quantity).update(
+            stockQuantity=F('stockQuantity') - quantity,
+        ):
+            raise OutOfStock(Item.objects.filter(item_id=offer.item_id).values_list('availableQuantity', flat=True).first())
+        _stock_changed(offer.item_id, offer.item.maalem_id)
+    offer.hold_expires_at = None
+
+
+def offer_deleted(sender, instance, **kwargs):
+    # Deletes cascading from a client or an item; the offer views release first
+    if instance.hold_expires_at is not None:
+        maalem_id = Item.objects.filter(item_id=instance.item_id).values_list('maalem_id', flat=True).first()
+        unreserve(instance.item_id, maalem_id, instance.offer_quantity)
+
+
+def expire_holds(batch_size=500, now=None):
+    """
+    Expire pending offers whose hold has run out, `batch_size` at a time in
+    hold_expires_at order (offer_hold_expiry_idx), one transaction per batch.
+    Returns the number of offers expired.
+    """
+    now = now or timezone.now()
+    expired = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                Offer.objects.select_for_update(of=('self',))
+                .filter(status='pending', hold_expires_at__lt=now)
+                .order_by('hold_expires_at')
+                .values_list('offer_id', 'client_id', 'item_id', 'item__maalem_id', 'offer_quantity')[:batch_size]
+            )
+            if not rows:
+                return expired
+            Offer.objects.filter(offer_id__in=[row[0] for row in rows]).update(status='expired', hold_expires_at=None)
+            released, tags = defaultdict(int), {'offers'}
+            for offer_id, client_id, item_id, maalem_id, quantity in rows:
+                released[item_id, maalem_id] += quantity
+                tags.update((f'offer:{offer_id}', f'client:{client_id}:offers'))
+            invalidate(*tags)
+            record(Offer, [row[0] for row in rows])
+            for (item_id, maalem_id), quantity in released.items():
+                unreserve(item_id, maalem_id, quantity)
+        expired += len(rows)
+        if len(rows) < batch_size:
+            return expired
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from sales.archive import archive
+
+
+class Command(BaseCommand):
+    help = (
+        'Move orders paid out or returned, with their offers, and rejected or expired '
+        'offers older than ARCHIVE_AFTER_DAYS to the archive tables.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Archive what is older than this (default ARCHIVE_AFTER_DAYS).')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows per transaction.')
+
+    def handle(self, *args, days, batch_size, **options):
+        orders, offers = archive(days, batch_size)
+        self.stdout.write(f'{orders} order(s) and {offers} offer(s) archived')
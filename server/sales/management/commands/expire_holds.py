@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from sales.holds import expire_holds
+
+
+class Command(BaseCommand):
+    help = 'Expire pending offers whose stock hold has run out and release the units they held.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Offers per transaction.')
+        parser.add_argument('--loop', type=float, help='Keep sweeping, this many seconds apart.')
+
+    def handle(self, *args, batch_size, loop, **options):
+        while True:
+            expired = expire_holds(batch_size)
+            self.stdout.write(f'{expired} offer(s) expired')
+            if not loop:
+                break
+            time.sleep(loop)
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+
+from api.cache import invalidate_all
+from changes.feed import record
+from sales.models import OrderRating
+from users import cache as login_cache
+from users.models import MaalemProfile
+
+
+class Command(BaseCommand):
+    help = 'Recompute MaalemProfile rating totals from OrderRating rows, one id range at a time.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Maalems per transaction.')
+        parser.add_argument('--start', type=int, default=0, help='Resume from this maalem id.')
+
+    def handle(self, *args, chunk_size, start, **options):
+        last_id = MaalemProfile.objects.aggregate(last=Max('id_maalem'))['last'] or 0
+        updated = 0
+        for low in range(start, last_id + 1, chunk_size):
+            high = low + chunk_size
+            with transaction.atomic():
+                maalems = list(
+                    MaalemProfile.objects.select_for_update()
+                    .filter(id_maalem__gte=low, id_maalem__lt=high)
+                    .only('id_maalem', 'phoneNumber', 'rating_sum', 'rating_count', 'rating')
+                )
+                totals = {
+                    row['maalem']: row
+                    for row in OrderRating.objects.filter(maalem_id__gte=low, maalem_id__lt=high)
+                    .values('maalem')
+                    .annotate(total=Sum('score'), count=Count('pk'))
+                }
+                changed = []
+                for maalem in maalems:
+                    row = totals.get(maalem.id_maalem, {'total': 0, 'count': 0})
+                    rating = row['total'] / row['count'] if row['count'] else 0.0
+                    if (maalem.rating_sum, maalem.rating_count, maalem.rating) == (row['total'], row['count'], rating):
+                        continue
+                    maalem.rating_sum = row['total']
+                    maalem.rating_count = row['count']
+                    maalem.rating = rating
+                    changed.append(maalem)
+                MaalemProfile.objects.bulk_update(changed, ['rating_sum', 'rating_count', 'rating'])
+                # Only the maalems that were off, so a nightly run does not resend them all to the change feed
+                record(MaalemProfile, [maalem.pk for maalem in changed])
+                login_cache.invalidate('maalem', *(maalem.phoneNumber for maalem in changed))
+            updated += len(changed)
+            self.stdout.write(f'maalems {low}-{high - 1}: {len(changed)} of {len(maalems)} updated')
+        # bulk_update() sends no signals for the response and login caches to act on
+        invalidate_all()
+        self.stdout.write(self.style.SUCCESS(f'Recomputed ratings, {updated} maalem(s) corrected'))
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-19 11:26
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0001_initial'),
+        ('users', '0006_maalem_rating_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderRating',
+            fields=[
+                ('rating_id', models.AutoField(primary_key=True, serialize=False)),
+                ('score', models.PositiveSmallIntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(5)])),
+                ('comment', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.clientprofile')),
+                ('maalem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ratings', to='users.maalemprofile')),
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='rating', to='sales.order')),
+            ],
+        ),
+    ]
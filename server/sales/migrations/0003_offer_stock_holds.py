@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_item_stock_holds'),
+        ('sales', '0002_orderrating'),
+        ('users', '0007_normalize_phone_numbers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='offer',
+            name='hold_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='offer',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('accepted', 'Accepted'), ('rejected', 'Rejected'), ('expired', 'Expired')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='offer',
+            index=models.Index(fields=['status', 'hold_expires_at'], name='offer_hold_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 6.0.1 on 2026-10-19 12:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_similar_items'),
+        ('sales', '0003_offer_stock_holds'),
+        ('users', '0007_normalize_phone_numbers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOffer',
+            fields=[
+                ('offer_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('offer_quantity', models.PositiveIntegerField()),
+                ('maalem_net_offer', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('client_offer_total', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('platform_margin', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('accepted', 'Accepted'), ('rejected', 'Rejected'), ('expired', 'Expired')], max_length=20)),
+                ('date', models.DateTimeField()),
+                ('hold_expires_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('order_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('order_quantity', models.PositiveIntegerField()),
+                ('platform_margin', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('maalem_net', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('delivery_fee', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('final_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('final_paid', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('order_date', models.DateTimeField()),
+                ('pickup_address', models.TextField()),
+                ('delivery_address', models.TextField()),
+                ('pickup_time', models.DateTimeField(blank=True, null=True)),
+                ('delivery_time', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pickedUp', 'Picked Up'), ('delivered', 'Delivered'), ('cash_collected', 'Cash Collected'), ('maalem_paid', 'Maalem Paid'), ('returned', 'Returned')], max_length=20)),
+                ('archived_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='orderrating',
+            name='order',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rating', to='sales.order'),
+        ),
+        migrations.AddIndex(
+            model_name='offer',
+            index=models.Index(fields=['status', 'date'], name='offer_archive_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'order_date'], name='order_archive_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedoffer',
+            name='client',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_offers', to='users.clientprofile'),
+        ),
+        migrations.AddField(
+            model_name='archivedoffer',
+            name='item',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_offers', to='inventory.item'),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='offer',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.PROTECT, related_name='order', to='sales.archivedoffer'),
+        ),
+        migrations.AddField(
+            model_name='orderrating',
+            name='archived_order',
+            field=models.OneToOneField(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rating', to='sales.archivedorder'),
+        ),
+        migrations.AddConstraint(
+            model_name='orderrating',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('archived_order__isnull', True), ('order__isnull', False)), models.Q(('archived_order__isnull', False), ('order__isnull', True)), _connector='OR'), name='rating_order_or_archived_order'),
+        ),
+    ]
@@ -1,10 +1,13 @@
 from django.db import models
+from django.db.models import Q
+from django.core.validators import MaxValueValidator, MinValueValidator
 
 class Offer(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('accepted', 'Accepted'),
         ('rejected', 'Rejected'),
+        ('expired', 'Expired'),
     ]
 
     offer_id = models.AutoField(primary_key=True)
@@ -15,11 +18,20 @@ class Offer(models.Model):
     platform_margin = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     date = models.DateTimeField(auto_now_add=True)
+    # Set while offer_quantity is reserved on the item (sales.holds); the
+    # offer expires when this passes without a conversion
+    hold_expires_at = models.DateTimeField(null=True, blank=True)
     
     # Relationships
     client = models.ForeignKey('users.ClientProfile', on_delete=models.CASCADE)
     item = models.ForeignKey('inventory.Item', on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'hold_expires_at'], name='offer_hold_expiry_idx'),
+            models.Index(fields=['status', 'date'], name='offer_archive_idx'),
+        ]
+
     def __str__(self):
         return f"Offer {self.offer_id} - {self.status}"
 
@@ -55,5 +67,87 @@ class Order(models.Model):
     # OneToOne ensures an offer can only be converted to an order once.
     offer = models.OneToOneField(Offer, on_delete=models.PROTECT, related_name='order')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'order_date'], name='order_archive_idx'),
+        ]
+
+    def __str__(self):
+        return f"Order {self.order_id} (from Offer {self.offer.offer_id})"
+
+
+class OrderRating(models.Model):
+    # Orders in these states have reached the client and can be rated
+    RATEABLE_STATUSES = ('delivered', 'cash_collected', 'maalem_paid')
+
+    rating_id = models.AutoField(primary_key=True)
+    score = models.PositiveSmallIntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
+    comment = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    # Exactly one of the two: sales.archive moves the rating over with its order
+    order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name='rating', null=True, blank=True)
+    archived_order = models.OneToOneField(
+        'ArchivedOrder', on_delete=models.CASCADE, related_name='rating', null=True, blank=True, editable=False,
+    )
+    client = models.ForeignKey('users.ClientProfile', on_delete=models.CASCADE)
+    # Denormalized from order.offer.item.maalem so recomputation can group without joins
+    maalem = models.ForeignKey('users.MaalemProfile', on_delete=models.CASCADE, related_name='ratings')
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=Q(order__isnull=False, archived_order__isnull=True) | Q(order__isnull=True, archived_order__isnull=False),
+                name='rating_order_or_archived_order',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Rating {self.score}/5 for Order {self.order_id}"
+
+
+# Cold storage for finished business (sales.archive): orders paid out or
+# returned, their offers, and rejected or expired offers that never became
+# orders, once older than ARCHIVE_AFTER_DAYS. Same columns and ids as the
+# live rows, which keep the operational tables small; reads include them
+# with ?include_archived=1.
+
+class ArchivedOffer(models.Model):
+    offer_id = models.IntegerField(primary_key=True)
+    offer_quantity = models.PositiveIntegerField()
+    maalem_net_offer = models.DecimalField(max_digits=10, decimal_places=2)
+    client_offer_total = models.DecimalField(max_digits=10, decimal_places=2)
+    platform_margin = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=20, choices=Offer.STATUS_CHOICES)
+    date = models.DateTimeField()
+    hold_expires_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField()
+
+    client = models.ForeignKey('users.ClientProfile', on_delete=models.CASCADE, related_name='archived_offers')
+    item = models.ForeignKey('inventory.Item', on_delete=models.CASCADE, related_name='archived_offers')
+
+    def __str__(self):
+        return f"Archived offer {self.offer_id} - {self.status}"
+
+
+class ArchivedOrder(models.Model):
+    order_id = models.IntegerField(primary_key=True)
+    order_quantity = models.PositiveIntegerField()
+    platform_margin = models.DecimalField(max_digits=10, decimal_places=2)
+    maalem_net = models.DecimalField(max_digits=10, decimal_places=2)
+    delivery_fee = models.DecimalField(max_digits=10, decimal_places=2)
+    final_price = models.DecimalField(max_digits=10, decimal_places=2)
+    final_paid = models.DecimalField(max_digits=10, decimal_places=2, default=0.0)
+    order_date = models.DateTimeField()
+    pickup_address = models.TextField()
+    delivery_address = models.TextField()
+    pickup_time = models.DateTimeField(null=True, blank=True)
+    delivery_time = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    archived_at = models.DateTimeField()
+
+    # As Order.offer: an archived offer cannot go while its order is kept
+    offer = models.OneToOneField(ArchivedOffer, on_delete=models.PROTECT, related_name='order')
+
     def __str__(self):
-        return f"Order {self.order_id} (from Offer {self.offer.offer_id})"
\ No newline at end of file
+        return f"Archived order {self.order_id} (from Offer {self.offer_id})"
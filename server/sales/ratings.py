@@ -0,0 +1,71 @@
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Cast
+
+from api.cache import invalidate
+from changes.feed import record
+from users import cache as login_cache
+from users.models import MaalemProfile
+from .models import OrderRating
+
+
+def apply_rating(maalem_id, score_delta, count_delta):
+    """
+    Shift a maalem's running rating totals in one UPDATE statement. The right-hand
+    sides read the pre-update row, so concurrent ratings never lose increments and
+    `rating` always equals rating_sum / rating_count.
+    """
+    new_sum = Cast(F('rating_sum') + score_delta, FloatField())
+    new_count = Cast(F('rating_count') + count_delta, FloatField())
+    MaalemProfile.objects.filter(id_maalem=maalem_id).update(
+        rating_sum=F('rating_sum') + score_delta,
+        rating_count=F('rating_count') + count_delta,
+        rating=Case(
+            When(rating_count=-count_delta, then=Value(0.0)),
+            default=new_sum / new_count,
+            output_field=FloatField(),
+        ),
+    )
+    record(MaalemProfile, [maalem_id])
+    # update() sends no signal, and the response and login caches hold the maalem with its rating
+    invalidate('maalems', f'maalem:{maalem_id}')
+    login_cache.invalidate('maalem', MaalemProfile.objects.filter(id_maalem=maalem_id).values_list('phoneNumber', flat=True).first())
+
+
+def rate_order(order, client_id, score, comment=''):
+    with transaction.atomic():
+        return OrderRating.objects.create(
+            order=order, client_id=client_id, maalem_id=order.offer.item.maalem_id, score=score, comment=comment
+        )
+
+
+# Totals follow the OrderRating rows themselves, whichever code path (view,
+# admin, shell) writes them. rate_order and the admin wrap the insert in a
+# transaction and Django deletes inside one, so the counter update commits or
+# rolls back together with the row. An edited rating moves its old score
+# out and the new one in, also across maalems.
+def rating_saving(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding or (update_fields is not None and not {'score', 'maalem'} & set(update_fields)):
+        return
+    instance._stored_rating = (
+        OrderRating.objects.filter(pk=instance.pk).values_list('maalem_id', 'score').first()
+    )
+
+
+def rating_saved(sender, instance, created, **kwargs):
+    if created:
+        apply_rating(instance.maalem_id, instance.score, 1)
+        return
+    stored = instance.__dict__.pop('_stored_rating', None)
+    if stored is None or stored == (instance.maalem_id, instance.score):
+        return
+    maalem_id, score = stored
+    if maalem_id == instance.maalem_id:
+        apply_rating(maalem_id, instance.score - score, 0)
+    else:
+        apply_rating(maalem_id, -score, -1)
+        apply_rating(instance.maalem_id, instance.score, 1)
+
+
+def rating_deleted(sender, instance, **kwargs):
+    apply_rating(instance.maalem_id, -instance.score, -1)
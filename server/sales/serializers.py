@@ -1,12 +1,41 @@
 from rest_framework import serializers
-from .models import Offer, Order
+from api.serializers import SparseFieldsMixin, ValuesSerializer
+from .models import ArchivedOffer, ArchivedOrder, Offer, Order, OrderRating
 
-class OfferSerializer(serializers.ModelSerializer):
+class OfferSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Offer
         fields = '__all__'
+        read_only_fields = ['hold_expires_at']
 
-class OrderSerializer(serializers.ModelSerializer):
+class OfferListSerializer(ValuesSerializer):
+    model = Offer
+
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Order
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class OrderListSerializer(ValuesSerializer):
+    model = Order
+
+# Archived rows (?include_archived=1) come out with the keys of the live ones
+class ArchivedOfferListSerializer(ValuesSerializer):
+    model = ArchivedOffer
+
+    @classmethod
+    def field_names(cls):
+        return OfferListSerializer.field_names()
+
+class ArchivedOrderListSerializer(ValuesSerializer):
+    model = ArchivedOrder
+
+    @classmethod
+    def field_names(cls):
+        return OrderListSerializer.field_names()
+
+class OrderRatingSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrderRating
+        fields = '__all__'
+        read_only_fields = ['order', 'maalem']
@@ -0,0 +1,24 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+from tasks.registry import task
+from . import archive, holds
+
+
+@task()
+def reconcile_ratings():
+    """Recompute every maalem's rating totals from the rating rows (nightly, from cron)."""
+    call_command('recompute_ratings', stdout=StringIO())
+
+
+@task()
+def expire_offer_holds(batch_size=500):
+    """`manage.py expire_holds` as a task, for deployments that already run a worker."""
+    holds.expire_holds(batch_size)
+
+
+@task()
+def archive_sales(days=None, batch_size=500):
+    """`manage.py archive_sales` as a task (nightly, from cron)."""
+    archive.archive(days, batch_size)
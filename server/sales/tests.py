@@ -1,3 +1,242 @@
-from django.test import TestCase
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import ProtectedError
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.testing import offer_data, order_data, seed
+from inventory.models import Item
+from users.models import ClientProfile, MaalemProfile
+from . import archive
+from .holds import expire_holds
+from .models import ArchivedOffer, ArchivedOrder, Offer, Order, OrderRating
+
+
+class StockHoldConcurrencyTests(TransactionTestCase):
+    """Many clients racing for the last units, each on its own thread and database connection."""
+    clients = 12
+
+    def setUp(self):
+        maalem = MaalemProfile.objects.create(firstname='M', lastname='Fassi', address='Fes', phoneNumber='0500000000')
+        self.item = Item.objects.create(
+            maalem=maalem, title='Last lanterns', description='Brass', category='metalwork',
+            photoUrl='https://example.com/lantern.jpg', maalemAskPrice='100.00', minSellPrice='90.00', stockQuantity=5,
+        )
+        self.client_ids = [
+            ClientProfile.objects.create(firstname=f'C{n}', lastname='Alami', address='Rabat', phoneNumber=f'06{n:08}').pk
+            for n in range(self.clients)
+        ]
+
+    def race(self, call):
+        barrier = threading.Barrier(len(self.client_ids))
+
+        def run(client_id):
+            try:
+                barrier.wait()
+                return call(client_id)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(len(self.client_ids)) as pool:
+            return list(pool.map(run, self.client_ids))
+
+    def offer(self, client_id, quantity=1):
+        return APIClient().post('/sales/offers/make-offer/', {
+            **offer_data({'client': client_id, 'item': self.item.pk}), 'offer_quantity': quantity,
+        }, format='json').status_code
+
+    def test_concurrent_offers_never_reserve_more_than_the_stock(self):
+        statuses = self.race(self.offer)
+        self.assertEqual((statuses.count(201), statuses.count(409)), (5, self.clients - 5))
+        item = Item.objects.get(pk=self.item.pk)
+        self.assertEqual((item.stockQuantity, item.reservedQuantity, item.availableQuantity), (5, 5, 0))
+        self.assertEqual(Offer.objects.filter(hold_expires_at__isnull=False).count(), 5)
+
+    def test_rejections_and_expiry_release_each_hold_once(self):
+        self.race(lambda client_id: self.offer(client_id, quantity=1))
+        offers = list(Offer.objects.filter(status='pending'))
+        Offer.objects.update(hold_expires_at=timezone.now() - timedelta(seconds=1))
+
+        # The sweeper and a rejection of every offer race for the same holds
+        def reject(client_id):
+            offer = next((offer for offer in offers if offer.client_id == client_id), None)
+            if offer is None:
+                return expire_holds(batch_size=2)
+            return APIClient().patch(f'/sales/offers/{offer.pk}/', {'status': 'rejected'}, format='json').status_code
+
+        self.race(reject)
+        item = Item.objects.get(pk=self.item.pk)
+        self.assertEqual((item.reservedQuantity, item.availableQuantity), (0, 5))
+        self.assertFalse(Offer.objects.filter(status='pending').exists())
+
+
+class OrderStockTests(TestCase):
+    """Offers turned into orders the way the admin offers page does it, on the last unit of an item."""
+
+    @classmethod
+    def setUpTestData(cls):
+        maalem = MaalemProfile.objects.create(firstname='M', lastname='Fassi', address='Fes', phoneNumber='0500000000')
+        cls.item = Item.objects.create(
+            maalem=maalem, title='Last lantern', description='Brass', category='metalwork',
+            photoUrl='https://example.com/lantern.jpg', maalemAskPrice='100.00', minSellPrice='90.00', stockQuantity=1,
+        )
+        cls.client_ids = [
+            ClientProfile.objects.create(firstname=f'C{n}', lastname='Alami', address='Rabat', phoneNumber=f'06{n:08}').pk
+            for n in range(2)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def offer(self, client_id):
+        response = self.client.post(
+            '/sales/offers/make-offer/', offer_data({'client': client_id, 'item': self.item.pk}), format='json',
+        )
+        return response.status_code, response.json().get('offer_id')
+
+    def order(self, offer_id):
+        return {**order_data({'pending_offer': offer_id}), 'status': 'pickedUp'}
+
+    def stock(self):
+        item = Item.objects.get(pk=self.item.pk)
+        return item.stockQuantity, item.reservedQuantity
+
+    def test_order_then_accept_sells_the_hold_once(self):
+        status_code, offer_id = self.offer(self.client_ids[0])
+        self.assertEqual(status_code, 201)
+        self.assertEqual(self.client.post('/sales/orders/create/', self.order(offer_id), format='json').status_code, 201)
+        response = self.client.patch(f'/sales/offers/{offer_id}/', {'status': 'accepted'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.stock(), (0, 0))
+        self.assertEqual(self.offer(self.client_ids[1])[0], 409)
+
+    def test_accept_then_order_keeps_the_unit_promised(self):
+        _, offer_id = self.offer(self.client_ids[0])
+        self.client.patch(f'/sales/offers/{offer_id}/', {'status': 'accepted'}, format='json')
+        self.assertEqual(self.stock(), (1, 1))
+        self.assertEqual(self.offer(self.client_ids[1])[0], 409)
+        # An accepted offer can still be converted
+        response = self.client.post('/sales/orders/create-order/', self.order(offer_id), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.stock(), (0, 0))
+        self.assertEqual(Offer.objects.get(pk=offer_id).status, 'accepted')
+
+    def test_rejected_offer_cannot_become_an_order(self):
+        _, offer_id = self.offer(self.client_ids[0])
+        self.client.patch(f'/sales/offers/{offer_id}/', {'status': 'rejected'}, format='json')
+        self.assertEqual(self.client.post('/sales/orders/create/', self.order(offer_id), format='json').status_code, 409)
+        self.assertEqual(self.stock(), (1, 0))
+
+
+class RatingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ctx = seed(2)
+
+    def assertTotalsMatchRatings(self):
+        totals = list(MaalemProfile.objects.order_by('pk').values_list('rating_sum', 'rating_count', 'rating'))
+        call_command('recompute_ratings', stdout=StringIO())
+        self.assertEqual(totals, list(MaalemProfile.objects.order_by('pk').values_list('rating_sum', 'rating_count', 'rating')))
+
+    def test_edits_and_deletes_move_the_totals(self):
+        rating = OrderRating.objects.first()
+        rating.score = 1
+        rating.save()
+        self.assertTotalsMatchRatings()
+        rating.comment = 'Late'
+        rating.save(update_fields=['comment'])
+        self.assertTotalsMatchRatings()
+        rating.maalem = MaalemProfile.objects.exclude(pk=rating.maalem_id).first()
+        rating.score = 5
+        rating.save()
+        self.assertTotalsMatchRatings()
+        self.assertEqual(MaalemProfile.objects.get(pk=rating.maalem_id).rating, 5.0)
+        rating.delete()
+        self.assertTotalsMatchRatings()
+
+    def test_cached_maalems_follow_a_moved_rating(self):
+        caches['responses'].clear()
+        client = APIClient()
+        rating = OrderRating.objects.filter(maalem_id=self.ctx['maalem']).first()
+        other = MaalemProfile.objects.exclude(pk=rating.maalem_id).first().pk
+        for maalem_id in (rating.maalem_id, other):
+            client.get(f'/users/maalem/{maalem_id}/')
+            self.assertEqual(client.get(f'/users/maalem/{maalem_id}/')['X-Cache'], 'HIT')
+        rating.maalem_id, rating.score = other, 1
+        with self.captureOnCommitCallbacks(execute=True):
+            rating.save()
+        for maalem_id in (self.ctx['maalem'], other):
+            response = client.get(f'/users/maalem/{maalem_id}/')
+            self.assertEqual(response['X-Cache'], 'MISS')
+            self.assertEqual(response.json()['rating'], MaalemProfile.objects.get(pk=maalem_id).rating)
+
+    def test_an_order_is_rated_once(self):
+        client, url = APIClient(), f'/sales/orders/{self.ctx["rateable_order"]}/rate/'
+        data = {'client': self.ctx['client'], 'score': 4}
+        self.assertEqual(client.post(url, data, format='json').status_code, 201)
+        # What the loser of two concurrent ratings gets too: the insert hits the unique order
+        response = client.post(url, {**data, 'score': 1}, format='json')
+        self.assertEqual((response.status_code, response.json()), (400, {'error': 'Order already rated'}))
+        self.assertTotalsMatchRatings()
+
+
+class ArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ctx = seed(2)
+
+    def test_finished_sales_move_with_their_ratings_and_keep_counting(self):
+        client, old = APIClient(), timezone.now() - timedelta(days=365)
+        order = Order.objects.get(pk=self.ctx['order'])
+        Order.objects.filter(pk=order.pk).update(status='maalem_paid', order_date=old)
+        # Finished but recent: stays
+        Order.objects.filter(pk=self.ctx['rateable_order']).update(status='maalem_paid')
+        Offer.objects.filter(pk=self.ctx['pending_offer']).update(status='rejected', date=old)
+        summary = client.get(f'/inventory/maalem/summary/{self.ctx["maalem"]}/').json()
+        rating = MaalemProfile.objects.values('rating', 'rating_count').get(pk=self.ctx['maalem'])
+        self.assertEqual(len(client.get('/sales/orders/').json()), Order.objects.count())
+
+        out = StringIO()
+        # The cached order list is invalidated once the batch commits
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('archive_sales', stdout=out)
+        self.assertIn('1 order(s) and 1 offer(s) archived', out.getvalue())
+        self.assertFalse(Order.objects.filter(pk=order.pk).exists())
+        self.assertFalse(Offer.objects.filter(pk__in=[order.offer_id, self.ctx['pending_offer']]).exists())
+        self.assertTrue(Order.objects.filter(pk=self.ctx['rateable_order']).exists())
+        archived = ArchivedOrder.objects.get(pk=order.pk)
+        self.assertEqual((archived.offer_id, archived.rating.order_id), (order.offer_id, None))
+        self.assertEqual(MaalemProfile.objects.values('rating', 'rating_count').get(pk=self.ctx['maalem']), rating)
+        self.assertEqual(client.get(f'/inventory/maalem/summary/{self.ctx["maalem"]}/').json(), summary)
+
+        orders = [row['order_id'] for row in client.get('/sales/orders/').json()]
+        self.assertNotIn(order.pk, orders)
+        orders = [row['order_id'] for row in client.get('/sales/orders/', {'include_archived': 1}).json()]
+        self.assertIn(order.pk, orders)
+        self.assertEqual(client.get(f'/sales/orders/{order.pk}/').status_code, 404)
+        response = client.get(f'/sales/orders/{order.pk}/', {'include_archived': 1, 'fields': 'order_id,offer'})
+        self.assertEqual(response.json(), {'order_id': order.pk, 'offer': order.offer_id})
+        offers = client.get(f'/sales/offers/client/{self.ctx["client"]}/', {'include_archived': 'true'}).json()
+        self.assertIn(self.ctx['pending_offer'], [row['offer_id'] for row in offers])
+
+        with self.assertRaises(ProtectedError):
+            ArchivedOffer.objects.get(pk=order.offer_id).delete()
+        # Nothing left to move
+        out = StringIO()
+        call_command('archive_sales', stdout=out)
+        self.assertIn('0 order(s) and 0 offer(s) archived', out.getvalue())
+
+    def test_the_foreign_keys_back_the_batch(self):
+        # An offer moved without its order breaks Order.offer, which the database catches
+        offer_id = Order.objects.get(pk=self.ctx['order']).offer_id
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            archive._move([], [offer_id])
+            connection.check_constraints()
+        self.assertTrue(Offer.objects.filter(pk=offer_id).exists())
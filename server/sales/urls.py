@@ -12,6 +12,7 @@ urlpatterns = [
 	path('orders/', views.order_list, name='order-list'),
 	path('orders/create/', views.order_create, name='order-create'),
 	path('orders/<int:order_id>/', views.order_detail, name='order-detail'),
+	path('orders/<int:order_id>/rate/', views.order_rate, name='order-rate'),
 
     path('offers/make-offer/', views.make_offer, name='make-offer'),
     path('orders/create-order/', views.convert_offer_to_order, name='create-order'),
@@ -1,89 +1,162 @@
+import logging
+
+from django.db import IntegrityError, transaction
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.decorators import api_view
-from .models import Offer, Order
-from .serializers import OfferSerializer, OrderSerializer
-from typing import TYPE_CHECKING
-if TYPE_CHECKING:
-    from inventory.models import Item
+from api.cache import cache_response
+from api.projection import only_fields, sparse_fields
+from api.routers import use_replica
+from .models import ArchivedOffer, ArchivedOrder, Offer, Order, OrderRating
+from .serializers import (
+    ArchivedOfferListSerializer, ArchivedOrderListSerializer, OfferSerializer, OfferListSerializer,
+    OrderSerializer, OrderListSerializer, OrderRatingSerializer,
+)
+from .ratings import rate_order
+from .holds import OutOfStock, release, save_offer, sell
+
+logger = logging.getLogger(__name__)
+
+
+# Finished sales move to the archive tables after ARCHIVE_AFTER_DAYS
+# (sales.archive); reads leave them out unless asked for with
+# ?include_archived=1, which lists them after the live rows.
+def include_archived(request):
+    return request.GET.get('include_archived', '').lower() in ('1', 'true')
 
 
 
 
     
 # Offer CRUD
+@use_replica
+@cache_response('offers')
+@sparse_fields(OfferListSerializer)
 @api_view(['GET'])
 def offer_list(request):
-    offers = Offer.objects.all()
-    serializer = OfferSerializer(offers, many=True)
-    return Response(serializer.data)
+    offers = OfferListSerializer(Offer.objects.all(), fields=request.sparse_fields).data
+    if include_archived(request):
+        offers += ArchivedOfferListSerializer(ArchivedOffer.objects.all(), fields=request.sparse_fields).data
+    return Response(offers)
+
+def out_of_stock(exc):
+    return Response({'error': str(exc), 'available': exc.available}, status=status.HTTP_409_CONFLICT)
+
+# Offers an order can still be made from; rejected and expired ones were turned down
+CONVERTIBLE = ('pending', 'accepted')
+
+def save_order(serializer, offer):
+    """Save an order for `offer`, selling its quantity (its hold, if it has one) and accepting it."""
+    with transaction.atomic():
+        sell(offer)
+        serializer.save()
+        if offer.status != 'accepted':
+            offer.status = 'accepted'
+            offer.save()
 
 @api_view(['POST'])
 def offer_create(request):
     serializer = OfferSerializer(data=request.data)
     if serializer.is_valid():
-        serializer.save()
+        try:
+            save_offer(serializer)
+        except OutOfStock as exc:
+            return out_of_stock(exc)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@cache_response('offer:{offer_id}')
+@sparse_fields(OfferSerializer)
 @api_view(['GET', 'PUT', 'PATCH', 'DELETE'])
 def offer_detail(request, offer_id):
+    # Writes need the whole row; only reads are projected
+    fields = request.sparse_fields if request.method == 'GET' else None
     try:
-        offer = Offer.objects.get(offer_id=offer_id)
+        offer = only_fields(Offer.objects.all(), fields).get(offer_id=offer_id)
     except Offer.DoesNotExist:
+        if request.method == 'GET' and include_archived(request):
+            archived = ArchivedOfferListSerializer(ArchivedOffer.objects.filter(offer_id=offer_id), fields=fields).data
+            if archived:
+                return Response(archived[0])
         return Response({'error': 'Offer not found'}, status=status.HTTP_404_NOT_FOUND)
 
     if request.method == 'GET':
-        serializer = OfferSerializer(offer)
+        serializer = OfferSerializer(offer, fields=fields)
         return Response(serializer.data)
     elif request.method in ['PUT', 'PATCH']:
         partial = request.method == 'PATCH'
         serializer = OfferSerializer(offer, data=request.data, partial=partial)
         if serializer.is_valid():
-            serializer.save()
+            try:
+                save_offer(serializer)
+            except OutOfStock as exc:
+                return out_of_stock(exc)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     elif request.method == 'DELETE':
+        release(offer)
         offer.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+@use_replica
+@cache_response('client:{client_id}:offers')
+@sparse_fields(OfferListSerializer)
 @api_view(['GET'])
 def offer_by_client(request, client_id):
-    offers = Offer.objects.filter(client_id=client_id)
+    offers = OfferListSerializer(Offer.objects.filter(client_id=client_id), fields=request.sparse_fields).data
+    if include_archived(request):
+        archived = ArchivedOffer.objects.filter(client_id=client_id)
+        offers += ArchivedOfferListSerializer(archived, fields=request.sparse_fields).data
     if not offers:
         return Response({'error': 'No offers found for this client'}, status=status.HTTP_404_NOT_FOUND)
-    serializer = OfferSerializer(offers, many=True)
-    return Response(serializer.data)
+    return Response(offers)
 
 
 
 
 # Order CRUDclear
+@use_replica
+@cache_response('orders')
+@sparse_fields(OrderListSerializer)
 @api_view(['GET'])
 def order_list(request):
-    orders = Order.objects.all()
-    serializer = OrderSerializer(orders, many=True)
-    return Response(serializer.data)
+    orders = OrderListSerializer(Order.objects.all(), fields=request.sparse_fields).data
+    if include_archived(request):
+        orders += ArchivedOrderListSerializer(ArchivedOrder.objects.all(), fields=request.sparse_fields).data
+    return Response(orders)
 
 @api_view(['POST'])
 def order_create(request):
     serializer = OrderSerializer(data=request.data)
     if serializer.is_valid():
-        serializer.save()
+        offer = serializer.validated_data['offer']
+        if offer.status not in CONVERTIBLE:
+            return Response({'error': f'Offer is {offer.status}'}, status=status.HTTP_409_CONFLICT)
+        try:
+            save_order(serializer, offer)
+        except OutOfStock as exc:
+            return out_of_stock(exc)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
-    print('🔴🔴🔴🔴🔴🔴🔴🔴:', serializer.errors)
+    logger.info('order.rejected', extra={'errors': serializer.errors})
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@cache_response('order:{order_id}')
+@sparse_fields(OrderSerializer)
 @api_view(['GET', 'PUT', 'PATCH', 'DELETE'])
 def order_detail(request, order_id):
+    fields = request.sparse_fields if request.method == 'GET' else None
     try:
-        order = Order.objects.get(order_id=order_id)
+        order = only_fields(Order.objects.all(), fields).get(order_id=order_id)
     except Order.DoesNotExist:
+        if request.method == 'GET' and include_archived(request):
+            archived = ArchivedOrderListSerializer(ArchivedOrder.objects.filter(order_id=order_id), fields=fields).data
+            if archived:
+                return Response(archived[0])
         return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
 
     if request.method == 'GET':
-        serializer = OrderSerializer(order)
+        serializer = OrderSerializer(order, fields=fields)
         return Response(serializer.data)
     elif request.method in ['PUT', 'PATCH']:
         partial = request.method == 'PATCH'
@@ -107,13 +180,16 @@ def order_detail(request, order_id):
 # platfrom_margin is calculated as client_offer_total - maalem_net_offer in frontend
 @api_view(['POST'])
 def make_offer(request):
-    # quantity check will be handled in frontend
-    print(f'the type of pk coming is {type(request.data.get("client"))}')
+    # the offer holds its quantity on the item until it is converted, rejected or expires
+    logger.debug('offer.received', extra={'client_type': type(request.data.get('client')).__name__})
     serializer = OfferSerializer(data=request.data)
     if serializer.is_valid():
-        serializer.save()
+        try:
+            save_offer(serializer)
+        except OutOfStock as exc:
+            return out_of_stock(exc)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
-    print(serializer.errors)
+    logger.info('offer.rejected', extra={'errors': serializer.errors})
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -121,17 +197,39 @@ def make_offer(request):
 @api_view(['POST'])
 def convert_offer_to_order(request):
     try:
-        offer = Offer.objects.get(offer_id=request.data.get('offer_id'))
+        offer = Offer.objects.select_related('item').get(offer_id=request.data.get('offer_id'))
     except Offer.DoesNotExist:
         return Response({'error': 'Offer not found'}, status=status.HTTP_404_NOT_FOUND)
+    if offer.status not in CONVERTIBLE:
+        return Response({'error': f'Offer is {offer.status}'}, status=status.HTTP_409_CONFLICT)
     serializer = OrderSerializer(data=request.data)
     if serializer.is_valid():
-        serializer.save()
-        # Update offer status to accepted
-        offer.status = 'accepted'
-        offer.save()
-        currenItem: Item = offer.item
-        currenItem.stockQuantity = currenItem.stockQuantity - offer.offer_quantity
-        currenItem.save()
+        try:
+            save_order(serializer, offer)
+        except OutOfStock as exc:
+            return out_of_stock(exc)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+# request body: client, score (1-5), comment (optional)
+@api_view(['POST'])
+def order_rate(request, order_id):
+    try:
+        order = Order.objects.select_related('offer__item').get(order_id=order_id)
+    except Order.DoesNotExist:
+        return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
+    serializer = OrderRatingSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    client = serializer.validated_data['client']
+    if order.offer.client_id != client.client_id:
+        return Response({'error': 'Only the client who placed the order can rate it'}, status=status.HTTP_403_FORBIDDEN)
+    if order.status not in OrderRating.RATEABLE_STATUSES:
+        return Response({'error': 'Order is not completed yet'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        rating = rate_order(order, client.client_id, serializer.validated_data['score'], serializer.validated_data.get('comment', ''))
+    except IntegrityError:
+        # The order's rating is unique; a second one, even racing the first, lands here
+        return Response({'error': 'Order already rated'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(OrderRatingSerializer(rating).data, status=status.HTTP_201_CREATED)
\ No newline at end of file
@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class TasksConfig(AppConfig):
+    name = 'tasks'
+
+    def ready(self):
+        from api.metrics import collectors
+        from .metrics import queue_metrics
+        # Registers the @task functions in every app's tasks.py
+        autodiscover_modules('tasks')
+        collectors.append(queue_metrics)
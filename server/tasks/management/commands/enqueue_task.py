@@ -0,0 +1,26 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.registry import REGISTRY, enqueue
+
+
+class Command(BaseCommand):
+    help = 'Enqueue a registered background task, e.g. from cron.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', help='Task name, e.g. sales.reconcile_ratings.')
+        parser.add_argument('--kwargs', default='{}', help='Task arguments as a JSON object.')
+        parser.add_argument('--delay', type=int, default=0, help='Seconds before the task may run.')
+
+    def handle(self, *args, name, kwargs, delay, **options):
+        if name not in REGISTRY:
+            raise CommandError(f'No task named {name}; registered: {", ".join(sorted(REGISTRY))}')
+        try:
+            kwargs = json.loads(kwargs)
+        except ValueError as e:
+            raise CommandError(f'--kwargs is not valid JSON: {e}')
+        if not isinstance(kwargs, dict):
+            raise CommandError('--kwargs must be a JSON object')
+        task = enqueue(name, delay=delay, **kwargs)
+        self.stdout.write(self.style.SUCCESS(f'Enqueued task {task.pk} ({name})'))
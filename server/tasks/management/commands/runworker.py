@@ -0,0 +1,52 @@
+import signal
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+from tasks.registry import REGISTRY
+from tasks.worker import Worker
+
+
+class Command(BaseCommand):
+    help = ('Run background tasks from the tasks table on a thread or process pool. '
+            'SIGTERM / Ctrl-C stops claiming and lets running tasks finish.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help='Tasks run at the same time.')
+        parser.add_argument('--pool', choices=['thread', 'process'], default='thread',
+                            help='process for CPU-bound tasks; thread for I/O-bound ones.')
+        parser.add_argument('--poll-interval', type=float, help='Seconds between polls of an empty queue.')
+        parser.add_argument('--visibility-timeout', type=int,
+                            help='Seconds before an unfinished task is handed to another worker.')
+        parser.add_argument('--stats-interval', type=int, default=60, help='Seconds between worker.stats log lines.')
+        parser.add_argument('--metrics-port', type=int, help='Serve this worker\'s counters in Prometheus format.')
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty.')
+
+    def handle(self, *args, concurrency, pool, poll_interval, visibility_timeout, stats_interval, metrics_port,
+               burst, **options):
+        worker = Worker(concurrency, pool, poll_interval, visibility_timeout, stats_interval)
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: worker.stop())
+        if metrics_port:
+            self.serve_metrics(worker, metrics_port)
+        self.stderr.write(
+            f'Worker {worker.id}: {pool} pool of {concurrency}, tasks: {", ".join(sorted(REGISTRY)) or "none registered"}'
+        )
+        worker.run(burst=burst)
+
+    def serve_metrics(self, worker, port):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = worker.stats.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('', port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
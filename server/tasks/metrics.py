@@ -0,0 +1,28 @@
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .models import Task
+
+LIVE_STATUSES = ('queued', 'running')
+
+
+def queue_metrics():
+    """Queue depth and lag for /metrics/, read from the tasks table (workers keep their own counters).
+
+    Only live rows are counted, through task_claim_idx: finished ones pile up
+    until the worker purges them and are counted by the workers instead.
+    """
+    now = timezone.now()
+    depth = (
+        Task.objects.filter(status__in=LIVE_STATUSES)
+        .values('name', 'status').annotate(count=Count('pk')).order_by('name', 'status')
+    )
+    oldest = Task.objects.filter(status='queued', run_at__lte=now).aggregate(oldest=Min('run_at'))['oldest']
+    lines = ['# HELP tasks_queue_depth Queued and running tasks by name.', '# TYPE tasks_queue_depth gauge']
+    lines += [f'tasks_queue_depth{{name="{row["name"]}",status="{row["status"]}"}} {row["count"]}' for row in depth]
+    lines += [
+        '# HELP tasks_queue_lag_seconds Age of the oldest task due but not yet picked up.',
+        '# TYPE tasks_queue_lag_seconds gauge',
+        f'tasks_queue_lag_seconds {(now - oldest).total_seconds() if oldest else 0}',
+    ]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,37 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    task_id = models.AutoField(primary_key=True)
+    name = models.CharField(max_length=200)
+    kwargs = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    # Not picked up before this time; moved forward by retry backoff
+    run_at = models.DateTimeField(default=timezone.now)
+    # Visibility timeout: a running task whose worker has not finished it by
+    # then is handed to another worker
+    locked_until = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=64, blank=True, default='')
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='task_claim_idx'),
+            models.Index(fields=['status', 'locked_until'], name='task_expired_idx'),
+        ]
+
+    def __str__(self):
+        return f"Task {self.task_id} {self.name} - {self.status}"
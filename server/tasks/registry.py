@@ -0,0 +1,79 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Task
+
+# Background tasks are plain functions registered by name, usually in an
+# app's tasks.py (imported by TasksConfig.ready()):
+#
+#     @task()
+#     def reconcile_ratings():
+#         ...
+#
+#     reconcile_ratings.enqueue()            # run by `manage.py runworker`
+#     reconcile_ratings.enqueue(delay=60)    # not before a minute from now
+#     reconcile_ratings.enqueue_on_commit()  # once the current transaction commits
+#
+# enqueue() inserts the row on the caller's connection, so inside a
+# transaction the task becomes visible to workers exactly when that
+# transaction commits and disappears with it on rollback. Request code uses
+# enqueue_on_commit(), which inserts the row after the commit instead: the
+# task is never enqueued for work that rolled back, and the insert does not
+# hold the request's transaction open. Arguments are stored as JSON: pass
+# ids, not model instances.
+#
+# Delivery is at least once. A task that raises is retried with backoff up
+# to `max_attempts`; one still running when the visibility timeout expires
+# (its worker died or it hung) is handed to another worker. Tasks should
+# therefore be safe to run twice.
+
+REGISTRY = {}
+
+
+class TaskFunction:
+    def __init__(self, func, name, max_attempts):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.__doc__ = func.__doc__
+
+    def __call__(self, **kwargs):
+        """Run inline, e.g. from a shell or a test."""
+        return self.func(**kwargs)
+
+    def enqueue(self, delay=0, **kwargs):
+        return Task.objects.create(
+            name=self.name,
+            kwargs=kwargs,
+            max_attempts=self.max_attempts,
+            run_at=timezone.now() + timedelta(seconds=delay),
+        )
+
+    def enqueue_on_commit(self, delay=0, **kwargs):
+        """Enqueue once the current transaction commits (at once outside one); nothing on rollback."""
+        transaction.on_commit(lambda: self.enqueue(delay=delay, **kwargs))
+
+    def __repr__(self):
+        return f'<task {self.name}>'
+
+
+def task(name=None, max_attempts=None):
+    """Register a function as a background task, by default as '<app>.<function name>'."""
+    def decorator(func):
+        task_name = name or f'{func.__module__.split(".")[0]}.{func.__name__}'
+        if task_name in REGISTRY:
+            raise ValueError(f'task {task_name} is already registered')
+        REGISTRY[task_name] = TaskFunction(func, task_name, max_attempts or settings.TASK_MAX_ATTEMPTS)
+        return REGISTRY[task_name]
+    return decorator
+
+
+def enqueue(name, delay=0, **kwargs):
+    """Enqueue a registered task by name."""
+    try:
+        return REGISTRY[name].enqueue(delay=delay, **kwargs)
+    except KeyError:
+        raise LookupError(f'no task named {name}; registered: {", ".join(sorted(REGISTRY))}') from None
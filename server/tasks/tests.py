@@ -0,0 +1,180 @@
+import os
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from notify.models import Notification
+from users.models import ClientProfile
+from .metrics import queue_metrics
+from .models import Task
+from .registry import REGISTRY, TaskFunction, enqueue
+from .worker import Worker, backoff, claim, complete, fail, purge
+
+
+class TaskQueueTests(TestCase):
+    def test_enqueue_rolls_back_with_its_transaction(self):
+        with self.assertRaises(ZeroDivisionError), transaction.atomic():
+            enqueue('sales.reconcile_ratings')
+            1 / 0
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(ZeroDivisionError), transaction.atomic():
+                REGISTRY['sales.reconcile_ratings'].enqueue_on_commit()
+                1 / 0
+        self.assertEqual((len(callbacks), Task.objects.count()), (0, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            REGISTRY['sales.reconcile_ratings'].enqueue_on_commit(delay=60)
+            # Not before the commit
+            self.assertFalse(Task.objects.exists())
+        (task,) = Task.objects.all()
+        self.assertGreater(task.run_at, timezone.now() + timedelta(seconds=50))
+        with self.assertRaises(LookupError):
+            enqueue('sales.no_such_task')
+
+    def test_claim_is_exclusive_and_failures_retry_until_max_attempts(self):
+        for _ in range(3):
+            Task.objects.create(name='sales.reconcile_ratings', max_attempts=2)
+        first = claim(2, 'worker-a', 60)
+        second = claim(5, 'worker-b', 60)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse({task.pk for task in first} & {task.pk for task in second})
+
+        self.assertEqual(complete(first[0]), 'done')
+        self.assertEqual(fail(first[1], 'boom'), 'retried')
+        Task.objects.filter(pk=first[1].pk).update(run_at=F('created_at'))
+        (retry,) = claim(5, 'worker-a', 60)
+        self.assertEqual((retry.pk, retry.attempts), (first[1].pk, 2))
+        self.assertEqual(fail(retry, 'boom'), 'failed')
+        # A worker whose lease was taken over cannot record an outcome
+        self.assertEqual(complete(first[1]), 'lost')
+
+    def test_queue_metrics_count_live_tasks(self):
+        now = timezone.now()
+        Task.objects.create(name='notify.broadcast', run_at=now - timedelta(seconds=30))
+        Task.objects.create(name='notify.broadcast', run_at=now + timedelta(hours=1))
+        Task.objects.create(name='notify.broadcast', status='running')
+        for status in ('done', 'failed'):
+            Task.objects.create(name='notify.broadcast', status=status, finished_at=now)
+        text = queue_metrics()
+        self.assertIn('tasks_queue_depth{name="notify.broadcast",status="queued"} 2\n', text)
+        self.assertIn('tasks_queue_depth{name="notify.broadcast",status="running"} 1\n', text)
+        self.assertNotIn('status="done"', text)
+        self.assertNotIn('status="failed"', text)
+        # Only the task already due is late
+        lag = float(text.rsplit('tasks_queue_lag_seconds ', 1)[1])
+        self.assertGreaterEqual(lag, 30)
+        self.assertLess(lag, 60)
+
+    def test_finished_tasks_are_purged_after_the_retention(self):
+        old = timezone.now() - timedelta(days=8)
+        for status in ('done', 'failed'):
+            Task.objects.create(name='notify.broadcast', status=status, finished_at=old)
+        recent = Task.objects.create(name='notify.broadcast', status='failed', finished_at=timezone.now())
+        queued = Task.objects.create(name='notify.broadcast', run_at=old)
+        self.assertEqual(purge(7), 2)
+        self.assertEqual(set(Task.objects.values_list('pk', flat=True)), {recent.pk, queued.pk})
+
+    def test_hung_tasks_are_taken_over_after_the_visibility_timeout(self):
+        task = Task.objects.create(name='sales.reconcile_ratings', max_attempts=2)
+        (hung,) = claim(1, 'worker-a', 60)
+        self.assertEqual(claim(1, 'worker-b', 60), [])
+
+        Task.objects.filter(pk=task.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        (taken,) = claim(1, 'worker-b', 60)
+        self.assertEqual((taken.pk, taken.attempts), (task.pk, 2))
+        self.assertEqual(complete(hung), 'lost')
+        self.assertEqual(complete(taken), 'done')
+
+        # Hung on its last attempt, a task fails instead of running again
+        task = Task.objects.create(name='sales.reconcile_ratings', max_attempts=1)
+        claim(1, 'worker-a', 60)
+        Task.objects.filter(pk=task.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(claim(1, 'worker-b', 60), [])
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.last_error), ('failed', 'visibility timeout expired on the last attempt'))
+
+    @override_settings(TASK_RETRY_DELAY=10, TASK_RETRY_MAX_DELAY=60)
+    def test_backoff_doubles_up_to_the_maximum_with_jitter(self):
+        for pick, delays in ((max, [10, 20, 40, 60, 60]), (min, [5, 10, 20, 30, 30])):
+            with mock.patch('tasks.worker.random.uniform', side_effect=lambda low, high: pick(low, high)):
+                self.assertEqual([backoff(attempt) for attempt in range(1, 6)], delays)
+        for attempt, delay in ((1, 10), (3, 40), (9, 60)):
+            samples = [backoff(attempt) for _ in range(200)]
+            self.assertTrue(all(delay / 2 <= sample <= delay for sample in samples))
+            self.assertGreater(len(set(samples)), 1)
+
+        Task.objects.create(name='sales.reconcile_ratings', max_attempts=3)
+        (task,) = claim(1, 'worker-a', 60)
+        before = timezone.now()
+        self.assertEqual(fail(task, 'boom'), 'retried')
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.last_error, task.locked_until), ('queued', 'boom', None))
+        self.assertTrue(before + timedelta(seconds=5) <= task.run_at <= timezone.now() + timedelta(seconds=10))
+
+
+def record(ran, value):
+    ran.append((value, threading.current_thread().name))
+
+
+def explode():
+    raise RuntimeError('boom')
+
+
+class WorkerTests(TransactionTestCase):
+    """The worker's pool threads and processes use their own connections, so rows are committed."""
+
+    def setUp(self):
+        self.ran = []
+        tasks = {
+            'tests.record': TaskFunction(lambda value: record(self.ran, value), 'tests.record', 3),
+            'tests.explode': TaskFunction(explode, 'tests.explode', 2),
+        }
+        patcher = mock.patch.dict(REGISTRY, tasks)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_runworker_runs_the_queue_on_a_thread_pool(self):
+        for value in range(5):
+            enqueue('tests.record', value=value)
+        exploding = enqueue('tests.explode')
+        unknown = Task.objects.create(name='tests.gone')
+        stderr = StringIO()
+        call_command('runworker', burst=True, concurrency=2, stderr=stderr)
+
+        self.assertIn('thread pool of 2', stderr.getvalue())
+        self.assertEqual(sorted(value for value, _ in self.ran), list(range(5)))
+        self.assertTrue(all(thread.startswith('task') for _, thread in self.ran))
+        self.assertEqual(Task.objects.filter(name='tests.record', status='done').count(), 5)
+        # Retried later with backoff, so the burst run ends without it
+        exploding.refresh_from_db()
+        self.assertEqual((exploding.status, exploding.attempts), ('queued', 1))
+        self.assertIn('RuntimeError: boom', exploding.last_error)
+        unknown.refresh_from_db()
+        self.assertEqual((unknown.status, unknown.last_error), ('failed', 'no task named tests.gone'))
+
+        Task.objects.filter(pk=exploding.pk).update(run_at=timezone.now())
+        worker = Worker(concurrency=1)
+        worker.run(burst=True)
+        exploding.refresh_from_db()
+        self.assertEqual((exploding.status, exploding.attempts), ('failed', 2))
+        self.assertIn('tasks_processed_total{name="tests.explode",outcome="failed"} 1', worker.stats.render())
+
+    def test_process_pool(self):
+        # Spawned children set Django up from the environment: point them at the test database
+        clients = [ClientProfile.objects.create(firstname='C', lastname=f'{n}', address='Rabat', phoneNumber=f'06{n:08}') for n in range(3)]
+        enqueue('notify.broadcast', message='Souk closed on Friday', recipients='clients')
+        with mock.patch.dict(os.environ, DB_NAME=connection.settings_dict['NAME'], DB_REPLICAS=''):
+            Worker(concurrency=1, pool='process').run(burst=True)
+        self.assertEqual(Task.objects.get().status, 'done')
+        self.assertEqual(
+            sorted(Notification.objects.filter(message='Souk closed on Friday').values_list('recipient_object_id', flat=True)),
+            [client.pk for client in clients],
+        )
@@ -0,0 +1,244 @@
+import logging
+import multiprocessing
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Task
+from .registry import REGISTRY
+
+# Workers poll the tasks table; there is no broker. Claiming is one
+# conditional UPDATE that only matches rows still claimable, so two workers
+# selecting the same ids cannot both win a row (PostgreSQL re-checks the
+# WHERE clause after the row lock, SQLite serializes writers). Each claim
+# writes a fresh token to locked_by, and results are only recorded while
+# the token still matches: a worker that overran the visibility timeout
+# cannot overwrite the outcome of the worker that took the task over.
+
+logger = logging.getLogger(__name__)
+
+OUTCOMES = ('done', 'retried', 'failed', 'lost')
+
+
+def claimable(now):
+    return Q(status='queued', run_at__lte=now) | Q(status='running', locked_until__lt=now)
+
+
+def expire(now):
+    """Fail running tasks whose visibility timeout ran out on their last attempt."""
+    return Task.objects.filter(
+        status='running', locked_until__lt=now, attempts__gte=F('max_attempts'),
+    ).update(
+        status='failed', locked_until=None, finished_at=now,
+        last_error='visibility timeout expired on the last attempt',
+    )
+
+
+def claim(limit, worker_id, visibility_timeout):
+    now = timezone.now()
+    expire(now)
+    ids = list(
+        Task.objects.filter(claimable(now), attempts__lt=F('max_attempts'))
+        .order_by('run_at').values_list('pk', flat=True)[:limit]
+    )
+    if not ids:
+        return []
+    token = f'{worker_id}:{uuid.uuid4().hex[:8]}'
+    Task.objects.filter(claimable(now), pk__in=ids).update(
+        status='running',
+        attempts=F('attempts') + 1,
+        locked_by=token,
+        locked_until=now + timedelta(seconds=visibility_timeout),
+    )
+    return list(Task.objects.filter(pk__in=ids, locked_by=token).order_by('run_at'))
+
+
+def backoff(attempt):
+    """Seconds before retry number `attempt`: exponential, capped, with jitter against retry waves."""
+    delay = min(settings.TASK_RETRY_MAX_DELAY, settings.TASK_RETRY_DELAY * 2 ** (attempt - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _settle(task, **fields):
+    return Task.objects.filter(pk=task.pk, locked_by=task.locked_by, status='running').update(
+        locked_until=None, **fields,
+    )
+
+
+def complete(task):
+    updated = _settle(task, status='done', finished_at=timezone.now(), last_error='')
+    return 'done' if updated else 'lost'
+
+
+def fail(task, error):
+    """Requeue with backoff while attempts remain, otherwise mark failed."""
+    now = timezone.now()
+    if task.attempts < task.max_attempts:
+        updated = _settle(task, status='queued', run_at=now + timedelta(seconds=backoff(task.attempts)), last_error=error)
+        outcome = 'retried'
+    else:
+        updated = _settle(task, status='failed', finished_at=now, last_error=error)
+        outcome = 'failed'
+    return outcome if updated else 'lost'
+
+
+def purge(retention_days, limit=1000):
+    """Delete up to `limit` tasks that finished (done or failed) before the retention."""
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    old = Task.objects.filter(status__in=('done', 'failed'), finished_at__lt=cutoff).values_list('pk', flat=True)[:limit]
+    return Task.objects.filter(pk__in=list(old)).delete()[0]
+
+
+def execute(name, kwargs):
+    """Run one task on a pool thread or process and return its duration in seconds."""
+    close_old_connections()
+    try:
+        started = time.perf_counter()
+        REGISTRY[name].func(**kwargs)
+        return time.perf_counter() - started
+    finally:
+        close_old_connections()
+
+
+class Stats:
+    """Per task name counters, reported as log lines and optionally scraped over HTTP."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.totals = {}
+        self.window = {}
+        self.window_started = time.monotonic()
+
+    def record(self, name, outcome, seconds=0.0, lag=0.0):
+        with self.lock:
+            for counts in (self.totals, self.window):
+                entry = counts.setdefault(name, {**{key: 0 for key in OUTCOMES}, 'seconds': 0.0, 'lag': 0.0})
+                entry[outcome] += 1
+                entry['seconds'] += seconds
+                entry['lag'] += lag
+
+    def report(self):
+        """Counts and rates since the previous report."""
+        with self.lock:
+            window, self.window = self.window, {}
+            elapsed = time.monotonic() - self.window_started
+            self.window_started = time.monotonic()
+        tasks = {}
+        for name, entry in window.items():
+            finished = sum(entry[key] for key in OUTCOMES)
+            tasks[name] = {
+                **{key: entry[key] for key in OUTCOMES},
+                'per_second': round(finished / elapsed, 2) if elapsed else None,
+                'mean_ms': round(entry['seconds'] / finished * 1000, 1) if finished else None,
+                'mean_lag_ms': round(entry['lag'] / finished * 1000, 1) if finished else None,
+            }
+        return {'seconds': round(elapsed, 1), 'tasks': tasks}
+
+    def render(self):
+        with self.lock:
+            totals = {name: dict(entry) for name, entry in self.totals.items()}
+        lines = [
+            '# HELP tasks_processed_total Tasks finished by this worker, by outcome.',
+            '# TYPE tasks_processed_total counter',
+        ]
+        for name, entry in sorted(totals.items()):
+            for outcome in OUTCOMES:
+                lines.append(f'tasks_processed_total{{name="{name}",outcome="{outcome}"}} {entry[outcome]}')
+        lines += ['# HELP tasks_run_seconds_total Time spent running tasks.', '# TYPE tasks_run_seconds_total counter']
+        lines += [f'tasks_run_seconds_total{{name="{name}"}} {entry["seconds"]}' for name, entry in sorted(totals.items())]
+        lines += ['# HELP tasks_lag_seconds_total Time tasks waited past run_at before starting.',
+                  '# TYPE tasks_lag_seconds_total counter']
+        lines += [f'tasks_lag_seconds_total{{name="{name}"}} {entry["lag"]}' for name, entry in sorted(totals.items())]
+        return '\n'.join(lines) + '\n'
+
+
+class Worker:
+    def __init__(self, concurrency=4, pool='thread', poll_interval=None, visibility_timeout=None, stats_interval=60):
+        self.concurrency = concurrency
+        self.pool_kind = pool
+        self.poll_interval = poll_interval or settings.TASK_POLL_INTERVAL
+        self.visibility_timeout = visibility_timeout or settings.TASK_VISIBILITY_TIMEOUT
+        self.stats_interval = stats_interval
+        self.id = f'{socket.gethostname()}:{os.getpid()}'[:48]
+        self.stats = Stats()
+        self.stopping = threading.Event()
+
+    def stop(self):
+        """Stop claiming; tasks already running are finished first."""
+        self.stopping.set()
+
+    def make_pool(self):
+        if self.pool_kind == 'process':
+            # Spawned, not forked: children must not share the parent's database connections
+            connections.close_all()
+            return ProcessPoolExecutor(
+                self.concurrency, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup,
+            )
+        return ThreadPoolExecutor(self.concurrency, thread_name_prefix='task')
+
+    def run(self, burst=False):
+        """Process tasks until stop() is called or, with `burst`, until the queue is empty."""
+        pool = self.make_pool()
+        inflight = {}
+        next_report = time.monotonic() + self.stats_interval
+        try:
+            while not self.stopping.is_set():
+                free = self.concurrency - len(inflight)
+                if free:
+                    for task in claim(free, self.id, self.visibility_timeout):
+                        lag = (timezone.now() - task.run_at).total_seconds()
+                        if task.name not in REGISTRY:
+                            task.attempts = task.max_attempts  # no point retrying
+                            self.stats.record(task.name, fail(task, f'no task named {task.name}'))
+                            continue
+                        inflight[pool.submit(execute, task.name, task.kwargs)] = (task, lag)
+                if not inflight:
+                    if burst:
+                        break
+                    self.stopping.wait(self.poll_interval)
+                else:
+                    done, _ = wait(inflight, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                    if self.settle(done, inflight):
+                        pool.shutdown(wait=False)
+                        pool = self.make_pool()
+                if time.monotonic() >= next_report:
+                    self.report()
+                    next_report = time.monotonic() + self.stats_interval
+            self.settle(wait(inflight).done, inflight)
+        finally:
+            pool.shutdown(wait=True)
+            self.report()
+
+    def settle(self, futures, inflight):
+        """Record the outcome of finished futures; True if the process pool broke and must be replaced."""
+        broken = False
+        for future in futures:
+            task, lag = inflight.pop(future)
+            error = future.exception()
+            if error is None:
+                self.stats.record(task.name, complete(task), future.result(), lag)
+                continue
+            broken = broken or isinstance(error, BrokenProcessPool)
+            outcome = fail(task, ''.join(traceback.format_exception(error)))
+            self.stats.record(task.name, outcome, lag=lag)
+            logger.warning('task.failed', extra={
+                'task_id': task.pk, 'task': task.name, 'attempt': task.attempts, 'outcome': outcome,
+                'error': repr(error),
+            })
+        return broken
+
+    def report(self):
+        purged = purge(settings.TASK_RETENTION_DAYS)
+        logger.info('worker.stats', extra={'worker': self.id, 'purged': purged, **self.stats.report()})
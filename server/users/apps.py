@@ -1,5 +1,23 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
+
+
+def _install_search_index(sender, using, **kwargs):
+    from .search import ensure_search_index
+    ensure_search_index(using)
 
 
 class UsersConfig(AppConfig):
     name = 'users'
+
+    def ready(self):
+        from api.cache import invalidate_on_write
+        from . import cache
+        from .models import ClientProfile, MaalemProfile
+        post_migrate.connect(_install_search_index, sender=self)
+        for model in cache.PROFILES.values():
+            pre_save.connect(cache.profile_pre_save, sender=model[0])
+            post_save.connect(cache.profile_saved, sender=model[0])
+            post_delete.connect(cache.profile_deleted, sender=model[0])
+        invalidate_on_write(MaalemProfile, lambda maalem: ['maalems', f'maalem:{maalem.pk}'])
+        invalidate_on_write(ClientProfile, lambda client: ['clients', f'client:{client.pk}'])
@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import ClientProfile, MaalemProfile, normalize_phone
+from .serializers import ClientSerializer, MaalemSerializer
+
+# Read-through cache for the phone-number login lookups. Hits return the
+# serialized profile without touching the database; unknown numbers are cached
+# as MISSING for a shorter time so repeated failed attempts are cheap too.
+
+MISSING = '__missing__'
+
+PROFILES = {
+    'maalem': (MaalemProfile, MaalemSerializer),
+    'client': (ClientProfile, ClientSerializer),
+}
+
+
+def _key(kind, phone):
+    return f'login:{kind}:{normalize_phone(phone)}'
+
+
+def get_profile_by_phone(kind, phone):
+    """Serialized profile for `phone`, or None when no such profile exists."""
+    key = _key(kind, phone)
+    data = cache.get(key)
+    if data == MISSING:
+        return None
+    if data is not None:
+        return data
+    Model, Serializer = PROFILES[kind]
+    profile = Model.objects.filter(phoneNumber=normalize_phone(phone)).first()
+    if profile is None:
+        cache.set(key, MISSING, settings.LOGIN_CACHE_MISSING_TIMEOUT)
+        return None
+    data = Serializer(profile).data
+    cache.set(key, data, settings.LOGIN_CACHE_TIMEOUT)
+    return data
+
+
+def invalidate(kind, *phones):
+    # Deferred to commit so a concurrent reader cannot refill the key with the
+    # pre-write row before the transaction is visible.
+    keys = [_key(kind, phone) for phone in phones if phone]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _kind(sender):
+    return 'maalem' if sender is MaalemProfile else 'client'
+
+
+def profile_pre_save(sender, instance, **kwargs):
+    instance._previous_phone = None
+    if instance.pk:
+        instance._previous_phone = (
+            sender.objects.filter(pk=instance.pk).values_list('phoneNumber', flat=True).first()
+        )
+
+
+def profile_saved(sender, instance, **kwargs):
+    invalidate(_kind(sender), instance.phoneNumber, getattr(instance, '_previous_phone', None))
+
+
+def profile_deleted(sender, instance, **kwargs):
+    invalidate(_kind(sender), instance.phoneNumber)
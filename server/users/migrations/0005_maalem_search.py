@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-19 11:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_remove_adminprofile_firstname_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='maalemprofile',
+            index=models.Index(fields=['-rating'], name='maalem_rating_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0.1 on 2026-10-19 11:26
+
+from django.db import migrations, models
+
+
+def reset_ratings(apps, schema_editor):
+    # Ratings entered by hand have no OrderRating rows behind them; start every
+    # maalem at rating_sum / rating_count = 0 / 0 (see recompute_ratings)
+    apps.get_model('users', 'MaalemProfile').objects.update(rating=0.0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_maalem_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='maalemprofile',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='maalemprofile',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(reset_ratings, migrations.RunPython.noop),
+    ]
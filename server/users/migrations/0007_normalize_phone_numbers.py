@@ -0,0 +1,30 @@
+import re
+
+from django.db import migrations
+
+PHONE_PUNCTUATION = re.compile(r'[\s().\-]')
+
+
+def normalize_phone_numbers(apps, schema_editor):
+    # Phone numbers are now stored normalized (users.models.normalize_phone) so
+    # lookups and login cache keys agree. Rows whose normalized form is already
+    # taken are left untouched rather than breaking the unique constraint.
+    for model_name in ('MaalemProfile', 'ClientProfile'):
+        Model = apps.get_model('users', model_name)
+        taken = set(Model.objects.values_list('phoneNumber', flat=True))
+        for profile in Model.objects.only('pk', 'phoneNumber').iterator():
+            normalized = PHONE_PUNCTUATION.sub('', profile.phoneNumber)
+            if normalized != profile.phoneNumber and normalized not in taken:
+                Model.objects.filter(pk=profile.pk).update(phoneNumber=normalized)
+                taken.add(normalized)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_maalem_rating_totals'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_phone_numbers, migrations.RunPython.noop),
+    ]
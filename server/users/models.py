@@ -1,18 +1,36 @@
+import re
+
 from django.db import models
 # Create your models here.
 
+_PHONE_PUNCTUATION = re.compile(r'[\s().\-]')
+
+
+def normalize_phone(phone):
+    """Canonical form used for storage, lookups and cache keys: '06 12-34' -> '061234'."""
+    return _PHONE_PUNCTUATION.sub('', phone or '')
+
+
 class MaalemProfile(models.Model):
     id_maalem = models.AutoField(primary_key=True)
     firstname = models.CharField(max_length=100)
     lastname = models.CharField(max_length=100)
     address = models.CharField(max_length=255)
+    # rating is the running average rating_sum / rating_count, maintained by sales.ratings
     rating = models.FloatField(default=0.0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
     is_managed_by_admin = models.BooleanField(default=True)
     phoneNumber = models.CharField(
         max_length=20,
         unique=True,
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-rating'], name='maalem_rating_idx'),
+        ]
+
     def __str__(self):
         return f"{self.firstname} {self.lastname}"
     
@@ -0,0 +1,105 @@
+from django.db import connections
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+# Directory search index over MaalemProfile(firstname, lastname, address).
+# SQLite gets an external-content FTS5 table with the trigram tokenizer (kept in
+# sync by triggers), PostgreSQL gets pg_trgm GIN indexes on UPPER(col) so that
+# Django's icontains lookups can use them. The objects live outside of the
+# migration graph because SQLite table rebuilds drop triggers; they are
+# (re)installed idempotently on post_migrate.
+
+SEARCH_TABLE = 'users_maalem_search'
+SEARCH_FIELDS = ('firstname', 'lastname', 'address')
+MIN_TRIGRAM_LENGTH = 3
+
+_SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        firstname, lastname, address,
+        content='users_maalemprofile', content_rowid='id_maalem',
+        tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ai AFTER INSERT ON users_maalemprofile BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, firstname, lastname, address)
+        VALUES (new.id_maalem, new.firstname, new.lastname, new.address);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ad AFTER DELETE ON users_maalemprofile BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, firstname, lastname, address)
+        VALUES ('delete', old.id_maalem, old.firstname, old.lastname, old.address);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_au AFTER UPDATE OF firstname, lastname, address ON users_maalemprofile BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, firstname, lastname, address)
+        VALUES ('delete', old.id_maalem, old.firstname, old.lastname, old.address);
+        INSERT INTO {SEARCH_TABLE}(rowid, firstname, lastname, address)
+        VALUES (new.id_maalem, new.firstname, new.lastname, new.address);
+    END""",
+]
+
+_POSTGRES_DDL = ['CREATE EXTENSION IF NOT EXISTS pg_trgm'] + [
+    f'CREATE INDEX IF NOT EXISTS users_maalem_{field}_trgm '
+    f'ON users_maalemprofile USING gin (UPPER("{field}") gin_trgm_ops)'
+    for field in SEARCH_FIELDS
+]
+
+_fts_ready = {}
+
+
+def ensure_search_index(using='default'):
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s",
+                [f'{SEARCH_TABLE}_a_'],
+            )
+            had_triggers = cursor.fetchone()[0] == 3
+            for statement in _SQLITE_DDL:
+                cursor.execute(statement)
+            if not had_triggers:
+                # Rows written while the triggers were missing are not indexed.
+                cursor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+        elif connection.vendor == 'postgresql':
+            for statement in _POSTGRES_DDL:
+                cursor.execute(statement)
+    _fts_ready.pop(using, None)
+
+
+def _has_fts(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    if connection.alias not in _fts_ready:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [SEARCH_TABLE]
+            )
+            _fts_ready[connection.alias] = cursor.fetchone() is not None
+    return _fts_ready[connection.alias]
+
+
+def search_maalems(queryset, query):
+    """
+    Restrict `queryset` to maalems whose name or address contains `query` and
+    annotate `prefix_match` (1 when a field starts with it) for ranking.
+    """
+    prefix = Q()
+    for field in SEARCH_FIELDS:
+        prefix |= Q(**{f'{field}__istartswith': query})
+
+    connection = connections[queryset.db]
+    if len(query) >= MIN_TRIGRAM_LENGTH and _has_fts(connection):
+        phrase = '"%s"' % query.replace('"', '""')
+        queryset = queryset.filter(id_maalem__in=RawSQL(
+            f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', [phrase]
+        ))
+    elif len(query) >= MIN_TRIGRAM_LENGTH:
+        contains = Q()
+        for field in SEARCH_FIELDS:
+            contains |= Q(**{f'{field}__icontains': query})
+        queryset = queryset.filter(contains)
+    else:
+        # Too short for trigrams: prefix matching only.
+        queryset = queryset.filter(prefix)
+
+    return queryset.annotate(prefix_match=Case(
+        When(prefix, then=Value(1)), default=Value(0), output_field=IntegerField()
+    ))
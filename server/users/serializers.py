@@ -1,17 +1,47 @@
 from rest_framework import serializers
-from .models import AdminProfile, MaalemProfile, ClientProfile
+from rest_framework.validators import UniqueValidator
+from api.serializers import SparseFieldsMixin, ValuesSerializer
+from .models import AdminProfile, MaalemProfile, ClientProfile, normalize_phone
+
+
+class PhoneNumberField(serializers.CharField):
+    # Normalized before validators run so uniqueness is checked on the stored form
+    def to_internal_value(self, data):
+        return normalize_phone(super().to_internal_value(data))
+
+
+class MaalemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    phoneNumber = PhoneNumberField(max_length=20, validators=[UniqueValidator(queryset=MaalemProfile.objects.all())])
 
-class MaalemSerializer(serializers.ModelSerializer):
     class Meta:
         model = MaalemProfile
         fields = '__all__'
+        read_only_fields = ['rating', 'rating_sum', 'rating_count']
+
+class MaalemListSerializer(ValuesSerializer):
+    model = MaalemProfile
+    declared = ('phoneNumber',)
+
+class MaalemDirectorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    item_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = MaalemProfile
+        fields = '__all__'
+        read_only_fields = ['rating', 'rating_sum', 'rating_count']
+
+class ClientSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    phoneNumber = PhoneNumberField(max_length=20, validators=[UniqueValidator(queryset=ClientProfile.objects.all())])
 
-class ClientSerializer(serializers.ModelSerializer):
     class Meta:
         model = ClientProfile
         fields = '__all__'
 
+class ClientListSerializer(ValuesSerializer):
+    model = ClientProfile
+    declared = ('phoneNumber',)
+
 class AdminSerializer(serializers.ModelSerializer):
     class Meta:
         model = AdminProfile
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
@@ -1,3 +1,125 @@
+from django.core.cache import caches
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from api.testing import profile_data, seed
+from inventory.models import Item
+from sales.models import OrderRating
+from .models import MaalemProfile
+
+
+class LoginCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ctx = seed(2)
+
+    def setUp(self):
+        caches['default'].clear()
+        self.client = APIClient()
+
+    def login(self, phone, kind='maalem'):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/users/{kind}/login/{phone}/')
+        return response.status_code, response.json(), len(queries)
+
+    def test_hits_and_misses_skip_the_database(self):
+        status, profile, queries = self.login(self.ctx['maalem_phone'])
+        self.assertEqual((status, profile['id_maalem'], queries), (200, self.ctx['maalem'], 1))
+        self.assertEqual(self.login(self.ctx['maalem_phone']), (200, profile, 0))
+        # The key is the normalized number
+        self.assertEqual(self.login(f'{self.ctx["maalem_phone"][:2]} {self.ctx["maalem_phone"][2:]}'), (200, profile, 0))
+        self.assertEqual(self.login(self.ctx['client_phone'], 'client')[0], 200)
+
+        self.assertEqual(self.login('0799999999')[::2], (404, 1))
+        self.assertEqual(self.login('0799999999')[::2], (404, 0))
+
+    def test_writes_invalidate_the_cached_profile(self):
+        self.login('0799999999')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/users/maalem/post/', profile_data(self.ctx, '0799999999'), format='json')
+        self.assertEqual(self.login('0799999999')[0], 200)
+
+        old_phone = self.ctx['maalem_phone']
+        self.login(old_phone)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(f'/users/maalem/update/{self.ctx["maalem"]}/', profile_data(self.ctx, '0788888888'), format='json')
+        self.assertEqual(self.login(old_phone)[0], 404)
+        self.assertEqual(self.login('0788888888')[1]['firstname'], 'New')
+
+        # Rating totals move with update(), which sends no signal
+        rating = OrderRating.objects.filter(maalem_id=self.ctx['maalem']).first()
+        rating.score = 1
+        with self.captureOnCommitCallbacks(execute=True):
+            rating.save()
+        fresh = MaalemProfile.objects.get(pk=self.ctx['maalem']).rating
+        self.assertLess(fresh, 4)
+        self.assertEqual(self.login('0788888888')[1]['rating'], fresh)
+
+        self.login('0599999999')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/users/maalem/delete/{self.ctx["spare_maalem"]}/')
+        self.assertEqual(self.login('0599999999')[0], 404)
+
+
+class MaalemSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ahmed = cls.maalem('Ahmed', 'Benali', 'Fes', 4.5, items=2)
+        cls.karim = cls.maalem('Karim', 'Rahmani', 'Bab Ahmar, Marrakech', 5.0, items=0)
+        cls.youssef = cls.maalem('Youssef', 'Idrissi', 'Rabat', 4.0, items=3)
+
+    @staticmethod
+    def maalem(firstname, lastname, address, rating, items):
+        maalem = MaalemProfile.objects.create(
+            firstname=firstname, lastname=lastname, address=address, rating=rating,
+            phoneNumber=f'05{MaalemProfile.objects.count():08}',
+        )
+        for n in range(items):
+            Item.objects.create(
+                maalem=maalem, title=f'Item {n}', description='Handmade', category='pottery',
+                photoUrl='https://example.com/item.jpg', maalemAskPrice='100.00', minSellPrice='90.00',
+            )
+        return maalem.pk
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.client = APIClient()
+
+    def search(self, **params):
+        response = self.client.get('/users/maalem/search/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def ids(self, **params):
+        return [maalem['id_maalem'] for maalem in self.search(**params)['results']]
+
+    def test_sorting(self):
+        self.assertEqual(self.ids(), [self.karim, self.ahmed, self.youssef])
+        self.assertEqual(self.ids(sort='items'), [self.youssef, self.ahmed, self.karim])
+        self.assertEqual(self.ids(sort='name'), [self.ahmed, self.karim, self.youssef])
+        self.assertEqual([m['item_count'] for m in self.search(sort='items')['results']], [3, 2, 0])
+        self.assertEqual(self.client.get('/users/maalem/search/', {'sort': 'price'}).status_code, 400)
+
+    def test_prefix_matches_rank_above_substring_matches(self):
+        # Karim is rated higher but only matches inside his address
+        self.assertEqual(self.ids(q='ahm'), [self.ahmed, self.karim])
+        self.assertEqual(self.ids(q='AHMAR'), [self.karim])
+        self.assertEqual(self.ids(q='drissi'), [self.youssef])
+        # Too short for trigrams: prefixes only
+        self.assertEqual(self.ids(q='ah'), [self.ahmed])
+        self.assertEqual(self.ids(q='zzz'), [])
+
+    def test_index_follows_writes(self):
+        MaalemProfile.objects.filter(pk=self.youssef).update(lastname='Alaoui')
+        self.assertEqual(self.ids(q='drissi'), [])
+        self.assertEqual(self.ids(q='laou'), [self.youssef])
+        with self.captureOnCommitCallbacks(execute=True):
+            MaalemProfile.objects.filter(pk=self.youssef).delete()
+        self.assertEqual(self.ids(q='laou'), [])
+
+    def test_pagination(self):
+        page = self.search(page_size=2)
+        self.assertEqual((page['count'], len(page['results'])), (3, 2))
+        self.assertEqual([m['id_maalem'] for m in self.search(page_size=2, page=2)['results']], [self.youssef])
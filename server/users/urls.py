@@ -3,6 +3,7 @@ from django.urls import path
 
 urlpatterns = [
     path('maalem/', views.get_maalem),
+    path('maalem/search/', views.search_maalem),             # <------ DIRECTORY SEARCH
     path('maalem/<int:id>/', views.get_maalem_by_id),        # <------ LOGIN
     path('maalem/login/<str:phoneNumber>/', views.get_maalem_by_phone),  # <------ LOGIN BY PHONE
     path('maalem/post/', views.insert_maalem),               # <------ SIGNUP
@@ -1,18 +1,63 @@
+import logging
+
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.decorators import api_view
+from api.routers import use_replica
+from django.db.models import Count
+from api.pagination import StandardPagination
+from api.cache import cache_response
+from api.projection import only_fields, project, sparse_fields
 from .models import MaalemProfile, ClientProfile, AdminProfile
-from .serializers import MaalemSerializer, ClientSerializer, AdminSerializer
+from .serializers import (
+    MaalemSerializer, MaalemListSerializer, MaalemDirectorySerializer, ClientSerializer, ClientListSerializer, AdminSerializer,
+)
+from .search import search_maalems
+from .cache import get_profile_by_phone
+
+logger = logging.getLogger(__name__)
+
+MAALEM_SORTS = {
+    'rating': ('-rating', 'id_maalem'),
+    'items': ('-item_count', 'id_maalem'),
+    'name': ('firstname', 'lastname', 'id_maalem'),
+}
 
 #_____________________________________________#
 #-----------------Maalem APIs-----------------#
+@use_replica
+@cache_response('maalems')
+@sparse_fields(MaalemListSerializer)
 @api_view(['GET'])
 def get_maalem(request):
-    maalems = MaalemProfile.objects.all()
+    maalems = MaalemListSerializer(MaalemProfile.objects.all(), fields=request.sparse_fields).data
     if not maalems:
         return Response({'error':'no data'}, status=status.HTTP_404_NOT_FOUND)
-    serialized = MaalemSerializer(maalems, many=True)
-    return Response(serialized.data)
+    return Response(maalems)
+
+# ?q=<text>&sort=rating|items|name&page=<n>&page_size=<n>&fields=<a,b>
+@use_replica
+@cache_response('maalems', 'catalog')
+@sparse_fields(MaalemDirectorySerializer)
+@api_view(['GET'])
+def search_maalem(request):
+    query = request.query_params.get('q', '').strip()
+    sort = request.query_params.get('sort', 'rating')
+    if sort not in MAALEM_SORTS:
+        return Response({'error': f'sort must be one of {", ".join(MAALEM_SORTS)}'}, status=status.HTTP_400_BAD_REQUEST)
+    fields = request.sparse_fields
+    maalems = only_fields(MaalemProfile.objects.all(), fields)
+    if fields is None or 'item_count' in fields or sort == 'items':
+        maalems = maalems.annotate(item_count=Count('items'))
+    ordering = MAALEM_SORTS[sort]
+    if query:
+        maalems = search_maalems(maalems, query)
+        ordering = ('-prefix_match',) + ordering
+    maalems = maalems.order_by(*ordering)
+    paginator = StandardPagination()
+    page = paginator.paginate_queryset(maalems, request)
+    serialized = MaalemDirectorySerializer(page, many=True, fields=fields)
+    return paginator.get_paginated_response(serialized.data)
 
 @api_view(['POST'])
 def insert_maalem(request):
@@ -31,13 +76,15 @@ def del_maalem(request, id):
     aimed.delete()
     return Response({'message': 'Maalem deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
 
+@cache_response('maalem:{id}')
+@sparse_fields(MaalemSerializer)
 @api_view(['GET'])
 def get_maalem_by_id(request, id):
     try:
-        maalem = MaalemProfile.objects.get(id_maalem=id)
+        maalem = only_fields(MaalemProfile.objects.all(), request.sparse_fields).get(id_maalem=id)
     except MaalemProfile.DoesNotExist:
         return Response({'error': 'Maalem not found'}, status=status.HTTP_404_NOT_FOUND)
-    serialized = MaalemSerializer(maalem)
+    serialized = MaalemSerializer(maalem, fields=request.sparse_fields)
     return Response(serialized.data)
 
 @api_view(['PUT'])
@@ -52,26 +99,27 @@ def update_maalem(request, id):
         return Response(serializer.data)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@sparse_fields(MaalemSerializer)
 @api_view(['GET'])
 def get_maalem_by_phone(request, phoneNumber):
-    try:
-        maalem = MaalemProfile.objects.get(phoneNumber=phoneNumber)
-    except MaalemProfile.DoesNotExist:
+    maalem = get_profile_by_phone('maalem', phoneNumber)
+    if maalem is None:
         return Response({'error': 'Maalem with provided phone number doesn`t exist'}, status=status.HTTP_404_NOT_FOUND)
-    serialized = MaalemSerializer(maalem)
-    return Response(serialized.data)
+    return Response(project(maalem, request.sparse_fields))
 
 
 
 #_____________________________________________#
 #-----------------Client APIs-----------------#
+@use_replica
+@cache_response('clients')
+@sparse_fields(ClientListSerializer)
 @api_view(['GET'])
 def get_Client(request):
-    Clients = ClientProfile.objects.all()
+    Clients = ClientListSerializer(ClientProfile.objects.all(), fields=request.sparse_fields).data
     if not Clients:
         return Response({'error':'no data'}, status=status.HTTP_404_NOT_FOUND)
-    serialized = ClientSerializer(Clients, many=True)
-    return Response(serialized.data)
+    return Response(Clients)
 
 @api_view(['POST'])
 def insert_Client(request):
@@ -79,7 +127,7 @@ def insert_Client(request):
     if serializer.is_valid():
         serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
-    print(serializer.errors)
+    logger.info('client.rejected', extra={'errors': serializer.errors})
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)  
 
 @api_view(['DELETE'])
@@ -91,24 +139,25 @@ def del_Client(request, id):
     aimed.delete()
     return Response({'message': 'Client deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
 
+@cache_response('client:{id}')
+@sparse_fields(ClientSerializer)
 @api_view(['GET'])
 def get_Client_by_id(request, id):
     try:
-        Client = ClientProfile.objects.get(client_id=id)
+        Client = only_fields(ClientProfile.objects.all(), request.sparse_fields).get(client_id=id)
     except ClientProfile.DoesNotExist:
         return Response({'error': 'Client not found'}, status=status.HTTP_404_NOT_FOUND)
-    serialized = ClientSerializer(Client)
+    serialized = ClientSerializer(Client, fields=request.sparse_fields)
     return Response(serialized.data)
 
 
+@sparse_fields(ClientSerializer)
 @api_view(['GET'])
 def get_client_by_phone(request, phoneNumber):
-    try:
-        client = ClientProfile.objects.get(phoneNumber=phoneNumber)
-    except ClientProfile.DoesNotExist:
+    client = get_profile_by_phone('client', phoneNumber)
+    if client is None:
         return Response({'error': 'Client with provided phone number doesn`t exist'}, status=status.HTTP_404_NOT_FOUND)
-    serialized = ClientSerializer(client)
-    return Response(serialized.data)
+    return Response(project(client, request.sparse_fields))
 
 
 
@@ -170,7 +219,7 @@ def update_Client(request, id):
     if serializer.is_valid():
         serializer.save()
         return Response(serializer.data)
-    print(serializer.errors)
+    logger.info('client.update_rejected', extra={'client_id': id, 'errors': serializer.errors})
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 